@@ -1,42 +1,46 @@
-from fastapi import APIRouter, HTTPException
-import requests
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from .monitor import HealthMonitor, default_checks
+
+# Background checks of the dependencies, read by the probes
+health_monitor = HealthMonitor(default_checks())
+
+def start_health_monitor():
+    """
+    Starts the background dependency checks.
+    """
+    health_monitor.start()
+
+def stop_health_monitor():
+    """
+    Stops the background dependency checks.
+    """
+    health_monitor.stop()
 
 router = APIRouter()
 
+# Kubelet probes, mounted at the root of the application
+probe_router = APIRouter()
+
 @router.get("/healthcheck", tags=["Health Check"])
 async def healthcheck():
-    health_status = {
-        "ownership_claim": False,
-        "ownership_relinquish": False,
-        "ownership_validate": False
-    }
-
-    try:
-        # Check ownership claim endpoint
-        response = requests.post("http://localhost:8000/ownership/claim_ownership", json={
-            "eid_list": [1, 2, 3],
-            "group_name": "test",
-            "PG_size": "small"
-        })
-        if response.status_code == 200:
-            health_status["ownership_claim"] = True
-    except Exception as e:
-        print(f"Error checking ownership claim: {e}")
-
-    try:
-        # Check ownership relinquish endpoint
-        response = requests.delete("http://localhost:8000/relinquish/relinquish_ownership", params={"pg_id": "test_pg_id", "eid": "test_eid"})
-        if response.status_code == 200:
-            health_status["ownership_relinquish"] = True
-    except Exception as e:
-        print(f"Error checking ownership relinquish: {e}")
-
-    try:
-        # Check ownership validate endpoint
-        response = requests.post("http://localhost:8000/validate/validate-ownership", json={"eid": "test_eid", "auth_token": "test_token"})
-        if response.status_code == 200:
-            health_status["ownership_validate"] = True
-    except Exception as e:
-        print(f"Error checking ownership validate: {e}")
-
-    return health_status
\ No newline at end of file
+    """
+    Returns the latest result of every dependency check. Nothing is called or changed on the way.
+    """
+    return health_monitor.report()
+
+@probe_router.get("/healthz")
+async def healthz():
+    """
+    Liveness probe: answers as long as the event loop does, without touching any dependency.
+    """
+    return {"status": "ok"}
+
+@probe_router.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: 200 if every dependency check passed recently, 503 otherwise. The checks run
+    in the background every HEALTH_CHECK_INTERVAL_SECONDS; the probe only reads their results.
+    """
+    report = health_monitor.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+from kubernetes import client
+from dotenv import load_dotenv
+from app.modules.ownership.services import kubernetes_service, vault_service
+from app.modules.ownership.services.informer import WATCH_TIMEOUT_SECONDS
+from app.modules.ownership.services.token_writer import VAULT_TOKEN_STORAGE, OFF
+from app.modules.validate.token_verifier import VALIDATION_MODE, LOCAL, VAULT, check_secret_key
+from app.modules.relinquish import api as relinquish_api
+from app.modules.spark_as_a_service import api as spark_api
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "10"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "5"))
+HEALTH_CHECK_MAX_AGE_SECONDS = float(os.getenv("HEALTH_CHECK_MAX_AGE_SECONDS", str(3 * HEALTH_CHECK_INTERVAL_SECONDS)))
+INVENTORY_MAX_STALENESS_SECONDS = float(os.getenv("INVENTORY_MAX_STALENESS_SECONDS", str(WATCH_TIMEOUT_SECONDS + 60)))
+
+_version_api = None
+
+
+class CheckResult(NamedTuple):
+    """
+    The outcome of one run of a dependency check. `checked_at` is a time.monotonic() timestamp.
+    """
+    healthy: bool
+    message: str
+    checked_at: float
+    duration: float
+
+
+class HealthMonitor:
+    """
+    Runs dependency checks in a background thread every `interval` seconds and keeps their latest
+    results, so probes read cached results instead of calling the dependencies.
+
+    A check is a callable that raises if its dependency is unhealthy. The process is ready when
+    every check has passed within the last `max_age` seconds; a check that stopped reporting
+    (e.g. because it hangs) therefore makes the process unready.
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], None]], interval: float = HEALTH_CHECK_INTERVAL_SECONDS,
+                 max_age: float = HEALTH_CHECK_MAX_AGE_SECONDS):
+        """
+        Args:
+            checks (dict): The checks to run, keyed by name.
+            interval (float): The number of seconds between two runs of the checks.
+            max_age (float): How long a passed check counts, in seconds.
+        """
+        self.checks = checks
+        self.interval = interval
+        self.max_age = max_age
+        self._results: Dict[str, CheckResult] = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts running the checks in a daemon thread. Calling start twice is a no-op.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops running the checks. The latest results are kept.
+        """
+        self._stopped.set()
+
+    def run_checks(self):
+        """
+        Runs every check once and records the results.
+        """
+        for name, check in self.checks.items():
+            started = time.monotonic()
+            try:
+                check()
+                healthy, message = True, "ok"
+            except Exception as e:
+                healthy, message = False, str(e) or type(e).__name__
+            finished = time.monotonic()
+            if not healthy and (name not in self._results or self._results[name].healthy):
+                logger.warning(f"Health check '{name}' failed: {message}")
+            self._results[name] = CheckResult(healthy, message, finished, finished - started)
+
+    def is_ready(self) -> bool:
+        """
+        Returns True if every check has passed within the last `max_age` seconds.
+        """
+        now = time.monotonic()
+        return all(self._is_current(self._results.get(name), now) for name in self.checks)
+
+    def report(self) -> dict:
+        """
+        Returns the readiness of the process with the latest result of every check.
+        """
+        now = time.monotonic()
+        checks = {}
+        for name in self.checks:
+            result = self._results.get(name)
+            if result is None:
+                checks[name] = {"healthy": False, "message": "not checked yet", "age_seconds": None}
+            else:
+                checks[name] = {"healthy": result.healthy, "message": result.message, "age_seconds": round(now - result.checked_at, 3)}
+        return {"ready": self.is_ready(), "checks": checks}
+
+    def _is_current(self, result: Optional[CheckResult], now: float) -> bool:
+        return result is not None and result.healthy and now - result.checked_at <= self.max_age
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.run_checks()
+            self._stopped.wait(self.interval)
+
+
+def check_kubernetes_api():
+    """
+    Checks that the Kubernetes API server answers.
+    """
+    global _version_api
+    if _version_api is None:
+        _version_api = client.VersionApi()
+    _version_api.get_code(_request_timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+
+
+def check_vault():
+    """
+    Checks that Vault answers and is unsealed.
+    """
+    if vault_service.client.sys.is_sealed():
+        raise RuntimeError("Vault is sealed")
+
+
+def check_inventory():
+    """
+    Checks that the in-memory inventory has synced and is kept current.
+    """
+    staleness = kubernetes_service.inventory_store.staleness
+    if staleness is None:
+        raise RuntimeError("Inventory has not synced yet")
+    if staleness > INVENTORY_MAX_STALENESS_SECONDS:
+        raise RuntimeError(f"Inventory was last refreshed {staleness:.0f} seconds ago")
+
+
+def check_expiry_sweeper():
+    """
+    Checks that expired leases are being relinquished.
+    """
+    if not relinquish_api.expiry_sweeper_is_running():
+        raise RuntimeError("Lease expiry sweeper is not running")
+
+
+def check_submission_queue():
+    """
+    Checks that the Spark submission workers are running.
+    """
+    if not spark_api.submission_queue.is_running:
+        raise RuntimeError("Spark submission workers are not running")
+
+
+def default_checks() -> Dict[str, Callable[[], None]]:
+    """
+    Returns the checks of the dependencies this process is configured to use: the Kubernetes API
+    server, the freshness of the inventory, the lease expiry sweeper, the Spark submission workers,
+    unless tokens are neither read from nor written to Vault, Vault and, if tokens are verified
+    locally, the signing key.
+    """
+    checks = {
+        "kubernetes_api": check_kubernetes_api,
+        "inventory": check_inventory,
+        "expiry_sweeper": check_expiry_sweeper,
+        "submission_queue": check_submission_queue,
+    }
+    if VALIDATION_MODE != LOCAL or VAULT_TOKEN_STORAGE != OFF:
+        checks["vault"] = check_vault
+    if VALIDATION_MODE != VAULT:
+        checks["secret_key"] = check_secret_key
+    return checks
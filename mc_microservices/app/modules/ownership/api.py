@@ -1,17 +1,34 @@
 from fastapi import APIRouter, HTTPException
 from .schemas.claim_ownership_request import ClaimOwnershipRequest
-from .services.kubernetes_service import create_role_binding_and_generate_tokens, update_inventory_status
+from .schemas.claim_ownership_bulk import BulkClaimOwnershipResponse
+from .utils.executor import run_blocking
+from .services.kubernetes_service import (
+    create_role_binding_and_generate_tokens,
+    generate_user_token,
+    ownership_records,
+    put_ownership_records,
+    allocate_playground,
+    allocate_playgrounds,
+    abandon_claims,
+    service_account_index,
+    role_index,
+    cluster_role_index,
+    resource_indexes_synced,
+)
+from .services.role_binding_service import submit_role_bindings
+from .services.token_writer import store_auth_tokens
 from kubernetes import client
 from kubernetes.client.rest import ApiException
 import os
 from dotenv import load_dotenv
-from typing import Tuple
+from typing import List
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Load environment variables
 ROLE_NAME = os.getenv("ROLE_NAME", "cluster-full-access-role")
+BULK_CLAIM_MAX_ITEMS = int(os.getenv("BULK_CLAIM_MAX_ITEMS", "500"))
 
 router = APIRouter()
 
@@ -20,6 +37,30 @@ def check_kubernetes_resources(eid_list: list):
     Checks if the service account for each eid in the eid_list exists in any namespace in the cluster,
     and if the given role name (ClusterRole or Role) is available in the cluster.
 
+    Args:
+        eid_list (list): The list of entity IDs (users).
+
+    Raises:
+        HTTPException: If the service account or role name does not exist.
+    """
+    if not resource_indexes_synced():
+        check_kubernetes_resources_via_api(eid_list)
+        return
+
+    # Check if the role name exists as a ClusterRole or as a Role in any namespace
+    if ROLE_NAME not in cluster_role_index and ROLE_NAME not in role_index:
+        raise HTTPException(status_code=404, detail=f"Role '{ROLE_NAME}' not found as ClusterRole or in any namespace")
+
+    # Check if the users exist in any namespace
+    for eid in eid_list:
+        if str(eid) not in service_account_index:
+            raise HTTPException(status_code=404, detail=f"User '{eid}' not found in any namespace")
+
+def check_kubernetes_resources_via_api(eid_list: list):
+    """
+    Checks the service accounts and the role name against the API server, namespace by namespace.
+    Used until the in-memory resource indexes have synced.
+
     Args:
         eid_list (list): The list of entity IDs (users).
 
@@ -67,42 +108,13 @@ def check_kubernetes_resources(eid_list: list):
             if not user_found:
                 raise HTTPException(status_code=404, detail=f"User '{eid}' not found in any namespace")
 
+    except HTTPException:
+        raise
     except ApiException as e:
         raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking Kubernetes resources: {e}")
 
-def check_inventory(size: str, environment: str) -> Tuple[str, str]:
-    """
-    Checks the inventory for an available playground of the specified size and environment.
-
-    Args:
-        size (str): The size of the playground.
-        environment (str): The environment of the playground.
-
-    Returns:
-        tuple: The playground ID and namespace if available, otherwise raises an HTTPException.
-    """
-    try:
-        config_map_name = "inventory-configmap"
-        namespace = 'default'  # Use 'default' namespace
-
-        # Get the existing ConfigMap
-        api_instance = client.CoreV1Api()
-        config_map = api_instance.read_namespaced_config_map(name=config_map_name, namespace=namespace)
-
-        # Check for available playgrounds of the specified size and environment
-        for pg_id, value in config_map.data.items():
-            size_value, availability, namespace_value, group_name, environment_value, wb_bech_type = value.split(',')
-            if size_value == size and availability == "available":
-                return pg_id, namespace_value
-
-        raise HTTPException(status_code=404, detail="No available playgrounds of the specified size and environment")
-    except ApiException as e:
-        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error checking inventory: {e}")
-
 @router.post("/claim_ownership")
 async def claim_ownership(request: ClaimOwnershipRequest):
     """
@@ -126,28 +138,155 @@ async def claim_ownership(request: ClaimOwnershipRequest):
         wb_bech_type = request.wb_bech_type
 
         # Check if the service account for each eid and the role name (ClusterRole or Role) exist in the cluster
-        check_kubernetes_resources(eid_list)
-
-        # Get playground ID from inventory
-        pg_id, namespace_value = check_inventory(size=size, environment=environment)
-
-        if not pg_id:
-            raise HTTPException(status_code=404, detail="No available playgrounds of the specified size and environment")
+        await run_blocking(check_kubernetes_resources, eid_list)
 
-        # Create RoleBinding in Kubernetes and get tokens
-        auth_tokens = create_role_binding_and_generate_tokens(eid_list, ROLE_NAME, num_days, pg_id, namespace_value)
+        # Atomically allocate a playground from the inventory, marking it "unavailable"
+        pg_id, namespace_value = await run_blocking(allocate_playground, size=size, environment=environment, wb_bech_type=wb_bech_type)
 
-        # Update ConfigMap status to "unavailable"
-        update_inventory_status(pg_id, "unavailable")
+        # Create RoleBinding in Kubernetes and get tokens. On failure the RoleBindings and tokens
+        # created so far are deleted and the playground is handed back.
+        auth_tokens = await run_blocking(create_role_binding_and_generate_tokens, eid_list, ROLE_NAME, num_days, pg_id, namespace_value)
 
         # Return ownership assignment confirmation with pg_id and auth tokens
         return {
             "pg_id": pg_id,
             "auth_tokens": auth_tokens
         }
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except ApiException as e:
         raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def claim_ownership_items(requests: List[ClaimOwnershipRequest]) -> List[dict]:
+    """
+    Claims ownership for many teams at once with partial-failure semantics.
+
+    All requests are validated against the same snapshot of the resource indexes, their
+    playgrounds are allocated in one inventory transaction, the RoleBindings of all claims are
+    applied concurrently and the ownership ConfigMap is written once. Claims that fail after
+    allocation are abandoned together: their RoleBindings and stored tokens are deleted, then
+    their playgrounds are released in one more inventory transaction (see `abandon_claims`).
+
+    Args:
+        requests (List[ClaimOwnershipRequest]): The claims to process.
+
+    Returns:
+        List[dict]: One result per request, in request order, with its status code and either the
+        playground ID and auth tokens or the error.
+
+    Raises:
+        HTTPException: 400 if an eid appears in more than one request; such claims would share
+            the eid's RoleBinding and auth token.
+    """
+    seen, duplicates = set(), set()
+    for request in requests:
+        for eid in set(request.eid_list):
+            (duplicates if eid in seen else seen).add(eid)
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"eids claimed by more than one request: {sorted(duplicates)}")
+
+    results = [None] * len(requests)
+
+    def fail(index: int, status_code: int, error: str):
+        results[index] = {"index": index, "status_code": status_code, "error": error}
+
+    # Validate every request against the same snapshot of the resource indexes
+    valid = []
+    for index, request in enumerate(requests):
+        try:
+            check_kubernetes_resources(request.eid_list)
+            valid.append(index)
+        except HTTPException as e:
+            fail(index, e.status_code, e.detail)
+
+    # Allocate all playgrounds in one inventory transaction
+    allocations = allocate_playgrounds([(requests[i].size, requests[i].environment, requests[i].wb_bech_type) for i in valid])
+    allocated = []
+    for index, allocation in zip(valid, allocations):
+        if allocation is None:
+            fail(index, 404, "No available playgrounds of the specified size and environment")
+        else:
+            allocated.append((index, allocation[0], allocation[1]))
+
+    # Apply the RoleBindings of all claims concurrently
+    futures = {index: submit_role_bindings(requests[index].eid_list, ROLE_NAME, namespace_value) for index, _, namespace_value in allocated}
+    records = {}
+    claimed = []
+    # The failed claims to abandon, keyed by pg_id, with their namespace and applied RoleBindings
+    abandoned = {}
+    abandoned_tokens = []
+    namespaces = {index: namespace_value for index, _, namespace_value in allocated}
+    for index, pg_id, namespace_value in allocated:
+        request = requests[index]
+        binding_results = [future.result() for future in futures[index]]
+        failures = {result.eid: result.error for result in binding_results if not result.success}
+        if failures:
+            fail(index, 500, f"Failed to apply RoleBindings: {failures}")
+            abandoned[pg_id] = (namespace_value, [result.eid for result in binding_results if result.success])
+            continue
+        try:
+            auth_tokens = {result.eid: generate_user_token(result.eid, request.num_days, pg_id) for result in binding_results}
+        except Exception as e:
+            fail(index, 500, f"Failed to generate auth tokens: {e}")
+            abandoned[pg_id] = (namespace_value, [result.eid for result in binding_results])
+            continue
+        records.update(ownership_records(pg_id, request.eid_list, request.num_days))
+        claimed.append(index)
+        results[index] = {"index": index, "status_code": 200, "pg_id": pg_id, "auth_tokens": auth_tokens}
+
+    # Store the auth tokens of all successful claims in Vault together (see VAULT_TOKEN_STORAGE)
+    tokens = {eid: token for index in claimed for eid, token in results[index]["auth_tokens"].items()}
+    failures = store_auth_tokens(tokens)
+    if failures:
+        for index in list(claimed):
+            failed_eids = {eid: failures[eid] for eid in results[index]["auth_tokens"] if eid in failures}
+            if failed_eids:
+                claimed.remove(index)
+                abandoned[results[index]["pg_id"]] = (namespaces[index], list(results[index]["auth_tokens"]))
+                abandoned_tokens.extend(results[index]["auth_tokens"])
+                for key in ownership_records(results[index]["pg_id"], requests[index].eid_list, requests[index].num_days):
+                    records.pop(key, None)
+                fail(index, 500, f"Failed to store auth tokens in Vault: {failed_eids}")
+
+    # Record the ownership of all successful claims in one ConfigMap write
+    if records:
+        try:
+            put_ownership_records(records)
+        except HTTPException as e:
+            for index in claimed:
+                abandoned[results[index]["pg_id"]] = (namespaces[index], list(results[index]["auth_tokens"]))
+                abandoned_tokens.extend(results[index]["auth_tokens"])
+                fail(index, e.status_code, e.detail)
+
+    if abandoned:
+        abandon_claims(abandoned, abandoned_tokens)
+    return results
+
+@router.post("/claim_ownership/bulk", response_model=BulkClaimOwnershipResponse)
+async def claim_ownership_bulk(requests: List[ClaimOwnershipRequest]):
+    """
+    Claims ownership of playgrounds for many teams in one request.
+
+    Args:
+        requests (List[ClaimOwnershipRequest]): The claims, one per team.
+
+    Returns:
+        dict: The per-claim results, in request order. A failed claim does not fail the others.
+
+    Raises:
+        HTTPException: If the request is too large or the inventory cannot be updated.
+    """
+    if len(requests) > BULK_CLAIM_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_CLAIM_MAX_ITEMS} claims can be made in one request")
+    try:
+        return {"results": await run_blocking(claim_ownership_items, requests)}
+    except HTTPException:
+        raise
+    except ApiException as e:
+        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,42 @@
+from typing import NamedTuple
+
+AVAILABLE = "available"
+UNAVAILABLE = "unavailable"
+
+
+class InventoryEntry(NamedTuple):
+    """
+    A playground entry of the inventory ConfigMap, stored as
+    "size,status,namespace,group_name,environment,wb_bech_type".
+    """
+    size: str
+    status: str
+    namespace: str
+    group_name: str
+    environment: str
+    wb_bech_type: str
+
+    @classmethod
+    def parse(cls, value: str) -> "InventoryEntry":
+        """
+        Parses an inventory ConfigMap value.
+
+        Raises:
+            ValueError: If the value does not have exactly six comma-separated fields.
+        """
+        fields = value.split(',')
+        if len(fields) != len(cls._fields):
+            raise ValueError(f"Invalid inventory entry '{value}'")
+        return cls(*fields)
+
+    def serialize(self) -> str:
+        """
+        Returns the inventory ConfigMap value of this entry.
+        """
+        return ",".join(self)
+
+    def with_status(self, status: str) -> "InventoryEntry":
+        """
+        Returns a copy of this entry with the given status.
+        """
+        return self._replace(status=status)
@@ -0,0 +1,49 @@
+from typing import NamedTuple, Tuple
+
+
+def lease_key(pg_id: str, eid: str) -> str:
+    """
+    Returns the ownership key of a lease, "{pg_id}-{eid}".
+    """
+    return f"{pg_id}-{eid}"
+
+
+def split_lease_key(key: str) -> Tuple[str, str]:
+    """
+    Splits an ownership key into its playground ID and eid. Playground IDs do not contain "-",
+    so everything after the first "-" is the eid.
+
+    Raises:
+        ValueError: If the key is not of the form "{pg_id}-{eid}".
+    """
+    pg_id, separator, eid = key.partition("-")
+    if not separator or not pg_id or not eid:
+        raise ValueError(f"Invalid ownership key '{key}'")
+    return pg_id, eid
+
+
+class Lease(NamedTuple):
+    """
+    An ownership lease: `eid` owns playground `pg_id` until `expires_at`, an ISO 8601 UTC timestamp.
+    """
+    pg_id: str
+    eid: str
+    expires_at: str
+
+    @property
+    def key(self) -> str:
+        """
+        Returns the ownership key of this lease.
+        """
+        return lease_key(self.pg_id, self.eid)
+
+    @classmethod
+    def parse(cls, key: str, expires_at: str) -> "Lease":
+        """
+        Builds a lease from an ownership entry.
+
+        Raises:
+            ValueError: If the key is not of the form "{pg_id}-{eid}".
+        """
+        pg_id, eid = split_lease_key(key)
+        return cls(pg_id, eid, expires_at)
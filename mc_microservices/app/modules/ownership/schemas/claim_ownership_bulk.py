@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class ClaimOwnershipResult(BaseModel):
+    index: int
+    status_code: int
+    pg_id: Optional[str] = None
+    auth_tokens: Optional[Dict[str, str]] = None
+    error: Optional[str] = None
+
+class BulkClaimOwnershipResponse(BaseModel):
+    results: List[ClaimOwnershipResult]
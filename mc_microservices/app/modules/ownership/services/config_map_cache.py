@@ -0,0 +1,155 @@
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from .informer import Informer
+from app.modules.ownership.utils.logger import logger
+
+
+def _is_newer(resource_version: Optional[str], than: Optional[str]) -> bool:
+    """
+    Returns True if `resource_version` should replace `than`. resourceVersions are opaque, but the
+    API server hands out increasing integers, so they are compared numerically whenever possible.
+    """
+    if than is None or resource_version is None:
+        return True
+    try:
+        return int(resource_version) >= int(than)
+    except ValueError:
+        return True
+
+
+class ConfigMapCache(Informer):
+    """
+    An informer-style, read-only in-memory copy of a single ConfigMap's data.
+
+    Reads are served from memory; writes still go to the API server and are folded back in through
+    `update_from` (write-through) as well as through the watch.
+    """
+
+    def __init__(self, name: str, namespace: str, api_instance: client.CoreV1Api = None):
+        """
+        Args:
+            name (str): The name of the ConfigMap to cache.
+            namespace (str): The namespace of the ConfigMap.
+            api_instance (client.CoreV1Api): The API client to list and watch with.
+        """
+        api_instance = api_instance or client.CoreV1Api()
+        super().__init__(
+            f"configmap-{name}",
+            api_instance.list_namespaced_config_map,
+            namespace,
+            field_selector=f"metadata.name={name}",
+        )
+        self.config_map_name = name
+        self.namespace = namespace
+        self._lock = threading.RLock()
+        self._data: Dict[str, str] = {}
+        self._data_version: Optional[str] = None
+        self._exists = False
+        self._listeners = []
+
+    @property
+    def exists(self) -> bool:
+        """
+        Whether the ConfigMap existed at the last observed point in time.
+        """
+        return self._exists
+
+    def get_data(self) -> Dict[str, str]:
+        """
+        Returns a copy of the cached ConfigMap data.
+        """
+        with self._lock:
+            return dict(self._data)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached value of a single key, or None if it is not set.
+        """
+        with self._lock:
+            return self._data.get(key)
+
+    def snapshot(self) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        Returns a copy of the cached ConfigMap data together with the resourceVersion it was read at.
+        """
+        with self._lock:
+            return dict(self._data), self._data_version
+
+    def add_listener(self, callback: Callable[[Dict[str, str], Set[str]], None]):
+        """
+        Registers a callback invoked with `(changed, removed)` whenever the cached data changes.
+        `changed` maps added or modified keys to their new values and `removed` is the set of
+        deleted keys. Callbacks run on the thread that observed the change.
+        """
+        self._listeners.append(callback)
+
+    def update_from(self, config_map: client.V1ConfigMap):
+        """
+        Folds a ConfigMap returned by a write call into the cache so the writer reads its own write.
+
+        Args:
+            config_map (client.V1ConfigMap): The ConfigMap returned by the API server.
+        """
+        if config_map is None or config_map.metadata is None:
+            return
+        self._set(config_map.data or {}, config_map.metadata.resource_version, exists=True)
+
+    def on_replace(self, items: list, resource_version: str):
+        config_map = next((item for item in items if item.metadata.name == self.config_map_name), None)
+        if config_map is None:
+            self._set({}, resource_version, exists=False, force=True)
+        else:
+            self._set(config_map.data or {}, config_map.metadata.resource_version, exists=True, force=True)
+
+    def on_event(self, event_type: str, obj):
+        if obj.metadata is None or obj.metadata.name != self.config_map_name:
+            return
+        if event_type == "DELETED":
+            self._set({}, obj.metadata.resource_version, exists=False)
+        else:
+            self._set(obj.data or {}, obj.metadata.resource_version, exists=True)
+
+    def _set(self, data: Dict[str, str], resource_version: Optional[str], exists: bool, force: bool = False):
+        # Listeners are notified while the lock is held so that they observe changes in order.
+        with self._lock:
+            if not force and not _is_newer(resource_version, self._data_version):
+                return
+            old_data = self._data
+            self._data = dict(data)
+            self._data_version = resource_version
+            self._exists = exists
+
+            changed = {key: value for key, value in data.items() if old_data.get(key) != value}
+            removed = set(old_data) - set(data)
+            if not changed and not removed:
+                return
+            for callback in self._listeners:
+                try:
+                    callback(changed, removed)
+                except Exception as e:
+                    logger.error(f"ConfigMap cache '{self.config_map_name}': listener failed: {e}")
+
+
+def read_config_map_data(cache: ConfigMapCache) -> dict:
+    """
+    Returns the data of a cached ConfigMap, reading it from the API server if the cache has not synced yet.
+
+    Args:
+        cache (ConfigMapCache): The cache of the ConfigMap to read.
+
+    Returns:
+        dict: A copy of the ConfigMap data.
+
+    Raises:
+        ApiException: If the ConfigMap does not exist (status 404) or the API server cannot be reached.
+    """
+    if not cache.has_synced:
+        api_instance = client.CoreV1Api()
+        config_map = api_instance.read_namespaced_config_map(name=cache.config_map_name, namespace=cache.namespace)
+        cache.update_from(config_map)
+        return dict(config_map.data or {})
+    if not cache.exists:
+        raise ApiException(status=404, reason=f"ConfigMap '{cache.config_map_name}' not found")
+    return cache.get_data()
@@ -0,0 +1,52 @@
+from typing import Dict, Optional
+from kubernetes import client
+
+
+def build_data_patch(changes: Dict[str, Optional[str]], resource_version: str = None) -> dict:
+    """
+    Builds a patch that touches only the given ConfigMap data keys.
+
+    The kubernetes client sends dict bodies as strategic merge patches, which for the plain string
+    map of a ConfigMap's `data` behave like a JSON merge patch (RFC 7386): listed keys are set, keys
+    set to `None` are deleted and all other keys are left alone.
+
+    Args:
+        changes (dict): The keys to set, with `None` for keys to delete.
+        resource_version (str): If given, the patch only applies while the ConfigMap is still at
+            this resourceVersion; otherwise the API server answers 409 Conflict.
+
+    Returns:
+        dict: The patch body.
+    """
+    body = {"data": dict(changes)}
+    if resource_version is not None:
+        body["metadata"] = {"resourceVersion": resource_version}
+    return body
+
+
+def patch_config_map_data(name: str, namespace: str, changes: Dict[str, Optional[str]], resource_version: str = None,
+                          api_instance: client.CoreV1Api = None) -> client.V1ConfigMap:
+    """
+    Sends only the changed keys of a ConfigMap to the API server as a merge patch, so the cost of a
+    write does not grow with the size of the ConfigMap.
+
+    Args:
+        name (str): The name of the ConfigMap.
+        namespace (str): The namespace of the ConfigMap.
+        changes (dict): The keys to set, with `None` for keys to delete.
+        resource_version (str): Makes the patch conditional on this resourceVersion.
+        api_instance (client.CoreV1Api): The API client to use.
+
+    Returns:
+        client.V1ConfigMap: The patched ConfigMap as returned by the API server.
+
+    Raises:
+        ApiException: If the ConfigMap does not exist (404), the precondition failed (409) or the
+            API server cannot be reached.
+    """
+    api_instance = api_instance or client.CoreV1Api()
+    return api_instance.patch_namespaced_config_map(
+        name=name,
+        namespace=namespace,
+        body=build_data_patch(changes, resource_version)
+    )
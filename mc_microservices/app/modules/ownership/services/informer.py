@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from dotenv import load_dotenv
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+WATCH_TIMEOUT_SECONDS = int(os.getenv("WATCH_TIMEOUT_SECONDS", "300"))
+WATCH_RETRY_BACKOFF_SECONDS = float(os.getenv("WATCH_RETRY_BACKOFF_SECONDS", "1"))
+WATCH_MAX_BACKOFF_SECONDS = float(os.getenv("WATCH_MAX_BACKOFF_SECONDS", "30"))
+
+HTTP_STATUS_GONE = 410
+
+
+class Informer(ABC):
+    """
+    Keeps an in-memory view of Kubernetes objects current with a single list followed by a watch.
+
+    The watch resumes from the last seen resourceVersion when the stream ends or the connection
+    drops, and falls back to a full relist when the API server answers 410 Gone. Subclasses
+    implement `on_replace` (called with the full list) and `on_event` (called for every watch event).
+    """
+
+    def __init__(self, name: str, list_func, *args, **kwargs):
+        """
+        Args:
+            name (str): A human readable name used in log messages and for the watcher thread.
+            list_func (callable): The kubernetes-client list function to list and watch with.
+            *args: Positional arguments passed to `list_func` (e.g. the namespace).
+            **kwargs: Keyword arguments passed to `list_func` (e.g. `field_selector`).
+        """
+        self.name = name
+        self.list_func = list_func
+        self.args = args
+        self.kwargs = kwargs
+        self.resource_version = None
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._watch = None
+        self._thread = None
+        self._last_contact = None
+
+    @property
+    def has_synced(self) -> bool:
+        """
+        Whether the initial list has completed and the in-memory view can be served.
+        """
+        return self._synced.is_set()
+
+    @property
+    def staleness(self) -> Optional[float]:
+        """
+        The number of seconds since the API server last answered the list or the watch, or None
+        if it never has. A quiet watch answers at least every WATCH_TIMEOUT_SECONDS.
+        """
+        last_contact = self._last_contact
+        return None if last_contact is None else time.monotonic() - last_contact
+
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        """
+        Blocks until the initial list has completed.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            bool: True if the informer has synced, False if the timeout expired.
+        """
+        return self._synced.wait(timeout)
+
+    def start(self):
+        """
+        Starts the list-and-watch loop in a daemon thread. Calling start twice is a no-op.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=f"informer-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the watch loop. The in-memory view is kept but is no longer refreshed.
+        """
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def relist(self):
+        """
+        Lists the watched objects and replaces the in-memory view with the result.
+        """
+        result = self.list_func(*self.args, **self.kwargs)
+        self._last_contact = time.monotonic()
+        self.resource_version = result.metadata.resource_version
+        self.on_replace(result.items or [], self.resource_version)
+        self._synced.set()
+
+    def _run(self):
+        backoff = WATCH_RETRY_BACKOFF_SECONDS
+        needs_relist = True
+        while not self._stopped.is_set():
+            try:
+                if needs_relist:
+                    self.relist()
+                    needs_relist = False
+                self._watch_once()
+                backoff = WATCH_RETRY_BACKOFF_SECONDS
+            except ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    logger.info(f"Informer '{self.name}': resourceVersion {self.resource_version} expired, relisting.")
+                    needs_relist = True
+                    continue
+                logger.error(f"Informer '{self.name}': Kubernetes API error: {e}")
+                needs_relist = needs_relist or self.resource_version is None
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, WATCH_MAX_BACKOFF_SECONDS)
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                logger.error(f"Informer '{self.name}': watch interrupted: {e}")
+                needs_relist = needs_relist or self.resource_version is None
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, WATCH_MAX_BACKOFF_SECONDS)
+
+    def _watch_once(self):
+        self._watch = watch.Watch()
+        try:
+            for event in self._watch.stream(
+                self.list_func,
+                *self.args,
+                resource_version=self.resource_version,
+                timeout_seconds=WATCH_TIMEOUT_SECONDS,
+                allow_watch_bookmarks=True,
+                **self.kwargs
+            ):
+                self._last_contact = time.monotonic()
+                if event["type"] != "BOOKMARK":
+                    self.on_event(event["type"], event["object"])
+                if self._watch.resource_version is not None:
+                    self.resource_version = self._watch.resource_version
+                if self._stopped.is_set():
+                    break
+            else:
+                # The watch ran until its timeout
+                self._last_contact = time.monotonic()
+        finally:
+            self._watch = None
+
+    @abstractmethod
+    def on_replace(self, items: list, resource_version: str):
+        """
+        Replaces the in-memory view with a freshly listed set of objects.
+
+        Args:
+            items (list): The listed objects.
+            resource_version (str): The resourceVersion of the list.
+        """
+
+    @abstractmethod
+    def on_event(self, event_type: str, obj):
+        """
+        Applies a single watch event to the in-memory view.
+
+        Args:
+            event_type (str): "ADDED", "MODIFIED" or "DELETED".
+            obj: The object carried by the event.
+        """
@@ -0,0 +1,203 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional, Set, Tuple
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from dotenv import load_dotenv
+from .config_map_cache import ConfigMapCache, read_config_map_data
+from .config_map_patch import patch_config_map_data
+
+# Load environment variables from .env file
+load_dotenv()
+
+CONFIG_MAP = "configmap"
+SQLITE = "sqlite"
+
+# Load environment variables
+INVENTORY_STORE = os.getenv("INVENTORY_STORE", CONFIG_MAP)
+
+Listener = Callable[[Dict[str, str], Set[str]], None]
+
+
+class InventoryConflict(Exception):
+    """
+    Raised when an inventory write is rejected because the inventory changed since the snapshot
+    the write was based on.
+    """
+
+
+class InventoryStore(ABC):
+    """
+    Where the playground inventory is kept, as a mapping of pg_ids to InventoryEntry values.
+
+    Writes are optimistic: `write` only succeeds if the inventory is still at the version of the
+    snapshot the change was computed from. Listeners are called with `(changed, removed)` for
+    every change.
+    """
+
+    @abstractmethod
+    def initialize(self, data: Dict[str, str]):
+        """
+        Creates the inventory with the given entries if it does not exist yet.
+        """
+
+    @abstractmethod
+    def start(self):
+        """
+        Starts keeping the in-memory view of the inventory current.
+        """
+
+    @abstractmethod
+    def stop(self):
+        """
+        Stops refreshing the in-memory view of the inventory.
+        """
+
+    @abstractmethod
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        """
+        Blocks until the inventory can be served from memory, for at most `timeout` seconds.
+        """
+
+    @property
+    @abstractmethod
+    def staleness(self) -> Optional[float]:
+        """
+        The number of seconds since the in-memory view was last confirmed current, or None if it
+        has not synced yet.
+        """
+
+    @abstractmethod
+    def get_data(self) -> Dict[str, str]:
+        """
+        Returns a copy of the inventory.
+
+        Raises:
+            ApiException: If the inventory does not exist (status 404) or cannot be read.
+        """
+
+    @abstractmethod
+    def snapshot(self, fresh: bool = False) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        Returns a copy of the inventory together with the version it was read at.
+
+        Args:
+            fresh (bool): Bypass any in-memory copy, e.g. after a conflict.
+
+        Raises:
+            ApiException: If the inventory does not exist (status 404) or cannot be read.
+        """
+
+    @abstractmethod
+    def write(self, changes: Dict[str, Optional[str]], version: Optional[str]):
+        """
+        Writes the given entries, with `None` for entries to delete, if the inventory is still at `version`.
+
+        Raises:
+            InventoryConflict: If the inventory changed since `version`.
+            ApiException: If the write failed otherwise.
+        """
+
+    @abstractmethod
+    def add_listener(self, callback: Listener):
+        """
+        Registers a callback invoked with `(changed, removed)` whenever the inventory changes.
+        """
+
+
+class ConfigMapInventoryStore(InventoryStore):
+    """
+    Keeps the inventory in a ConfigMap, served from a watch-backed ConfigMapCache. The version of
+    a snapshot is the ConfigMap's resourceVersion.
+    """
+
+    def __init__(self, name: str, namespace: str, api_instance: client.CoreV1Api = None):
+        """
+        Args:
+            name (str): The name of the inventory ConfigMap.
+            namespace (str): The namespace of the inventory ConfigMap.
+            api_instance (client.CoreV1Api): The API client to use.
+        """
+        self.config_map_name = name
+        self.namespace = namespace
+        self.api_instance = api_instance or client.CoreV1Api()
+        self.cache = ConfigMapCache(name, namespace, self.api_instance)
+
+    @property
+    def has_synced(self) -> bool:
+        return self.cache.has_synced
+
+    @property
+    def staleness(self) -> Optional[float]:
+        return self.cache.staleness
+
+    def initialize(self, data: Dict[str, str]):
+        try:
+            self.api_instance.read_namespaced_config_map(name=self.config_map_name, namespace=self.namespace)
+            print(f"ConfigMap '{self.config_map_name}' already exists.")
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            # ConfigMap does not exist, create a new one
+            config_map = client.V1ConfigMap(
+                metadata=client.V1ObjectMeta(name=self.config_map_name),
+                data=data
+            )
+            self.api_instance.create_namespaced_config_map(namespace=self.namespace, body=config_map)
+            print(f"ConfigMap '{self.config_map_name}' created successfully.")
+
+    def start(self):
+        self.cache.start()
+
+    def stop(self):
+        self.cache.stop()
+
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        return self.cache.wait_for_sync(timeout)
+
+    def get_data(self) -> Dict[str, str]:
+        return read_config_map_data(self.cache)
+
+    def snapshot(self, fresh: bool = False) -> Tuple[Dict[str, str], Optional[str]]:
+        if fresh or not self.cache.has_synced:
+            config_map = self.api_instance.read_namespaced_config_map(name=self.config_map_name, namespace=self.namespace)
+            self.cache.update_from(config_map)
+            return dict(config_map.data or {}), config_map.metadata.resource_version
+        if not self.cache.exists:
+            raise ApiException(status=404, reason=f"ConfigMap '{self.config_map_name}' not found")
+        return self.cache.snapshot()
+
+    def write(self, changes: Dict[str, Optional[str]], version: Optional[str]):
+        try:
+            result = patch_config_map_data(self.config_map_name, self.namespace, changes, resource_version=version, api_instance=self.api_instance)
+        except ApiException as e:
+            if e.status == 409:
+                raise InventoryConflict(f"ConfigMap '{self.config_map_name}' changed since resourceVersion {version}") from e
+            raise
+        self.cache.update_from(result)
+
+    def add_listener(self, callback: Listener):
+        self.cache.add_listener(callback)
+
+
+def create_inventory_store(name: str, namespace: str, backend: str = INVENTORY_STORE) -> InventoryStore:
+    """
+    Creates the inventory store selected by the INVENTORY_STORE environment variable.
+
+    Args:
+        name (str): The name of the inventory ConfigMap.
+        namespace (str): The namespace of the inventory ConfigMap.
+        backend (str): "configmap" or "sqlite".
+
+    Returns:
+        InventoryStore: The inventory store.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == CONFIG_MAP:
+        return ConfigMapInventoryStore(name, namespace)
+    if backend == SQLITE:
+        from .sqlite_store import SQLiteInventoryStore
+        return SQLiteInventoryStore()
+    raise ValueError(f"Unknown inventory store '{backend}'")
@@ -1,15 +1,24 @@
 from fastapi import HTTPException
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
-import subprocess
-import yaml
 import jwt
 import datetime
 import os
 import secrets
 import json
+import random
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
-from .vault_service import store_auth_token
+from .token_writer import store_auth_tokens, delete_auth_tokens
+from .ownership_store import create_ownership_store
+from .inventory_store import create_inventory_store, InventoryConflict
+from .lease_index import LeaseIndex
+from .resource_index import NameIndex
+from .role_binding_service import apply_role_bindings, delete_role_bindings
+from .playground_allocator import PlaygroundAllocator
+from ..models.inventory_entry import InventoryEntry, AVAILABLE, UNAVAILABLE
+from ..models.lease import lease_key
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,13 +27,19 @@ load_dotenv()
 NAMESPACE = os.getenv("NAMESPACE", "default")
 OWNERSHIP_CONFIGMAP_NAME = os.getenv("OWNERSHIP_CONFIGMAP_NAME", "ownership-configmap")
 INVENTORY_CONFIGMAP_NAME = os.getenv("INVENTORY_CONFIGMAP_NAME", "inventory-configmap")
-SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))  # Replace with your actual secret key
+# Tokens are signed with SECRET_KEY. Without it a random key private to this process is used, which
+# only works while tokens are validated against their copy in Vault (see VALIDATION_MODE)
+SECRET_KEY_IS_SHARED = bool(os.getenv("SECRET_KEY"))
+SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_urlsafe(32)
 INVENTORY_DATA = json.loads(os.getenv("INVENTORY_DATA", "{}"))
 KUBERNETES_SERVICE_HOST = os.getenv("KUBERNETES_SERVICE_HOST")
 KUBERNETES_TOKEN = os.getenv("KUBERNETES_TOKEN")
 VAULT_URL = os.getenv("VAULT_URL")
 VAULT_TOKEN = os.getenv("VAULT_TOKEN")
 ALGORITHM = "HS256"
+CONFIG_MAP_CACHE_SYNC_TIMEOUT = float(os.getenv("CONFIG_MAP_CACHE_SYNC_TIMEOUT", "10"))
+INVENTORY_CAS_MAX_RETRIES = int(os.getenv("INVENTORY_CAS_MAX_RETRIES", "10"))
+INVENTORY_CAS_BACKOFF_SECONDS = float(os.getenv("INVENTORY_CAS_BACKOFF_SECONDS", "0.05"))
 
 # Load kubeconfig (from local or pod context)
 try:
@@ -32,39 +47,129 @@ try:
 except Exception as e:
     config.load_incluster_config()  # This is for when the code is running inside a Kubernetes pod.
 
+# The playground inventory and the ownership leases, kept in the backends selected by
+# INVENTORY_STORE and OWNERSHIP_STORE (watch-backed ConfigMaps by default, or SQLite)
+inventory_store = create_inventory_store(INVENTORY_CONFIGMAP_NAME, NAMESPACE)
+ownership_store = create_ownership_store(OWNERSHIP_CONFIGMAP_NAME, NAMESPACE)
+
+# Reverse indexes pg_id -> eids and eid -> pg_ids, maintained from ownership changes
+lease_index = LeaseIndex()
+ownership_store.add_listener(lease_index.apply_changes)
+
+# Free lists of playgrounds per (size, environment, wb_bech_type), rebuilt incrementally from
+# inventory changes seen by the inventory store.
+playground_allocator = PlaygroundAllocator()
+inventory_store.add_listener(playground_allocator.apply_changes)
+
+def start_config_map_caches():
+    """
+    Starts the inventory and ownership stores and waits for their initial sync.
+    Until a store has synced, reads fall back to the API server.
+    """
+    stores = {"inventory": inventory_store, "ownership": ownership_store}
+    for store in stores.values():
+        store.start()
+    for name, store in stores.items():
+        if not store.wait_for_sync(CONFIG_MAP_CACHE_SYNC_TIMEOUT):
+            print(f"The {name} store has not synced yet, reading from the API server meanwhile.")
+
+def stop_config_map_caches():
+    """
+    Stops the watches that keep the inventory and ownership stores current.
+    """
+    for store in (inventory_store, ownership_store):
+        store.stop()
+
+# Watch-backed cluster-wide indexes of ServiceAccount, Role and ClusterRole names, used to check
+# that the users and the role of a claim exist without a per-namespace API call.
+service_account_index = NameIndex("serviceaccounts", client.CoreV1Api().list_service_account_for_all_namespaces)
+role_index = NameIndex("roles", client.RbacAuthorizationV1Api().list_role_for_all_namespaces)
+cluster_role_index = NameIndex("clusterroles", client.RbacAuthorizationV1Api().list_cluster_role)
+
+def start_resource_indexes():
+    """
+    Starts the ServiceAccount, Role and ClusterRole name indexes and waits for their initial sync.
+    Until all indexes have synced, resource checks fall back to the API server.
+    """
+    for index in (service_account_index, role_index, cluster_role_index):
+        index.start()
+    for index in (service_account_index, role_index, cluster_role_index):
+        if not index.wait_for_sync(CONFIG_MAP_CACHE_SYNC_TIMEOUT):
+            print(f"Resource index '{index.name}' has not synced yet, checking against the API server meanwhile.")
+
+def stop_resource_indexes():
+    """
+    Stops the watches that keep the resource name indexes current.
+    """
+    for index in (service_account_index, role_index, cluster_role_index):
+        index.stop()
+
+def resource_indexes_synced() -> bool:
+    """
+    Returns True if the ServiceAccount, Role and ClusterRole indexes can be served from memory.
+    """
+    return service_account_index.has_synced and role_index.has_synced and cluster_role_index.has_synced
+
+def get_inventory_data() -> dict:
+    """
+    Returns the inventory keyed by pg_id, served from the inventory store.
+    """
+    return inventory_store.get_data()
+
+def get_ownership_data() -> dict:
+    """
+    Returns the ownership leases keyed "{pg_id}-{eid}", served from the in-memory ownership store.
+    """
+    return ownership_store.get_data()
+
+def get_playground_namespaces(pg_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    Returns the namespace of each of the given playgrounds. Playgrounds that are not in the
+    inventory are left out.
+    """
+    inventory = get_inventory_data()
+    namespaces = {}
+    for pg_id in pg_ids:
+        try:
+            namespaces[pg_id] = InventoryEntry.parse(inventory[pg_id]).namespace
+        except (KeyError, ValueError):
+            continue
+    return namespaces
+
+def get_playground_owners(pg_id: str) -> Dict[str, str]:
+    """
+    Returns the eids currently owning the given playground with the expiration date of their lease.
+    """
+    if ownership_store.has_synced:
+        return lease_index.owners(pg_id)
+    return ownership_store.owners(pg_id)
+
+def has_playground_owners(pg_id: str) -> bool:
+    """
+    Returns True if any eid still owns the given playground; an in-memory lookup once the
+    ownership store has synced.
+    """
+    if ownership_store.has_synced:
+        return lease_index.has_owners(pg_id)
+    return bool(ownership_store.owners(pg_id))
+
+def get_eid_playgrounds(eid: str) -> List[str]:
+    """
+    Returns the playgrounds currently owned by the given eid.
+    """
+    if ownership_store.has_synced:
+        return sorted(lease_index.playgrounds(eid))
+    return sorted(ownership_store.owned_by(eid))
+
 def create_initial_config_map():
     """
     Creates the initial ConfigMap if it doesn't exist.
     """
     try:
-        # Get the existing ConfigMap
-        api_instance = client.CoreV1Api()
-        try:
-            config_map = api_instance.read_namespaced_config_map(name=OWNERSHIP_CONFIGMAP_NAME, namespace=NAMESPACE)
-            print(f"ConfigMap '{OWNERSHIP_CONFIGMAP_NAME}' already exists.")
-        except ApiException as e:
-            if e.status == 404:
-                # ConfigMap does not exist, create a new one
-                config_map = client.V1ConfigMap(
-                    metadata=client.V1ObjectMeta(name=OWNERSHIP_CONFIGMAP_NAME),
-                    data={}
-                )
-                api_instance.create_namespaced_config_map(namespace=NAMESPACE, body=config_map)
-                print(f"ConfigMap '{OWNERSHIP_CONFIGMAP_NAME}' created successfully.")
-            else:
-                raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
+        ownership_store.initialize()
     except ApiException as e:
-        if e.status == 404:
-            # ConfigMap does not exist, create a new one
-            config_map = client.V1ConfigMap(
-                metadata=client.V1ObjectMeta(name=OWNERSHIP_CONFIGMAP_NAME),
-                data={}
-            )
-            api_instance.create_namespaced_config_map(namespace=NAMESPACE, body=config_map)
-            print(f"ConfigMap '{OWNERSHIP_CONFIGMAP_NAME}' created successfully.")
-        else:
-            print(f"Exception when creating initial ConfigMap: {e}")
-            raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
+        print(f"Exception when creating initial ConfigMap: {e}")
+        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
         print(f"Exception when creating initial ConfigMap: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating initial ConfigMap: {e}")
@@ -74,22 +179,9 @@ def create_initial_inventory_config_map():
     Creates the initial inventory ConfigMap if it doesn't exist.
     """
     try:
-        # Get the existing ConfigMap
-        api_instance = client.CoreV1Api()
-        try:
-            config_map = api_instance.read_namespaced_config_map(name=INVENTORY_CONFIGMAP_NAME, namespace=NAMESPACE)
-            print(f"ConfigMap '{INVENTORY_CONFIGMAP_NAME}' already exists.")
-        except ApiException as e:
-            if e.status == 404:
-                # ConfigMap does not exist, create a new one
-                config_map = client.V1ConfigMap(
-                    metadata=client.V1ObjectMeta(name=INVENTORY_CONFIGMAP_NAME),
-                    data=INVENTORY_DATA
-                )
-                api_instance.create_namespaced_config_map(namespace=NAMESPACE, body=config_map)
-                print(f"ConfigMap '{INVENTORY_CONFIGMAP_NAME}' created successfully.")
-            else:
-                raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
+        inventory_store.initialize(INVENTORY_DATA)
+    except ApiException as e:
+        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
         print(f"Exception when creating initial inventory ConfigMap: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating initial inventory ConfigMap: {e}")
@@ -97,7 +189,7 @@ def create_initial_inventory_config_map():
 
 def create_role_binding_and_generate_tokens(eid_list: list, role_name: str, num_days: int, pg_id: str, namespace_value: str) -> dict:
     """
-    Creates Kubernetes RoleBindings for the given entity IDs, updates the YAML file, and generates auth tokens.
+    Creates Kubernetes RoleBindings for the given entity IDs concurrently and generates auth tokens.
 
     Args:
         eid_list (list): The list of entity IDs for which the RoleBindings are created.
@@ -110,87 +202,66 @@ def create_role_binding_and_generate_tokens(eid_list: list, role_name: str, num_
         dict: A dictionary containing the auth tokens for the users associated with the eids.
 
     Raises:
-        HTTPException: If there is an error calling the Kubernetes API.
+        HTTPException: If a RoleBinding could not be applied or there is an error calling the Kubernetes API.
+            The claim is abandoned first (see `abandon_claims`), which hands the playground back.
     """
+    applied = []
+    stored = []
     try:
-        tokens = {}
-
-        for eid in eid_list:
-            # Ensure eid is treated as a string
-            eid_str = str(eid)
-
-            # Define the RoleBinding YAML structure
-            role_binding_yaml = {
-                "apiVersion": "rbac.authorization.k8s.io/v1",
-                "kind": "RoleBinding",
-                "metadata": {
-                    "name": f"map-{eid_str}",
-                    "namespace": namespace_value  # Use the provided namespace
-                },
-                "roleRef": {
-                    "apiGroup": "rbac.authorization.k8s.io",
-                    "kind": "Role",
-                    "name": role_name  # The role assigned to the user
-                },
-                "subjects": [
-                    {
-                        "kind": "User",
-                        "apiGroup": "rbac.authorization.k8s.io",
-                        "name": eid_str  # Provide the eid that needs playground access here
-                    }
-                ]
-            }
-
-            # Ensure the /temp_files directory exists
-            os.makedirs("/temp_files", exist_ok=True)
-
-            # Write the RoleBinding YAML to a temporary file
-            role_binding_file_path = f"/app/temp_files/role_binding_{eid_str}.yaml"
-            with open(role_binding_file_path, "w") as f:
-                yaml.dump(role_binding_yaml, f)
-
-            # Execute the kubectl command to apply the RoleBinding
-            kubectl_command = [
-                "kubectl", "apply", "-f", role_binding_file_path
-            ]
-            result = subprocess.run(kubectl_command, capture_output=True, text=True)
-
-            if result.returncode != 0:
-                raise HTTPException(status_code=500, detail=f"Failed to apply RoleBinding for {eid_str}: {result.stderr}")
-
-            print(f"RoleBinding for user '{eid_str}' with role '{role_name}' applied successfully for {num_days} days.")
-
-            # Generate auth token for the user associated with the eid
-            token = generate_user_token(eid_str, num_days)
-            tokens[eid_str] = token
-
-            # Store the auth token in Vault
-            # store_auth_token(eid_str, token)
-
-            # Clean up the temporary file
-            os.remove(role_binding_file_path)
-
-        # Update ConfigMap to store num_days, eid, and pg_id
-        update_config_map(pg_id, eid_list, num_days)
-
-        return tokens
-
+        try:
+            # Apply the RoleBindings for all eids concurrently
+            results = apply_role_bindings(eid_list, role_name, namespace_value)
+            applied = [eid for eid, result in results.items() if result.success]
+            failures = {eid: result.error for eid, result in results.items() if not result.success}
+            if failures:
+                raise HTTPException(status_code=500, detail=f"Failed to apply RoleBindings: {failures}")
+
+            tokens = {}
+            for eid_str in results:
+                print(f"RoleBinding for user '{eid_str}' with role '{role_name}' applied successfully for {num_days} days.")
+
+                # Generate auth token for the user associated with the eid
+                token = generate_user_token(eid_str, num_days, pg_id)
+                tokens[eid_str] = token
+
+            # Store the auth tokens in Vault, concurrently or in the background (see VAULT_TOKEN_STORAGE).
+            # A failed write may still have gone through, so every token counts as stored.
+            stored = list(tokens)
+            failures = store_auth_tokens(tokens)
+            if failures:
+                raise HTTPException(status_code=500, detail=f"Failed to store auth tokens in Vault: {failures}")
+
+            # Update ConfigMap to store num_days, eid, and pg_id
+            update_config_map(pg_id, eid_list, num_days)
+
+            return tokens
+        except Exception:
+            # Revoke the access granted so far before handing the playground back
+            abandon_claims({pg_id: (namespace_value, applied)}, stored)
+            raise
+
+    except HTTPException:
+        raise
     except ApiException as e:
         print(f"Exception when calling Kubernetes API: {e}")
         raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
-        print(f"Exception when executing kubectl command: {e}")
-        raise HTTPException(status_code=500, detail=f"Error executing kubectl command: {e}")
+        print(f"Exception when creating RoleBindings: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating RoleBindings: {e}")
 
 
 
-def generate_user_token(eid: str, num_days: int) -> str:
+def generate_user_token(eid: str, num_days: int, pg_id: str = None) -> str:
     """
     Generates an auth token for the user associated with the given entity ID.
 
+    The token carries its issue time and, when given, the playground it was issued for, so that
+    it can be verified locally and revoked when that lease is relinquished.
+
     Args:
         eid (str): The entity ID for which the auth token is generated.
         num_days (int): The number of days the token is valid.
+        pg_id (str): The playground ID the token is issued for.
 
     Returns:
         str: The auth token for the user.
@@ -199,16 +270,35 @@ def generate_user_token(eid: str, num_days: int) -> str:
         HTTPException: If there is an error generating the token.
     """
     try:
-        expiration = datetime.datetime.utcnow() + datetime.timedelta(days=num_days)
+        issued_at = datetime.datetime.utcnow()
+        expiration = issued_at + datetime.timedelta(days=num_days)
         payload = {
             "sub": eid,
+            "iat": issued_at,
             "exp": expiration
         }
+        if pg_id is not None:
+            payload["pg_id"] = pg_id
         token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
         return token
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating token: {e}")
 
+def ownership_records(pg_id: str, eid_list: list, num_days: int) -> Dict[str, str]:
+    """
+    Builds the ownership ConfigMap entries of a claim, keyed "{pg_id}-{eid}" with the expiration date as value.
+
+    Args:
+        pg_id (str): The playground ID.
+        eid_list (list): The list of entity IDs.
+        num_days (int): The number of days the RoleBindings are valid.
+
+    Returns:
+        dict: The ownership entries of the claim.
+    """
+    expiration_date = (datetime.datetime.utcnow() + datetime.timedelta(days=num_days)).isoformat()
+    return {lease_key(pg_id, eid): expiration_date for eid in eid_list}
+
 def update_config_map(pg_id: str, eid_list: list, num_days: int):
     """
     Updates a Kubernetes ConfigMap to store the expiration date, eid, and pg_id.
@@ -221,42 +311,227 @@ def update_config_map(pg_id: str, eid_list: list, num_days: int):
     Raises:
         HTTPException: If there is an error calling the Kubernetes API.
     """
+    put_ownership_records(ownership_records(pg_id, eid_list, num_days))
+
+def put_ownership_records(records: Dict[str, str]):
+    """
+    Adds entries to the ownership store, in a single write per ConfigMap.
+
+    Args:
+        records (dict): The ownership entries to add, keyed "{pg_id}-{eid}".
+
+    Raises:
+        HTTPException: If there is an error calling the Kubernetes API.
+    """
+    try:
+        ownership_store.put(records)
+        print(f"ConfigMap '{OWNERSHIP_CONFIGMAP_NAME}' updated successfully.")
+    except ApiException as e:
+        print(f"Exception when calling Kubernetes API: {e}")
+        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
+    except Exception as e:
+        print(f"Exception when updating ownership ConfigMap: {e}")
+        raise HTTPException(status_code=500, detail=f"Error updating ownership ConfigMap: {e}")
+
+def remove_ownership_records(keys: List[str]):
+    """
+    Deletes entries from the ownership store, in a single merge patch per ConfigMap.
+
+    Args:
+        keys (List[str]): The ownership keys to delete, "{pg_id}-{eid}".
+
+    Raises:
+        HTTPException: If there is an error calling the Kubernetes API.
+    """
+    if not keys:
+        return
     try:
-        # Define the ConfigMap name
-        config_map_name = OWNERSHIP_CONFIGMAP_NAME
+        ownership_store.remove(keys)
+        print(f"ConfigMap '{OWNERSHIP_CONFIGMAP_NAME}' updated successfully.")
+    except ApiException as e:
+        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
+
+def read_inventory_snapshot(fresh: bool = False) -> Tuple[Dict[str, str], str]:
+    """
+    Returns the inventory together with the version it was read at (the ConfigMap's resourceVersion).
+
+    Args:
+        fresh (bool): Read from the backend instead of the cache, e.g. after a conflict.
+
+    Returns:
+        tuple: The inventory data and the version it was read at.
+    """
+    return inventory_store.snapshot(fresh=fresh)
+
+def compare_and_swap_inventory(mutate: Callable[[Dict[str, str], int], Dict[str, str]]) -> Dict[str, str]:
+    """
+    Applies a change to the inventory as one optimistic transaction.
+
+    The change is computed by `mutate` from a snapshot of the inventory and written as only the
+    changed entries, conditional on the snapshot's version (for the ConfigMap backend, a merge
+    patch with the snapshot's resourceVersion). If another writer got there first, the write is
+    rejected with a conflict and the transaction is retried with jitter on a fresh snapshot.
+
+    Args:
+        mutate (callable): Called with `(inventory_data, attempt)`; returns the entries to change as
+            `{pg_id: value}`, or an empty dict if there is nothing to write. It may raise HTTPException.
 
-        # Get the existing ConfigMap
-        api_instance = client.CoreV1Api()
+    Returns:
+        dict: The entries that were written.
+
+    Raises:
+        HTTPException: If the transaction kept conflicting after INVENTORY_CAS_MAX_RETRIES attempts.
+    """
+    for attempt in range(INVENTORY_CAS_MAX_RETRIES):
+        data, version = read_inventory_snapshot(fresh=attempt > 0)
+        changes = mutate(data, attempt)
+        if not changes:
+            return {}
         try:
-            config_map = api_instance.read_namespaced_config_map(name=config_map_name, namespace=NAMESPACE)
-        except ApiException as e:
-            if e.status == 404:
-                # ConfigMap does not exist, create a new one
-                config_map = client.V1ConfigMap(
-                    metadata=client.V1ObjectMeta(name=config_map_name),
-                    data={}
-                )
-                api_instance.create_namespaced_config_map(namespace=NAMESPACE, body=config_map)
-            else:
-                raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
-
-        # Ensure the data attribute is initialized
-        if config_map.data is None:
-            config_map.data = {}
-
-        # Update the ConfigMap data
-        for eid in eid_list:
-            key = f"{pg_id}-{eid}"
-            expiration_date = (datetime.datetime.utcnow() + datetime.timedelta(days=num_days)).isoformat()
-            config_map.data[key] = expiration_date
-
-        # Apply the updated ConfigMap
-        api_instance.patch_namespaced_config_map(name=config_map_name, namespace=NAMESPACE, body=config_map)
-
-        print(f"ConfigMap '{config_map_name}' updated successfully.")
+            inventory_store.write(changes, version)
+            return changes
+        except InventoryConflict:
+            time.sleep(random.uniform(0, INVENTORY_CAS_BACKOFF_SECONDS * (2 ** attempt)))
+    raise HTTPException(status_code=409, detail="The inventory is being updated concurrently, please retry")
+
+def select_available_playground(data: Dict[str, str], size: str, environment: str, wb_bech_type: str, avoid: set) -> Optional[Tuple[str, InventoryEntry]]:
+    """
+    Selects and reserves a free playground of the given kind from the playground allocator,
+    checked against an inventory snapshot. Playgrounds in `avoid` are only used as a last resort.
+
+    Returns:
+        tuple: The pg_id and inventory entry of the reserved playground, or None if there is none.
+    """
+    for excluded in (avoid, set()):
+        stale = set()
+        while True:
+            selection = playground_allocator.select(size, environment, wb_bech_type, exclude=stale | excluded)
+            if selection is None:
+                break
+            pg_id, entry = selection
+            # The snapshot is authoritative; skip candidates it does not have as available
+            if data.get(pg_id) == entry.serialize():
+                return pg_id, entry
+            playground_allocator.unreserve(pg_id)
+            stale.add(pg_id)
+    return None
+
+def allocate_playgrounds(kinds: List[Tuple[str, str, str]]) -> List[Optional[Tuple[str, str]]]:
+    """
+    Atomically allocates one available playground per requested kind by marking them "unavailable".
+
+    Candidates come from the playground allocator's free lists for (size, environment,
+    wb_bech_type), so the inventory is not scanned. All allocations are written in one
+    compare-and-swap on the inventory ConfigMap, so concurrent claims never receive the same
+    playground; after a conflict, different free playgrounds are preferred.
+
+    Args:
+        kinds (List[Tuple[str, str, str]]): The (size, environment, wb_bech_type) of each requested playground.
+
+    Returns:
+        list: For each requested kind, the allocated playground ID and namespace, or None if none was available.
+    """
+    tried = set()
+    reserved = []
+    allocations = []
+
+    def mutate(data: Dict[str, str], attempt: int) -> Dict[str, str]:
+        for pg_id in reserved:
+            playground_allocator.unreserve(pg_id)
+        reserved.clear()
+        allocations.clear()
+
+        changes = {}
+        for size, environment, wb_bech_type in kinds:
+            selection = select_available_playground(data, size, environment, wb_bech_type, avoid=tried)
+            if selection is None:
+                allocations.append(None)
+                continue
+            pg_id, entry = selection
+            reserved.append(pg_id)
+            tried.add(pg_id)
+            allocations.append((pg_id, entry.namespace))
+            changes[pg_id] = entry.with_status(UNAVAILABLE).serialize()
+        return changes
+
+    try:
+        compare_and_swap_inventory(mutate)
+    finally:
+        for pg_id in reserved:
+            playground_allocator.unreserve(pg_id)
+    for allocation in allocations:
+        if allocation is not None:
+            print(f"Playground '{allocation[0]}' allocated from ConfigMap '{INVENTORY_CONFIGMAP_NAME}'.")
+    return list(allocations)
+
+def allocate_playground(size: str, environment: str, wb_bech_type: str) -> Tuple[str, str]:
+    """
+    Atomically allocates an available playground of the specified kind by marking it "unavailable".
+
+    Args:
+        size (str): The size of the playground.
+        environment (str): The environment of the playground.
+        wb_bech_type (str): The workbench type of the playground.
+
+    Returns:
+        tuple: The playground ID and namespace.
+
+    Raises:
+        HTTPException: If no playground of the specified kind is available.
+    """
+    allocation = allocate_playgrounds([(size, environment, wb_bech_type)])[0]
+    if allocation is None:
+        raise HTTPException(status_code=404, detail="No available playgrounds of the specified size and environment")
+    return allocation
+
+def abandon_claims(claims: Dict[str, Tuple[str, List[str]]], token_eids: Iterable[str] = ()):
+    """
+    Hands the playgrounds of failed claims back to the inventory after revoking the access
+    granted so far: the RoleBindings applied for the claims are deleted first, then the auth
+    tokens stored in Vault. A playground whose RoleBindings could not all be deleted stays
+    "unavailable", so that it is not handed to a new claimer the failed one can still access.
+
+    Args:
+        claims (dict): For each failed claim, keyed by pg_id, its namespace and the eids whose RoleBinding was applied.
+        token_eids (Iterable[str]): The eids whose auth tokens were stored or queued for storage.
+    """
+    bindings = [(eid, namespace) for namespace, eids in claims.values() for eid in eids]
+    failed = set()
+    for (eid, namespace), result in zip(bindings, delete_role_bindings(bindings)):
+        if not result.success:
+            print(f"Could not delete the RoleBinding of user '{eid}' in namespace '{namespace}': {result.error}")
+            failed.add((eid, namespace))
+
+    for eid, error in delete_auth_tokens(list(token_eids)).items():
+        print(f"Could not delete the auth token of user '{eid}' from Vault: {error}")
+
+    released = []
+    for pg_id, (namespace, eids) in claims.items():
+        if any((eid, namespace) in failed for eid in eids):
+            print(f"Playground '{pg_id}' stays unavailable: the RoleBindings of its failed claim could not all be deleted.")
+        else:
+            released.append(pg_id)
+    try:
+        release_playgrounds(released)
     except Exception as e:
-        print(f"Exception when executing kubectl command: {e}")
-        raise HTTPException(status_code=500, detail=f"Error executing kubectl command: {e}")
+        print(f"Could not release playgrounds {released}: {e}")
+
+def release_playgrounds(pg_ids: List[str]):
+    """
+    Sets the given playgrounds back to "available" in one inventory transaction.
+    Playgrounds that are not in the inventory are ignored.
+
+    Args:
+        pg_ids (List[str]): The playground IDs to release.
+    """
+    def mutate(data: Dict[str, str], attempt: int) -> Dict[str, str]:
+        return {
+            pg_id: InventoryEntry.parse(data[pg_id]).with_status(AVAILABLE).serialize()
+            for pg_id in pg_ids if pg_id in data
+        }
+
+    if pg_ids:
+        compare_and_swap_inventory(mutate)
 
 def update_inventory_status(pg_id: str, status: str):
     """
@@ -270,21 +545,16 @@ def update_inventory_status(pg_id: str, status: str):
         HTTPException: If there is an error calling the Kubernetes API.
     """
     try:
-        # Get the existing ConfigMap
-        api_instance = client.CoreV1Api()
-        config_map = api_instance.read_namespaced_config_map(name=INVENTORY_CONFIGMAP_NAME, namespace=NAMESPACE)
-
-        # Update the status of the specified playground
-        if pg_id in config_map.data:
-            size, _, namespace, group_name, environment, wb_bech_type = config_map.data[pg_id].split(',')
-            config_map.data[pg_id] = f"{size},{status},{namespace},{group_name},{environment},{wb_bech_type}"
-
-            # Apply the updated ConfigMap
-            api_instance.patch_namespaced_config_map(name=INVENTORY_CONFIGMAP_NAME, namespace=NAMESPACE, body=config_map)
-            print(f"ConfigMap '{INVENTORY_CONFIGMAP_NAME}' updated successfully with pg_id '{pg_id}' set to '{status}'.")
-        else:
-            raise HTTPException(status_code=404, detail=f"Playground ID '{pg_id}' not found in inventory")
+        def mutate(data: Dict[str, str], attempt: int) -> Dict[str, str]:
+            if pg_id not in data:
+                raise HTTPException(status_code=404, detail=f"Playground ID '{pg_id}' not found in inventory")
+            return {pg_id: InventoryEntry.parse(data[pg_id]).with_status(status).serialize()}
+
+        compare_and_swap_inventory(mutate)
+        print(f"ConfigMap '{INVENTORY_CONFIGMAP_NAME}' updated successfully with pg_id '{pg_id}' set to '{status}'.")
+    except HTTPException:
+        raise
     except ApiException as e:
         raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error updating inventory status: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error updating inventory status: {e}")
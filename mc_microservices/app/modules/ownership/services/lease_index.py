@@ -0,0 +1,75 @@
+import threading
+from typing import Dict, Iterable, Set
+from ..models.lease import split_lease_key
+
+
+class LeaseIndex:
+    """
+    In-memory reverse indexes of the ownership leases: pg_id to its eids and eid to its pg_ids.
+
+    It is maintained incrementally from ownership store changes (see `apply_changes`), so "who
+    owns this playground" and "is this playground now empty" are dictionary lookups instead of
+    scans over all leases.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_playground: Dict[str, Dict[str, str]] = {}
+        self._by_eid: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(owners) for owners in self._by_playground.values())
+
+    def apply_changes(self, changed: Dict[str, str], removed: Iterable[str]):
+        """
+        Folds ownership changes into the index. Registered as an ownership store listener.
+
+        Args:
+            changed (dict): Added or renewed leases as `{"{pg_id}-{eid}": expiration_date}`.
+            removed (Iterable[str]): The keys of relinquished leases.
+        """
+        with self._lock:
+            for key in removed:
+                try:
+                    pg_id, eid = split_lease_key(key)
+                except ValueError:
+                    continue
+                owners = self._by_playground.get(pg_id)
+                if owners is not None:
+                    owners.pop(eid, None)
+                    if not owners:
+                        del self._by_playground[pg_id]
+                playgrounds = self._by_eid.get(eid)
+                if playgrounds is not None:
+                    playgrounds.discard(pg_id)
+                    if not playgrounds:
+                        del self._by_eid[eid]
+            for key, expires_at in changed.items():
+                try:
+                    pg_id, eid = split_lease_key(key)
+                except ValueError:
+                    continue
+                self._by_playground.setdefault(pg_id, {})[eid] = expires_at
+                self._by_eid.setdefault(eid, set()).add(pg_id)
+
+    def owners(self, pg_id: str) -> Dict[str, str]:
+        """
+        Returns the eids owning the given playground with the expiration date of their lease.
+        """
+        with self._lock:
+            return dict(self._by_playground.get(pg_id, {}))
+
+    def has_owners(self, pg_id: str) -> bool:
+        """
+        Returns True if any eid still owns the given playground.
+        """
+        with self._lock:
+            return pg_id in self._by_playground
+
+    def playgrounds(self, eid: str) -> Set[str]:
+        """
+        Returns the playgrounds owned by the given eid.
+        """
+        with self._lock:
+            return set(self._by_eid.get(eid, ()))
@@ -0,0 +1,505 @@
+import os
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from dotenv import load_dotenv
+from .informer import Informer
+from .config_map_cache import ConfigMapCache, read_config_map_data, _is_newer
+from .config_map_patch import patch_config_map_data
+from ..models.lease import Lease
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+CONFIG_MAP = "configmap"
+SHARDED_CONFIG_MAP = "sharded-configmap"
+SQLITE = "sqlite"
+
+# Load environment variables
+OWNERSHIP_STORE = os.getenv("OWNERSHIP_STORE", CONFIG_MAP)
+OWNERSHIP_SHARDS = int(os.getenv("OWNERSHIP_SHARDS", "8"))
+
+# Label identifying the ConfigMaps that hold the shards of a sharded ownership store
+SHARD_LABEL = "ownership.mc/shard-of"
+
+Listener = Callable[[Dict[str, str], Set[str]], None]
+
+
+class OwnershipStore(ABC):
+    """
+    Where the ownership leases are kept, as a mapping of "{pg_id}-{eid}" keys to expiration dates.
+
+    Reads are served from memory once the store has synced; writes go to the backend and are
+    visible to the writer immediately. Listeners are called with `(changed, removed)` for every
+    change, whichever replica made it.
+    """
+
+    def initialize(self):
+        """
+        Creates the backing storage if it does not exist yet.
+        """
+
+    @abstractmethod
+    def start(self):
+        """
+        Starts keeping the in-memory view of the store current.
+        """
+
+    @abstractmethod
+    def stop(self):
+        """
+        Stops refreshing the in-memory view of the store.
+        """
+
+    @abstractmethod
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        """
+        Blocks until the store can be served from memory, for at most `timeout` seconds.
+        """
+
+    @abstractmethod
+    def get_data(self) -> Dict[str, str]:
+        """
+        Returns a copy of all ownership leases.
+        """
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the expiration date of a single lease, or None if it does not exist.
+        """
+        return self.get_data().get(key)
+
+    @abstractmethod
+    def put(self, records: Dict[str, str]):
+        """
+        Adds or overwrites ownership leases.
+
+        Raises:
+            ApiException: If the backend rejects the write or cannot be reached.
+        """
+
+    @abstractmethod
+    def remove(self, keys: Iterable[str]):
+        """
+        Deletes ownership leases. Keys that do not exist are ignored.
+
+        Raises:
+            ApiException: If the backend rejects the write or cannot be reached.
+        """
+
+    @abstractmethod
+    def add_listener(self, callback: Listener):
+        """
+        Registers a callback invoked with `(changed, removed)` whenever the leases change.
+        """
+
+    def leases(self) -> List[Lease]:
+        """
+        Returns all well-formed ownership leases.
+        """
+        leases = []
+        for key, expires_at in self.get_data().items():
+            try:
+                leases.append(Lease.parse(key, expires_at))
+            except ValueError:
+                continue
+        return leases
+
+    def owners(self, pg_id: str) -> Dict[str, str]:
+        """
+        Returns the eids owning the given playground with the expiration date of their lease.
+        """
+        return {lease.eid: lease.expires_at for lease in self.leases() if lease.pg_id == pg_id}
+
+    def owned_by(self, eid: str) -> Dict[str, str]:
+        """
+        Returns the playgrounds owned by the given eid with the expiration date of its lease.
+        """
+        return {lease.pg_id: lease.expires_at for lease in self.leases() if lease.eid == eid}
+
+    def expiring(self, until: str, limit: int = None) -> List[Lease]:
+        """
+        Returns the leases expiring at or before `until`, soonest first.
+
+        Args:
+            until (str): An ISO 8601 UTC timestamp.
+            limit (int): The maximum number of leases to return.
+        """
+        leases = sorted((lease for lease in self.leases() if lease.expires_at <= until), key=lambda lease: lease.expires_at)
+        return leases[:limit] if limit is not None else leases
+
+
+class ConfigMapOwnershipStore(OwnershipStore):
+    """
+    Keeps all leases in a single ConfigMap, served from a watch-backed ConfigMapCache.
+    """
+
+    def __init__(self, name: str, namespace: str, api_instance: client.CoreV1Api = None):
+        """
+        Args:
+            name (str): The name of the ownership ConfigMap.
+            namespace (str): The namespace of the ownership ConfigMap.
+            api_instance (client.CoreV1Api): The API client to use.
+        """
+        self.config_map_name = name
+        self.namespace = namespace
+        self.api_instance = api_instance or client.CoreV1Api()
+        self.cache = ConfigMapCache(name, namespace, self.api_instance)
+
+    @property
+    def has_synced(self) -> bool:
+        return self.cache.has_synced
+
+    def start(self):
+        self.cache.start()
+
+    def stop(self):
+        self.cache.stop()
+
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        return self.cache.wait_for_sync(timeout)
+
+    def initialize(self):
+        try:
+            self.api_instance.read_namespaced_config_map(name=self.config_map_name, namespace=self.namespace)
+            print(f"ConfigMap '{self.config_map_name}' already exists.")
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            # ConfigMap does not exist, create a new one
+            config_map = client.V1ConfigMap(
+                metadata=client.V1ObjectMeta(name=self.config_map_name),
+                data={}
+            )
+            self.api_instance.create_namespaced_config_map(namespace=self.namespace, body=config_map)
+            print(f"ConfigMap '{self.config_map_name}' created successfully.")
+
+    def get_data(self) -> Dict[str, str]:
+        return read_config_map_data(self.cache)
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.cache.has_synced:
+            return self.get_data().get(key)
+        return self.cache.get(key)
+
+    def put(self, records: Dict[str, str]):
+        if not records:
+            return
+        try:
+            # Send only the new entries as a merge patch
+            result = patch_config_map_data(self.config_map_name, self.namespace, records, api_instance=self.api_instance)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            # ConfigMap does not exist, create it with the new entries
+            config_map = client.V1ConfigMap(
+                metadata=client.V1ObjectMeta(name=self.config_map_name),
+                data=dict(records)
+            )
+            result = self.api_instance.create_namespaced_config_map(namespace=self.namespace, body=config_map)
+        self.cache.update_from(result)
+
+    def remove(self, keys: Iterable[str]):
+        changes = {key: None for key in keys}
+        if not changes:
+            return
+        try:
+            result = patch_config_map_data(self.config_map_name, self.namespace, changes, api_instance=self.api_instance)
+        except ApiException as e:
+            if e.status == 404:
+                return
+            raise
+        self.cache.update_from(result)
+
+    def add_listener(self, callback: Listener):
+        self.cache.add_listener(callback)
+
+
+class ShardedConfigMapOwnershipStore(Informer, OwnershipStore):
+    """
+    Spreads the leases over `shard_count` ConfigMaps named "{name}-{shard}", so that neither the
+    size of one object (etcd's 1 MiB limit) nor writes to one hot object bound the number of leases.
+
+    A lease is placed by a stable hash of its playground ID, so all leases of a claim land in the
+    same shard and are written with one patch. All shards carry the SHARD_LABEL label and are
+    listed and watched together, so reads see every shard whatever the shard count of the replica
+    that wrote them.
+
+    Changing the shard count is done online with `reshard`: leases are copied to their new shard
+    before they are removed from the old one, and while a lease exists in two shards the copy in
+    the shard it belongs to wins. Roll the new OWNERSHIP_SHARDS out to all replicas before
+    resharding, otherwise replicas still on the old count keep writing to the old shards.
+    """
+
+    def __init__(self, name: str, namespace: str, shard_count: int = OWNERSHIP_SHARDS, api_instance: client.CoreV1Api = None):
+        """
+        Args:
+            name (str): The name prefix of the shard ConfigMaps.
+            namespace (str): The namespace of the shard ConfigMaps.
+            shard_count (int): The number of shards new leases are spread over.
+            api_instance (client.CoreV1Api): The API client to list, watch and write with.
+
+        Raises:
+            ValueError: If `shard_count` is not positive.
+        """
+        if shard_count < 1:
+            raise ValueError(f"Invalid ownership shard count {shard_count}")
+        api_instance = api_instance or client.CoreV1Api()
+        super().__init__(
+            f"ownership-shards-{name}",
+            api_instance.list_namespaced_config_map,
+            namespace,
+            label_selector=f"{SHARD_LABEL}={name}",
+        )
+        self.config_map_name = name
+        self.namespace = namespace
+        self.shard_count = shard_count
+        self.api_instance = api_instance
+        self._lock = threading.RLock()
+        self._shards: Dict[str, Dict[str, str]] = {}
+        self._shard_versions: Dict[str, Optional[str]] = {}
+        self._locations: Dict[str, Set[str]] = {}
+        self._data: Dict[str, str] = {}
+        self._listeners: List[Listener] = []
+
+    def shard_name(self, key: str, shard_count: int = None) -> str:
+        """
+        Returns the name of the shard ConfigMap a lease belongs in.
+
+        Args:
+            key (str): The ownership key "{pg_id}-{eid}".
+            shard_count (int): The shard count to place the lease for, the current one by default.
+        """
+        shard = zlib.crc32(key.split("-", 1)[0].encode()) % (shard_count or self.shard_count)
+        return f"{self.config_map_name}-{shard}"
+
+    def get_data(self) -> Dict[str, str]:
+        if not self.has_synced:
+            return self._read_shards()
+        with self._lock:
+            return dict(self._data)
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.has_synced:
+            return self._read_shards().get(key)
+        with self._lock:
+            return self._data.get(key)
+
+    def shard_sizes(self) -> Dict[str, int]:
+        """
+        Returns the number of leases stored in each shard ConfigMap.
+        """
+        with self._lock:
+            return {name: len(data) for name, data in self._shards.items()}
+
+    def add_listener(self, callback: Listener):
+        self._listeners.append(callback)
+
+    def put(self, records: Dict[str, str]):
+        if not records:
+            return
+        by_shard: Dict[str, Dict[str, str]] = {}
+        for key, value in records.items():
+            by_shard.setdefault(self.shard_name(key), {})[key] = value
+        for shard_name, changes in by_shard.items():
+            try:
+                result = patch_config_map_data(shard_name, self.namespace, changes, api_instance=self.api_instance)
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+                result = self._create_shard(shard_name, changes)
+            self._fold(result)
+
+        # Drop copies left in other shards, e.g. by a reshard or by a replica on another shard count
+        with self._lock:
+            stale = [key for key in records if self._locations.get(key, set()) - {self.shard_name(key)}]
+        if stale:
+            self._remove(stale, keep_home=True)
+
+    def remove(self, keys: Iterable[str]):
+        self._remove(list(keys), keep_home=False)
+
+    def reshard(self, shard_count: int = None) -> int:
+        """
+        Moves every lease to the shard it belongs in under `shard_count` and deletes shards that
+        are left empty and are no longer in use. Safe to run while the store serves traffic.
+
+        Args:
+            shard_count (int): The new number of shards, the current one by default.
+
+        Returns:
+            int: The number of leases moved.
+
+        Raises:
+            ValueError: If `shard_count` is not positive.
+            ApiException: If a write fails; resharding can simply be run again.
+        """
+        if shard_count is not None:
+            if shard_count < 1:
+                raise ValueError(f"Invalid ownership shard count {shard_count}")
+            self.shard_count = shard_count
+        data = self.get_data()
+        with self._lock:
+            misplaced = {key: value for key, value in data.items() if self._locations.get(key) != {self.shard_name(key)}}
+        self.put(misplaced)
+
+        in_use = {f"{self.config_map_name}-{shard}" for shard in range(self.shard_count)}
+        with self._lock:
+            empty = [name for name, shard in self._shards.items() if not shard and name not in in_use]
+        for shard_name in empty:
+            try:
+                self.api_instance.delete_namespaced_config_map(name=shard_name, namespace=self.namespace)
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+            self._set_shard(shard_name, None, None)
+        logger.info(f"Ownership store '{self.config_map_name}': resharded to {self.shard_count} shards, {len(misplaced)} leases moved.")
+        return len(misplaced)
+
+    def on_replace(self, items: list, resource_version: str):
+        listed = {item.metadata.name: item for item in items}
+        with self._lock:
+            for shard_name in set(self._shards) - set(listed):
+                self._set_shard(shard_name, None, resource_version, force=True)
+            for shard_name, item in listed.items():
+                self._set_shard(shard_name, item.data or {}, item.metadata.resource_version, force=True)
+
+    def on_event(self, event_type: str, obj):
+        if obj.metadata is None:
+            return
+        if event_type == "DELETED":
+            self._set_shard(obj.metadata.name, None, obj.metadata.resource_version)
+        else:
+            self._set_shard(obj.metadata.name, obj.data or {}, obj.metadata.resource_version)
+
+    def _create_shard(self, shard_name: str, data: Dict[str, str]) -> client.V1ConfigMap:
+        config_map = client.V1ConfigMap(
+            metadata=client.V1ObjectMeta(name=shard_name, labels={SHARD_LABEL: self.config_map_name}),
+            data=dict(data)
+        )
+        try:
+            return self.api_instance.create_namespaced_config_map(namespace=self.namespace, body=config_map)
+        except ApiException as e:
+            if e.status != 409:
+                raise
+            # Another replica created the shard first
+            return patch_config_map_data(shard_name, self.namespace, data, api_instance=self.api_instance)
+
+    def _read_shards(self) -> Dict[str, str]:
+        # Served before the informer has synced: the shards are read from the API server and
+        # folded in, but only the informer marks the in-memory view as synced
+        result = self.list_func(*self.args, **self.kwargs)
+        shards = {item.metadata.name: item.data or {} for item in result.items or []}
+        for item in result.items or []:
+            self._set_shard(item.metadata.name, item.data or {}, item.metadata.resource_version)
+        locations: Dict[str, Set[str]] = {}
+        for shard_name, shard in shards.items():
+            for key in shard:
+                locations.setdefault(key, set()).add(shard_name)
+        return {key: shards[self._pick_shard(key, names)][key] for key, names in locations.items()}
+
+    def _remove(self, keys: List[str], keep_home: bool):
+        by_shard: Dict[str, Dict[str, None]] = {}
+        with self._lock:
+            for key in keys:
+                home = self.shard_name(key)
+                shard_names = set(self._locations.get(key, ()))
+                if keep_home:
+                    shard_names.discard(home)
+                else:
+                    # The lease may be in its home shard without this replica having seen it yet
+                    shard_names.add(home)
+                for shard_name in shard_names:
+                    by_shard.setdefault(shard_name, {})[key] = None
+        for shard_name, changes in by_shard.items():
+            try:
+                result = patch_config_map_data(shard_name, self.namespace, changes, api_instance=self.api_instance)
+            except ApiException as e:
+                if e.status == 404:
+                    continue
+                raise
+            self._fold(result)
+
+    def _fold(self, config_map: client.V1ConfigMap):
+        # Write-through, so the writer reads its own write before the watch delivers it
+        if config_map is not None and config_map.metadata is not None:
+            self._set_shard(config_map.metadata.name, config_map.data or {}, config_map.metadata.resource_version)
+
+    def _resolve(self, key: str) -> Optional[str]:
+        locations = self._locations.get(key)
+        if not locations:
+            return None
+        return self._shards[self._pick_shard(key, locations)][key]
+
+    def _pick_shard(self, key: str, locations: Set[str]) -> str:
+        # While a lease exists in two shards, the copy in the shard it belongs to wins
+        home = self.shard_name(key)
+        return home if home in locations else min(locations)
+
+    def _set_shard(self, shard_name: str, data: Optional[Dict[str, str]], resource_version: Optional[str], force: bool = False):
+        # Listeners are notified while the lock is held so that they observe changes in order.
+        with self._lock:
+            if not force and shard_name in self._shard_versions \
+                    and not _is_newer(resource_version, self._shard_versions[shard_name]):
+                return
+            old_data = self._shards.get(shard_name, {})
+            if data is None:
+                self._shards.pop(shard_name, None)
+                self._shard_versions.pop(shard_name, None)
+                data = {}
+            else:
+                self._shards[shard_name] = dict(data)
+                self._shard_versions[shard_name] = resource_version
+
+            changed, removed = {}, set()
+            for key in set(old_data) | set(data):
+                locations = self._locations.setdefault(key, set())
+                if key in data:
+                    locations.add(shard_name)
+                else:
+                    locations.discard(shard_name)
+                if not locations:
+                    del self._locations[key]
+                value = self._resolve(key)
+                if value is None:
+                    if self._data.pop(key, None) is not None:
+                        removed.add(key)
+                elif self._data.get(key) != value:
+                    self._data[key] = value
+                    changed[key] = value
+            if not changed and not removed:
+                return
+            for callback in self._listeners:
+                try:
+                    callback(changed, removed)
+                except Exception as e:
+                    logger.error(f"Ownership store '{self.config_map_name}': listener failed: {e}")
+
+
+def create_ownership_store(name: str, namespace: str, backend: str = OWNERSHIP_STORE) -> OwnershipStore:
+    """
+    Creates the ownership store selected by the OWNERSHIP_STORE environment variable.
+
+    Args:
+        name (str): The name of the ownership ConfigMap, or the name prefix of its shards.
+        namespace (str): The namespace the store lives in.
+        backend (str): "configmap", "sharded-configmap" or "sqlite".
+
+    Returns:
+        OwnershipStore: The ownership store.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == CONFIG_MAP:
+        return ConfigMapOwnershipStore(name, namespace)
+    if backend == SHARDED_CONFIG_MAP:
+        return ShardedConfigMapOwnershipStore(name, namespace)
+    if backend == SQLITE:
+        from .sqlite_store import SQLiteOwnershipStore
+        return SQLiteOwnershipStore()
+    raise ValueError(f"Unknown ownership store '{backend}'")
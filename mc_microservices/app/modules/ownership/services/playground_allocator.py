@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+from dotenv import load_dotenv
+from ..models.inventory_entry import InventoryEntry, AVAILABLE
+
+# Load environment variables from .env file
+load_dotenv()
+
+FIRST_FIT = "first-fit"
+LEAST_RECENTLY_USED = "least-recently-used"
+SPREAD = "spread"
+
+# Load environment variables
+PLAYGROUND_SELECTION_POLICY = os.getenv("PLAYGROUND_SELECTION_POLICY", FIRST_FIT)
+
+PoolKey = Tuple[str, str, str]
+
+
+class FreeList:
+    """
+    The free playgrounds of one (size, environment, wb_bech_type) pool, handed out first-fit:
+    the playground that appeared first in the inventory wins.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._free: Dict[str, Tuple[int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def add(self, pg_id: str, entry: InventoryEntry, order: int):
+        if pg_id not in self._free:
+            self._free[pg_id] = (order, entry.namespace)
+            heapq.heappush(self._heap, (order, pg_id))
+            self._compact()
+
+    def discard(self, pg_id: str):
+        # Heap entries are removed lazily when they surface in `peek`
+        self._free.pop(pg_id, None)
+
+    def peek(self, allocated_by_namespace: Counter) -> Optional[str]:
+        # Heap entries of playgrounds that are no longer free, or were freed again since, are dropped lazily here
+        while self._heap and not self._is_current(*self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][1] if self._heap else None
+
+    def _is_current(self, order: int, pg_id: str) -> bool:
+        free = self._free.get(pg_id)
+        return free is not None and free[0] == order
+
+    def _compact(self):
+        # Every discard and re-add leaves a stale entry behind; rebuild once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._free):
+            self._heap = [(order, pg_id) for pg_id, (order, _) in self._free.items()]
+            heapq.heapify(self._heap)
+
+
+class LeastRecentlyUsedFreeList(FreeList):
+    """
+    Hands out the playground that has been free the longest, spreading wear over the inventory.
+    """
+
+    def __init__(self):
+        self._free: "OrderedDict[str, str]" = OrderedDict()
+
+    def add(self, pg_id: str, entry: InventoryEntry, order: int):
+        if pg_id not in self._free:
+            self._free[pg_id] = entry.namespace
+
+    def discard(self, pg_id: str):
+        self._free.pop(pg_id, None)
+
+    def peek(self, allocated_by_namespace: Counter) -> Optional[str]:
+        return next(iter(self._free), None)
+
+
+class SpreadFreeList(FreeList):
+    """
+    Hands out a playground from the namespace with the fewest allocated playgrounds.
+    """
+
+    def __init__(self):
+        self._free: Dict[str, str] = {}
+        self._by_namespace: Dict[str, "OrderedDict[str, None]"] = {}
+
+    def add(self, pg_id: str, entry: InventoryEntry, order: int):
+        if pg_id not in self._free:
+            self._free[pg_id] = entry.namespace
+            self._by_namespace.setdefault(entry.namespace, OrderedDict())[pg_id] = None
+
+    def discard(self, pg_id: str):
+        namespace = self._free.pop(pg_id, None)
+        if namespace is not None:
+            playgrounds = self._by_namespace[namespace]
+            playgrounds.pop(pg_id, None)
+            if not playgrounds:
+                del self._by_namespace[namespace]
+
+    def peek(self, allocated_by_namespace: Counter) -> Optional[str]:
+        if not self._by_namespace:
+            return None
+        namespace = min(self._by_namespace, key=lambda ns: allocated_by_namespace[ns])
+        return next(iter(self._by_namespace[namespace]))
+
+
+FREE_LIST_POLICIES = {
+    FIRST_FIT: FreeList,
+    LEAST_RECENTLY_USED: LeastRecentlyUsedFreeList,
+    SPREAD: SpreadFreeList,
+}
+
+
+class PlaygroundAllocator:
+    """
+    An index of free playgrounds with one free list per (size, environment, wb_bech_type).
+
+    It is maintained incrementally from inventory changes (see `apply_changes`), so selecting a
+    playground does not scan or re-parse the inventory. A selected playground is taken off its
+    free list and reserved until the caller has committed or abandoned the allocation, so
+    concurrent claims in this process are steered to different playgrounds.
+    """
+
+    def __init__(self, policy: str = PLAYGROUND_SELECTION_POLICY):
+        """
+        Args:
+            policy (str): The selection policy: "first-fit", "least-recently-used" or "spread".
+
+        Raises:
+            ValueError: If the policy is unknown.
+        """
+        if policy not in FREE_LIST_POLICIES:
+            raise ValueError(f"Unknown playground selection policy '{policy}'")
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._entries: Dict[str, InventoryEntry] = {}
+        self._order: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._free_lists: Dict[PoolKey, FreeList] = {}
+        self._allocated_by_namespace: Counter = Counter()
+        self._reserved: Set[str] = set()
+
+    def apply_changes(self, changed: Dict[str, str], removed: Iterable[str]):
+        """
+        Folds inventory changes into the index. Registered as an inventory ConfigMap cache listener.
+
+        Args:
+            changed (dict): Added or modified inventory entries as `{pg_id: value}`.
+            removed (Iterable[str]): The pg_ids removed from the inventory.
+        """
+        with self._lock:
+            for pg_id in removed:
+                self._remove(pg_id)
+            for pg_id, value in changed.items():
+                self._remove(pg_id)
+                try:
+                    entry = InventoryEntry.parse(value)
+                except ValueError:
+                    continue
+                self._entries[pg_id] = entry
+                order = self._order.setdefault(pg_id, next(self._sequence))
+                if entry.status != AVAILABLE:
+                    self._allocated_by_namespace[entry.namespace] += 1
+                elif pg_id not in self._reserved:
+                    self._free_list(entry).add(pg_id, entry, order)
+
+    def select(self, size: str, environment: str, wb_bech_type: str, exclude: Iterable[str] = ()) -> Optional[Tuple[str, InventoryEntry]]:
+        """
+        Selects and reserves a free playground according to the selection policy.
+
+        Args:
+            size (str): The size of the playground.
+            environment (str): The environment of the playground.
+            wb_bech_type (str): The workbench type of the playground.
+            exclude (Iterable[str]): pg_ids that must not be selected.
+
+        Returns:
+            tuple: The pg_id and inventory entry of the reserved playground, or None if there is none.
+        """
+        with self._lock:
+            free_list = self._free_lists.get((size, environment, wb_bech_type))
+            if not free_list:
+                return None
+            exclude = set(exclude)
+            skipped = []
+            pg_id = free_list.peek(self._allocated_by_namespace)
+            while pg_id is not None and pg_id in exclude:
+                free_list.discard(pg_id)
+                skipped.append(pg_id)
+                pg_id = free_list.peek(self._allocated_by_namespace)
+            for skipped_pg_id in skipped:
+                free_list.add(skipped_pg_id, self._entries[skipped_pg_id], self._order[skipped_pg_id])
+            if pg_id is None:
+                return None
+            free_list.discard(pg_id)
+            self._reserved.add(pg_id)
+            return pg_id, self._entries[pg_id]
+
+    def unreserve(self, pg_id: str):
+        """
+        Ends the reservation taken by `select`, once the allocation was committed or abandoned.
+        """
+        with self._lock:
+            self._reserved.discard(pg_id)
+            entry = self._entries.get(pg_id)
+            if entry is not None and entry.status == AVAILABLE:
+                self._free_list(entry).add(pg_id, entry, self._order[pg_id])
+
+    def free_count(self, size: str, environment: str, wb_bech_type: str) -> int:
+        """
+        Returns the number of free playgrounds of the given kind.
+        """
+        with self._lock:
+            free_list = self._free_lists.get((size, environment, wb_bech_type))
+            return len(free_list) if free_list else 0
+
+    @staticmethod
+    def _key(entry: InventoryEntry) -> PoolKey:
+        return entry.size, entry.environment, entry.wb_bech_type
+
+    def _free_list(self, entry: InventoryEntry) -> FreeList:
+        free_list = self._free_lists.get(self._key(entry))
+        if free_list is None:
+            free_list = self._free_lists[self._key(entry)] = FREE_LIST_POLICIES[self.policy]()
+        return free_list
+
+    def _remove(self, pg_id: str):
+        entry = self._entries.pop(pg_id, None)
+        if entry is None:
+            return
+        if entry.status == AVAILABLE:
+            free_list = self._free_lists.get(self._key(entry))
+            if free_list is not None:
+                free_list.discard(pg_id)
+        else:
+            self._allocated_by_namespace[entry.namespace] -= 1
@@ -0,0 +1,57 @@
+import threading
+from typing import Dict, Set
+from .informer import Informer
+
+
+class NameIndex(Informer):
+    """
+    A watch-backed set index of the names of one kind of Kubernetes object across all namespaces.
+
+    It is built from a single cluster-wide list (e.g. `list_service_account_for_all_namespaces`) and
+    kept fresh by a watch, so membership checks are in-memory set lookups.
+    """
+
+    def __init__(self, name: str, list_func):
+        """
+        Args:
+            name (str): A human readable name used in log messages.
+            list_func (callable): A cluster-wide kubernetes-client list function.
+        """
+        super().__init__(name, list_func)
+        self._lock = threading.Lock()
+        self._namespaces_by_name: Dict[str, Set[str]] = {}
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._namespaces_by_name
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._namespaces_by_name)
+
+    def namespaces(self, name: str) -> Set[str]:
+        """
+        Returns the namespaces an object with the given name exists in. Cluster-scoped objects are
+        reported with an empty namespace.
+        """
+        with self._lock:
+            return set(self._namespaces_by_name.get(name, ()))
+
+    def on_replace(self, items: list, resource_version: str):
+        namespaces_by_name: Dict[str, Set[str]] = {}
+        for item in items:
+            namespaces_by_name.setdefault(item.metadata.name, set()).add(item.metadata.namespace or "")
+        with self._lock:
+            self._namespaces_by_name = namespaces_by_name
+
+    def on_event(self, event_type: str, obj):
+        name, namespace = obj.metadata.name, obj.metadata.namespace or ""
+        with self._lock:
+            if event_type == "DELETED":
+                namespaces = self._namespaces_by_name.get(name)
+                if namespaces is not None:
+                    namespaces.discard(namespace)
+                    if not namespaces:
+                        del self._namespaces_by_name[name]
+            else:
+                self._namespaces_by_name.setdefault(name, set()).add(namespace)
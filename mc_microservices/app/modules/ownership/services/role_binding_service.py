@@ -0,0 +1,154 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+ROLE_BINDING_CONCURRENCY = int(os.getenv("ROLE_BINDING_CONCURRENCY", "10"))
+
+# Shared pool bounding the number of RoleBinding calls in flight across all claims
+_executor = ThreadPoolExecutor(max_workers=ROLE_BINDING_CONCURRENCY, thread_name_prefix="role-binding")
+
+
+class RoleBindingResult(NamedTuple):
+    eid: str
+    success: bool
+    error: Optional[str] = None
+
+
+def role_binding_name(eid: str) -> str:
+    """
+    Returns the name of the RoleBinding that grants the given eid access to its playground.
+    """
+    return f"map-{eid}"
+
+
+def build_role_binding(eid: str, role_name: str, namespace: str) -> dict:
+    """
+    Builds the RoleBinding binding the user of the given eid to the given role.
+
+    Args:
+        eid (str): The entity ID (user) to bind.
+        role_name (str): The name of the existing Role to bind the user to.
+        namespace (str): The namespace of the RoleBinding.
+
+    Returns:
+        dict: The RoleBinding manifest.
+    """
+    return {
+        "apiVersion": "rbac.authorization.k8s.io/v1",
+        "kind": "RoleBinding",
+        "metadata": {
+            "name": role_binding_name(eid),
+            "namespace": namespace
+        },
+        "roleRef": {
+            "apiGroup": "rbac.authorization.k8s.io",
+            "kind": "Role",
+            "name": role_name
+        },
+        "subjects": [
+            {
+                "kind": "User",
+                "apiGroup": "rbac.authorization.k8s.io",
+                "name": eid
+            }
+        ]
+    }
+
+
+def apply_role_binding(eid: str, role_name: str, namespace: str) -> RoleBindingResult:
+    """
+    Creates the RoleBinding for the given eid, replacing it if it already exists.
+
+    Args:
+        eid (str): The entity ID (user) to bind.
+        role_name (str): The name of the existing Role to bind the user to.
+        namespace (str): The namespace of the RoleBinding.
+
+    Returns:
+        RoleBindingResult: Whether the RoleBinding was applied, with the error otherwise.
+    """
+    api_instance = client.RbacAuthorizationV1Api()
+    body = build_role_binding(eid, role_name, namespace)
+    try:
+        try:
+            api_instance.create_namespaced_role_binding(namespace=namespace, body=body)
+        except ApiException as e:
+            if e.status != 409:
+                raise
+            api_instance.replace_namespaced_role_binding(name=role_binding_name(eid), namespace=namespace, body=body)
+        return RoleBindingResult(eid, True)
+    except ApiException as e:
+        return RoleBindingResult(eid, False, f"Kubernetes API error: {e.status} {e.reason}")
+    except Exception as e:
+        return RoleBindingResult(eid, False, str(e))
+
+
+def apply_role_bindings(eid_list: List[str], role_name: str, namespace: str) -> Dict[str, RoleBindingResult]:
+    """
+    Applies the RoleBindings for all eids of a claim concurrently, at most ROLE_BINDING_CONCURRENCY at a time.
+
+    Args:
+        eid_list (List[str]): The entity IDs (users) to bind.
+        role_name (str): The name of the existing Role to bind the users to.
+        namespace (str): The namespace of the RoleBindings.
+
+    Returns:
+        Dict[str, RoleBindingResult]: The result for each eid, in the order of `eid_list`.
+    """
+    futures = submit_role_bindings(eid_list, role_name, namespace)
+    return {result.eid: result for result in (future.result() for future in futures)}
+
+
+def delete_role_binding(eid: str, namespace: str) -> RoleBindingResult:
+    """
+    Deletes the RoleBinding of the given eid. A RoleBinding that no longer exists counts as deleted.
+
+    Args:
+        eid (str): The entity ID (user) whose RoleBinding is deleted.
+        namespace (str): The namespace of the RoleBinding.
+
+    Returns:
+        RoleBindingResult: Whether the RoleBinding is gone, with the error otherwise.
+    """
+    api_instance = client.RbacAuthorizationV1Api()
+    try:
+        api_instance.delete_namespaced_role_binding(name=role_binding_name(eid), namespace=namespace)
+        return RoleBindingResult(eid, True)
+    except ApiException as e:
+        if e.status == 404:
+            return RoleBindingResult(eid, True)
+        return RoleBindingResult(eid, False, f"Kubernetes API error: {e.status} {e.reason}")
+    except Exception as e:
+        return RoleBindingResult(eid, False, str(e))
+
+
+def delete_role_bindings(bindings: List[Tuple[str, str]]) -> List[RoleBindingResult]:
+    """
+    Deletes RoleBindings concurrently on the shared pool, at most ROLE_BINDING_CONCURRENCY at a time.
+
+    Args:
+        bindings (List[Tuple[str, str]]): The (eid, namespace) of each RoleBinding to delete.
+
+    Returns:
+        List[RoleBindingResult]: The result for each RoleBinding, in the order of `bindings`.
+    """
+    futures = [_executor.submit(delete_role_binding, str(eid), namespace) for eid, namespace in bindings]
+    return [future.result() for future in futures]
+
+
+def submit_role_bindings(eid_list: List[str], role_name: str, namespace: str) -> List[Future]:
+    """
+    Schedules the RoleBindings for the given eids on the shared pool without waiting for them,
+    so that the bindings of several claims can be applied concurrently.
+
+    Returns:
+        List[Future]: One future per eid, resolving to its RoleBindingResult.
+    """
+    return [_executor.submit(apply_role_binding, str(eid), role_name, namespace) for eid in eid_list]
@@ -0,0 +1,330 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from .ownership_store import OwnershipStore
+from .inventory_store import InventoryStore, InventoryConflict
+from ..models.inventory_entry import InventoryEntry, AVAILABLE
+from ..models.lease import Lease
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "mc_state.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# SQLite limits the number of bound parameters of a statement
+MAX_VARIABLES = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    pg_id TEXT NOT NULL,
+    eid TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leases_pg_id ON leases (pg_id);
+CREATE INDEX IF NOT EXISTS leases_eid ON leases (eid);
+CREATE INDEX IF NOT EXISTS leases_expires_at ON leases (expires_at);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    pg_id TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size TEXT,
+    status TEXT,
+    namespace TEXT,
+    environment TEXT,
+    wb_bech_type TEXT
+);
+CREATE INDEX IF NOT EXISTS inventory_kind ON inventory (size, environment, wb_bech_type, status);
+
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+Listener = Callable[[Dict[str, str], Set[str]], None]
+
+_connections: Dict[str, Tuple[sqlite3.Connection, threading.RLock]] = {}
+_connections_lock = threading.Lock()
+
+
+def connect(path: str) -> Tuple[sqlite3.Connection, threading.RLock]:
+    """
+    Returns the connection to the SQLite database at `path`, shared by all stores of this process,
+    together with the lock serializing its use. The database is put in WAL mode, so readers in
+    other processes are not blocked by writers.
+
+    Args:
+        path (str): The path of the database file.
+
+    Returns:
+        tuple: The connection and its lock.
+    """
+    with _connections_lock:
+        if path not in _connections:
+            connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            connection.executescript(SCHEMA)
+            _connections[path] = (connection, threading.RLock())
+        return _connections[path]
+
+
+def _chunks(items: List[str], size: int = MAX_VARIABLES) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteStore(ABC):
+    """
+    Common plumbing of the SQLite-backed stores: the shared connection, transactions and listeners.
+
+    Reads are indexed queries against the database rather than an in-memory copy. Listeners see
+    the writes made through this process; other processes sharing the database file see the data
+    but do not notify this process, so the SQLite backend is meant for single-replica
+    deployments, tests and benchmarks.
+    """
+
+    def __init__(self, path: str, name: str):
+        """
+        Args:
+            path (str): The path of the database file.
+            name (str): A human readable name used in log messages.
+        """
+        self.path = path
+        self.name = name
+        self._connection, self._lock = connect(path)
+        self._listeners: List[Listener] = []
+        self._synced = threading.Event()
+
+    @property
+    def has_synced(self) -> bool:
+        return self._synced.is_set()
+
+    @property
+    def staleness(self) -> Optional[float]:
+        # The database is the source of truth, there is no view to go stale
+        return 0.0 if self._synced.is_set() else None
+
+    def start(self):
+        # Deliver the current contents once, as an informer's initial list would
+        with self._lock:
+            if not self._synced.is_set():
+                self._notify(self._read_all(), set())
+                self._synced.set()
+
+    def stop(self):
+        pass
+
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        return True
+
+    def add_listener(self, callback: Listener):
+        self._listeners.append(callback)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    @abstractmethod
+    def _read_all(self) -> Dict[str, str]:
+        """
+        Returns all entries of the store, read from the database.
+        """
+
+    def _notify(self, changed: Dict[str, str], removed: Set[str]):
+        if not changed and not removed:
+            return
+        for callback in self._listeners:
+            try:
+                callback(changed, removed)
+            except Exception as e:
+                logger.error(f"SQLite store '{self.name}': listener failed: {e}")
+
+
+class SQLiteOwnershipStore(SQLiteStore, OwnershipStore):
+    """
+    Keeps the ownership leases in an SQLite table indexed on pg_id, eid and expiration date, so
+    "who owns pg X", "what does eid Y own" and "what expires next" are index lookups.
+    """
+
+    def __init__(self, path: str = SQLITE_DB_PATH):
+        """
+        Args:
+            path (str): The path of the database file.
+        """
+        super().__init__(path, "leases")
+
+    def get_data(self) -> Dict[str, str]:
+        with self._lock:
+            return self._read_all()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, records: Dict[str, str]):
+        leases = [Lease.parse(key, expires_at) for key, expires_at in records.items()]
+        if not leases:
+            return
+        with self._lock:
+            with self._transaction() as connection:
+                old = self._select(connection, list(records))
+                connection.executemany(
+                    "INSERT INTO leases (key, pg_id, eid, expires_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at",
+                    [(lease.key, lease.pg_id, lease.eid, lease.expires_at) for lease in leases],
+                )
+            self._notify({key: value for key, value in records.items() if old.get(key) != value}, set())
+
+    def remove(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not keys:
+            return
+        with self._lock:
+            with self._transaction() as connection:
+                old = self._select(connection, keys)
+                connection.executemany("DELETE FROM leases WHERE key = ?", [(key,) for key in old])
+            self._notify({}, set(old))
+
+    def leases(self) -> List[Lease]:
+        with self._lock:
+            rows = self._connection.execute("SELECT pg_id, eid, expires_at FROM leases").fetchall()
+        return [Lease(*row) for row in rows]
+
+    def owners(self, pg_id: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._connection.execute("SELECT eid, expires_at FROM leases WHERE pg_id = ?", (pg_id,)).fetchall()
+        return dict(rows)
+
+    def owned_by(self, eid: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._connection.execute("SELECT pg_id, expires_at FROM leases WHERE eid = ?", (eid,)).fetchall()
+        return dict(rows)
+
+    def expiring(self, until: str, limit: int = None) -> List[Lease]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT pg_id, eid, expires_at FROM leases WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+                (until, -1 if limit is None else limit),
+            ).fetchall()
+        return [Lease(*row) for row in rows]
+
+    def _read_all(self) -> Dict[str, str]:
+        return dict(self._connection.execute("SELECT key, expires_at FROM leases").fetchall())
+
+    @staticmethod
+    def _select(connection: sqlite3.Connection, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        for chunk in _chunks(keys):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(connection.execute(f"SELECT key, expires_at FROM leases WHERE key IN ({placeholders})", chunk).fetchall())
+        return found
+
+
+class SQLiteInventoryStore(SQLiteStore, InventoryStore):
+    """
+    Keeps the playground inventory in an SQLite table indexed on (size, environment, wb_bech_type,
+    status). The version used for optimistic writes is a counter bumped by every write.
+    """
+
+    def __init__(self, path: str = SQLITE_DB_PATH):
+        """
+        Args:
+            path (str): The path of the database file.
+        """
+        super().__init__(path, "inventory")
+
+    def initialize(self, data: Dict[str, str]):
+        with self._lock:
+            with self._transaction() as connection:
+                if self._version(connection) is not None:
+                    print(f"SQLite inventory in '{self.path}' already exists.")
+                    return
+                self._upsert(connection, data)
+                connection.execute("INSERT INTO versions (name, version) VALUES ('inventory', 1)")
+            print(f"SQLite inventory in '{self.path}' created successfully.")
+            if self.has_synced:
+                self._notify(dict(data), set())
+
+    def get_data(self) -> Dict[str, str]:
+        with self._lock:
+            return self._read_all()
+
+    def snapshot(self, fresh: bool = False) -> Tuple[Dict[str, str], Optional[str]]:
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                return self._read_all(), str(self._version(self._connection) or 0)
+            finally:
+                self._connection.execute("COMMIT")
+
+    def write(self, changes: Dict[str, Optional[str]], version: Optional[str]):
+        with self._lock:
+            with self._transaction() as connection:
+                current = str(self._version(connection) or 0)
+                if version is not None and version != current:
+                    raise InventoryConflict(f"SQLite inventory changed since version {version}")
+                old = {}
+                for chunk in _chunks(list(changes)):
+                    placeholders = ",".join("?" * len(chunk))
+                    old.update(connection.execute(f"SELECT pg_id, value FROM inventory WHERE pg_id IN ({placeholders})", chunk).fetchall())
+                self._upsert(connection, {pg_id: value for pg_id, value in changes.items() if value is not None})
+                removed = {pg_id for pg_id, value in changes.items() if value is None and pg_id in old}
+                connection.executemany("DELETE FROM inventory WHERE pg_id = ?", [(pg_id,) for pg_id in removed])
+                connection.execute(
+                    "INSERT INTO versions (name, version) VALUES ('inventory', 1) "
+                    "ON CONFLICT(name) DO UPDATE SET version = version + 1"
+                )
+            self._notify({pg_id: value for pg_id, value in changes.items() if value is not None and old.get(pg_id) != value}, removed)
+
+    def available(self, size: str, environment: str, wb_bech_type: str) -> List[str]:
+        """
+        Returns the IDs of the available playgrounds of the given kind.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT pg_id FROM inventory WHERE size = ? AND environment = ? AND wb_bech_type = ? AND status = ? ORDER BY pg_id",
+                (size, environment, wb_bech_type, AVAILABLE),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _read_all(self) -> Dict[str, str]:
+        return dict(self._connection.execute("SELECT pg_id, value FROM inventory").fetchall())
+
+    @staticmethod
+    def _version(connection: sqlite3.Connection) -> Optional[int]:
+        row = connection.execute("SELECT version FROM versions WHERE name = 'inventory'").fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _upsert(connection: sqlite3.Connection, entries: Dict[str, str]):
+        rows = []
+        for pg_id, value in entries.items():
+            try:
+                entry = InventoryEntry.parse(value)
+                rows.append((pg_id, value, entry.size, entry.status, entry.namespace, entry.environment, entry.wb_bech_type))
+            except ValueError:
+                rows.append((pg_id, value, None, None, None, None, None))
+        connection.executemany(
+            "INSERT INTO inventory (pg_id, value, size, status, namespace, environment, wb_bech_type) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(pg_id) DO UPDATE SET value = excluded.value, size = excluded.size, status = excluded.status, "
+            "namespace = excluded.namespace, environment = excluded.environment, wb_bech_type = excluded.wb_bech_type",
+            rows,
+        )
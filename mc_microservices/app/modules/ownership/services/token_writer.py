@@ -0,0 +1,221 @@
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from .vault_service import store_auth_token, delete_auth_token
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+OFF = "off"
+SYNC = "sync"
+ASYNC = "async"
+
+# Load environment variables
+VAULT_TOKEN_STORAGE = os.getenv("VAULT_TOKEN_STORAGE", OFF)
+VAULT_WRITE_WORKERS = int(os.getenv("VAULT_WRITE_WORKERS", "8"))
+VAULT_WRITE_QUEUE_SIZE = int(os.getenv("VAULT_WRITE_QUEUE_SIZE", "10000"))
+VAULT_WRITE_MAX_RETRIES = int(os.getenv("VAULT_WRITE_MAX_RETRIES", "3"))
+VAULT_WRITE_RETRY_BACKOFF_SECONDS = float(os.getenv("VAULT_WRITE_RETRY_BACKOFF_SECONDS", "0.5"))
+
+# Bounds the number of synchronous Vault writes in flight across all claims
+_executor = ThreadPoolExecutor(max_workers=VAULT_WRITE_WORKERS, thread_name_prefix="vault-write")
+
+
+class TokenWriteBehind:
+    """
+    Stores auth tokens in Vault, and deletes them, in the background.
+
+    Tokens (and deletions, queued as a None token) are queued on one of `workers` bounded queues, chosen by eid, each drained by its own
+    thread, so writes of different eids proceed concurrently while the writes of one eid stay in
+    order. Failed writes are retried `max_retries` times with exponential backoff, then logged and
+    dropped. When a queue is full the caller writes the token itself, which slows claims down
+    instead of growing the backlog without bound.
+    """
+
+    def __init__(self, store: Callable[[str, str], None] = store_auth_token, delete: Callable[[str], None] = delete_auth_token,
+                 workers: int = VAULT_WRITE_WORKERS,
+                 queue_size: int = VAULT_WRITE_QUEUE_SIZE, max_retries: int = VAULT_WRITE_MAX_RETRIES,
+                 retry_backoff: float = VAULT_WRITE_RETRY_BACKOFF_SECONDS):
+        """
+        Args:
+            store (callable): Stores one token, raising on failure.
+            delete (callable): Deletes the token of an eid, raising on failure.
+            workers (int): The number of queues and writer threads.
+            queue_size (int): The capacity of each queue.
+            max_retries (int): How many times a failed write is retried.
+            retry_backoff (float): The delay before the first retry, doubled for every further one.
+        """
+        self.store = store
+        self.delete = delete
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queues: List["queue.Queue[Optional[Tuple[str, str]]]"] = [queue.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Starts the writer threads. Calling start twice is a no-op.
+        """
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._run, args=(tokens,), name=f"vault-write-behind-{index}", daemon=True)
+            for index, tokens in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Stops the writer threads once the tokens queued so far are written. Never blocks on a
+        full queue: its writer stops as soon as it has drained it.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait for each writer thread.
+        """
+        self._stopped.set()
+        for tokens in self._queues:
+            try:
+                tokens.put_nowait(None)
+            except queue.Full:
+                pass
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, eid: str, token: Optional[str]):
+        """
+        Queues a token to be stored, or None to delete the token of the eid, after the writes
+        already queued for it. The write happens right away if the queue is full or the writer is stopped.
+        """
+        if not self._stopped.is_set() and self._threads:
+            try:
+                self._queues[zlib.crc32(eid.encode()) % len(self._queues)].put_nowait((eid, token))
+                return
+            except queue.Full:
+                logger.warning(f"Vault write-behind queue is full, storing the token of '{eid}' synchronously")
+        self._write(eid, token)
+
+    def join(self):
+        """
+        Blocks until every queued token has been written or given up on.
+        """
+        for tokens in self._queues:
+            tokens.join()
+
+    def _run(self, tokens: "queue.Queue[Optional[Tuple[str, str]]]"):
+        while True:
+            item = tokens.get()
+            try:
+                if item is not None:
+                    self._write(*item)
+            finally:
+                tokens.task_done()
+            if self._stopped.is_set() and (item is None or tokens.empty()):
+                return
+
+    def _write(self, eid: str, token: Optional[str]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if token is None:
+                    self.delete(eid)
+                else:
+                    self.store(eid, token)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    action = "deleting the auth token of" if token is None else "storing the auth token of"
+                    logger.error(f"Giving up {action} '{eid}' in Vault: {e}")
+                    return
+                self._stopped.wait(self.retry_backoff * 2 ** attempt)
+
+
+token_write_behind = TokenWriteBehind()
+
+
+def store_auth_tokens(tokens: Dict[str, str], mode: str = None) -> Dict[str, str]:
+    """
+    Stores the auth tokens of a claim in Vault as selected by VAULT_TOKEN_STORAGE: not at all
+    ("off"), concurrently before returning ("sync") or in the background ("async").
+
+    Args:
+        tokens (dict): The tokens to store, keyed by eid.
+        mode (str): Overrides VAULT_TOKEN_STORAGE.
+
+    Returns:
+        dict: The eids whose token could not be stored with the error; only reported in "sync" mode.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    mode = mode or VAULT_TOKEN_STORAGE
+    if mode == OFF or not tokens:
+        return {}
+    if mode == ASYNC:
+        for eid, token in tokens.items():
+            token_write_behind.submit(eid, token)
+        return {}
+    if mode != SYNC:
+        raise ValueError(f"Unknown Vault token storage mode '{mode}'")
+
+    return _wait_for([(eid, _executor.submit(store_auth_token, eid, token)) for eid, token in tokens.items()])
+
+
+def delete_auth_tokens(eids: List[str], mode: str = None) -> Dict[str, str]:
+    """
+    Deletes the auth tokens of the given eids from Vault, the way `store_auth_tokens` stored
+    them: not at all ("off"), concurrently before returning ("sync") or in the background after
+    the writes already queued for the same eids ("async").
+
+    Args:
+        eids (List[str]): The eids whose tokens are deleted.
+        mode (str): Overrides VAULT_TOKEN_STORAGE.
+
+    Returns:
+        dict: The eids whose token could not be deleted with the error; only reported in "sync" mode.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    mode = mode or VAULT_TOKEN_STORAGE
+    if mode == OFF or not eids:
+        return {}
+    if mode == ASYNC:
+        for eid in eids:
+            token_write_behind.submit(eid, None)
+        return {}
+    if mode != SYNC:
+        raise ValueError(f"Unknown Vault token storage mode '{mode}'")
+    return _wait_for([(eid, _executor.submit(delete_auth_token, eid)) for eid in eids])
+
+
+def _wait_for(futures: List[Tuple[str, Future]]) -> Dict[str, str]:
+    failures = {}
+    for eid, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            failures[eid] = str(e)
+    return failures
+
+
+def start_token_writer():
+    """
+    Starts the Vault write-behind threads when tokens are stored asynchronously.
+    """
+    if VAULT_TOKEN_STORAGE == ASYNC:
+        token_write_behind.start()
+
+
+def stop_token_writer():
+    """
+    Writes the queued tokens and stops the Vault write-behind threads.
+    """
+    if VAULT_TOKEN_STORAGE == ASYNC:
+        token_write_behind.stop(timeout=30)
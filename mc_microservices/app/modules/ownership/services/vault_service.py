@@ -1,5 +1,9 @@
 import hvac
 import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Callable, List
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -7,11 +11,52 @@ load_dotenv()
 
 VAULT_URL = os.getenv("VAULT_URL")
 VAULT_TOKEN = os.getenv("VAULT_TOKEN")
+VAULT_POOL_MAXSIZE = int(os.getenv("VAULT_POOL_MAXSIZE", "32"))
+VAULT_CONNECT_RETRIES = int(os.getenv("VAULT_CONNECT_RETRIES", "2"))
+VAULT_TIMEOUT_SECONDS = float(os.getenv("VAULT_TIMEOUT_SECONDS", "10"))
 
-client = hvac.Client(
-    url=VAULT_URL,
-    token=VAULT_TOKEN,
-)
+_client = None
+_client_lock = threading.Lock()
+
+def get_vault_client() -> hvac.Client:
+    """
+    Returns the Vault client shared by the whole process.
+
+    Its session keeps connections to Vault alive and pools up to VAULT_POOL_MAXSIZE of them, so
+    concurrent reads and writes from the executor threads reuse connections instead of opening
+    one per call. Connection errors are retried VAULT_CONNECT_RETRIES times.
+
+    Returns:
+        hvac.Client: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=VAULT_POOL_MAXSIZE, max_retries=VAULT_CONNECT_RETRIES)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _client = hvac.Client(url=VAULT_URL, token=VAULT_TOKEN, timeout=VAULT_TIMEOUT_SECONDS, session=session)
+        return _client
+
+client = get_vault_client()
+
+# Called with the eid whenever its stored auth token is written or deleted
+_token_listeners: List[Callable[[str], None]] = []
+
+def add_token_listener(callback: Callable[[str], None]):
+    """
+    Registers a callback invoked with the eid whenever its auth token is stored or deleted, e.g.
+    to invalidate cached copies of the token.
+    """
+    _token_listeners.append(callback)
+
+def _notify_token_listeners(eid: str):
+    for callback in _token_listeners:
+        try:
+            callback(eid)
+        except Exception as e:
+            print(f"Auth token listener failed for user '{eid}': {e}")
 
 def store_auth_token(eid: str, token: str):
     """
@@ -34,6 +79,9 @@ def store_auth_token(eid: str, token: str):
     except Exception as e:
         print(f"Exception when storing auth token in Vault: {e}")
         raise Exception(f"Error storing auth token in Vault: {e}")
+    finally:
+        # The write may have gone through even if it failed, so cached copies are dropped either way
+        _notify_token_listeners(eid)
 
 def delete_auth_token(eid: str):
     """
@@ -51,4 +99,6 @@ def delete_auth_token(eid: str):
         print(f"Auth token for user '{eid}' deleted from Vault successfully.")
     except Exception as e:
         print(f"Exception when deleting auth token from Vault: {e}")
-        raise Exception(f"Error deleting auth token from Vault: {e}")
\ No newline at end of file
+        raise Exception(f"Error deleting auth token from Vault: {e}")
+    finally:
+        _notify_token_listeners(eid)
\ No newline at end of file
@@ -0,0 +1,37 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+
+# Shared, bounded pool for the blocking Kubernetes, Vault, HTTP and subprocess calls made by the routers
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking call on the shared executor so that it does not stall the event loop.
+
+    Args:
+        func (callable): The blocking function to call.
+        *args: Positional arguments passed to `func`.
+        **kwargs: Keyword arguments passed to `func`.
+
+    Returns:
+        The return value of `func`. Exceptions raised by `func` are re-raised in the caller.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """
+    Shuts the shared executor down without waiting for calls still in flight.
+    """
+    _executor.shutdown(wait=False)
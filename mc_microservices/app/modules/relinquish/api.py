@@ -1,11 +1,17 @@
 from fastapi import APIRouter, HTTPException
-from kubernetes import client
 from kubernetes.client.rest import ApiException
-from app.modules.ownership.services.kubernetes_service import update_inventory_status
+from typing import List, Tuple
+from app.modules.ownership.services.kubernetes_service import update_inventory_status, get_playground_owners, has_playground_owners, get_playground_namespaces, remove_ownership_records, release_playgrounds, ownership_store
+from app.modules.ownership.services.role_binding_service import delete_role_binding, delete_role_bindings
+from app.modules.ownership.models.lease import Lease, lease_key
 import os
 from dotenv import load_dotenv
-from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+from app.modules.ownership.utils.executor import run_blocking
+from app.modules.ownership.utils.logger import logger
+from prometheus_client import Gauge
+from .expiry_scheduler import ExpiryScheduler
+from .leader_election import LeaderElector
+from .schemas import BatchRelinquishRequest, BatchRelinquishResponse
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,6 +19,9 @@ load_dotenv()
 # Load environment variables
 NAMESPACE = os.getenv("NAMESPACE", "default")
 OWNERSHIP_CONFIGMAP_NAME = os.getenv("OWNERSHIP_CONFIGMAP_NAME", "ownership-configmap")
+LEADER_ELECTION_ENABLED = os.getenv("LEADER_ELECTION_ENABLED", "true").lower() == "true"
+SWEEPER_LEASE_NAME = os.getenv("SWEEPER_LEASE_NAME", "mc-expiry-sweeper")
+RELINQUISH_BATCH_MAX_ITEMS = int(os.getenv("RELINQUISH_BATCH_MAX_ITEMS", "500"))
 
 router = APIRouter()
 
@@ -27,58 +36,120 @@ def check_all_eids_relinquished(pg_id: str) -> bool:
         bool: True if all eids are relinquished, False otherwise.
     """
     try:
-        # Get the existing ConfigMap
-        api_instance = client.CoreV1Api()
-        config_map = api_instance.read_namespaced_config_map(name=OWNERSHIP_CONFIGMAP_NAME, namespace=NAMESPACE)
-
         # Check if any eids are still associated with the pg_id
-        for key in config_map.data.keys():
-            if key.startswith(pg_id):
-                return False
-
-        return True
+        return not has_playground_owners(pg_id)
     except ApiException as e:
         raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking eids: {e}")
 
-def relinquish_expired_eids():
+def relinquish_leases(leases: List[Lease]) -> Tuple[List[Lease], List[Tuple[Lease, str]], List[str]]:
     """
-    Relinquishes ownership of resources for expired eids by deleting the associated Kubernetes RoleBinding and updating the inventory ConfigMap.
+    Relinquishes leases: deletes their RoleBindings concurrently, removes the leases whose
+    RoleBinding is gone from the ownership store in one write and sets the playgrounds left
+    without owners to "available" in one inventory transaction.
+
+    Args:
+        leases (List[Lease]): The leases to relinquish.
+
+    Returns:
+        tuple: The relinquished leases, the leases that could not be relinquished with the error,
+            and the playgrounds that were released.
+
+    Raises:
+        HTTPException: If the ownership store or the inventory could not be updated.
     """
-    try:
-        # Get the existing ConfigMap
-        api_instance = client.CoreV1Api()
-        config_map = api_instance.read_namespaced_config_map(name=OWNERSHIP_CONFIGMAP_NAME, namespace=NAMESPACE)
+    if not leases:
+        return [], [], []
 
-        # Check for expired eids and relinquish them
-        for key, expiration_date in config_map.data.items():
-            pg_id, eid = key.split('-')
-            if expiration_date >= datetime.utcnow():
-                # Delete the RoleBinding
-                role_binding_name = f"map-{eid}"
-                api_instance.delete_namespaced_role_binding(name=role_binding_name, namespace=NAMESPACE)
+    # RoleBindings live in the namespace of the playground
+    namespaces = get_playground_namespaces({lease.pg_id for lease in leases})
+    results = delete_role_bindings([(lease.eid, namespaces.get(lease.pg_id, NAMESPACE)) for lease in leases])
 
-                # Update inventory ConfigMap status to "available" if all eids are relinquished
-                if check_all_eids_relinquished(pg_id):
-                    update_inventory_status(pg_id, "available")
+    relinquished, failed = [], []
+    for lease, result in zip(leases, results):
+        if result.success:
+            relinquished.append(lease)
+        else:
+            failed.append((lease, result.error))
 
-                # Remove the eid from the ownership ConfigMap
-                del config_map.data[key]
+    remove_ownership_records([lease.key for lease in relinquished])
+    released = sorted({lease.pg_id for lease in relinquished if not has_playground_owners(lease.pg_id)})
+    release_playgrounds(released)
+    return relinquished, failed, released
 
-        # Apply the updated ConfigMap
-        api_instance.patch_namespaced_config_map(name=OWNERSHIP_CONFIGMAP_NAME, namespace=NAMESPACE, body=config_map)
+def relinquish_expired_leases(leases: List[Lease]) -> List[Lease]:
+    """
+    Relinquishes a batch of expired leases: deletes their RoleBindings concurrently, removes them
+    from the ownership store in one write and sets playgrounds left without owners to "available".
+    Leases that were renewed or relinquished since they were scheduled are skipped.
 
-        print("Expired eids relinquished successfully.")
-    except ApiException as e:
-        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error relinquishing expired eids: {e}")
+    Args:
+        leases (List[Lease]): The expired leases.
+
+    Returns:
+        List[Lease]: The leases whose RoleBinding could not be deleted, to be retried later.
+
+    Raises:
+        HTTPException: If the ownership store or the inventory could not be updated.
+    """
+    leases = [lease for lease in leases if ownership_store.get(lease.key) == lease.expires_at]
+    relinquished, failed, _ = relinquish_leases(leases)
+    for lease, error in failed:
+        logger.error(f"Could not delete the RoleBinding of expired lease '{lease.key}': {error}")
+    print(f"{len(relinquished)} expired leases relinquished.")
+    return [lease for lease, _ in failed]
+
+SWEEPER_LEADER = Gauge("mc_expiry_sweeper_leader", "1 if this process is the elected leader running the lease expiry sweeper, 0 otherwise")
+
+# Relinquishes leases as they expire; fed with every lease change seen by the ownership store.
+# Every process keeps its schedule current, but only the elected leader runs it, so a new leader
+# can take over without rebuilding it.
+expiry_scheduler = ExpiryScheduler(relinquish_expired_leases)
+ownership_store.add_listener(expiry_scheduler.apply_changes)
+
+def start_leading():
+    """
+    Starts the expiry sweeper when this process becomes the leader.
+    """
+    expiry_scheduler.start()
+    SWEEPER_LEADER.set(1)
+
+def stop_leading():
+    """
+    Stops the expiry sweeper when this process stops being the leader.
+    """
+    SWEEPER_LEADER.set(0)
+    expiry_scheduler.stop()
+
+sweeper_elector = LeaderElector(SWEEPER_LEASE_NAME, NAMESPACE, start_leading, stop_leading)
+
+def start_expiry_scheduler():
+    """
+    Starts relinquishing leases as they expire: campaigns for the sweeper Lease, or runs the
+    sweeper right away when leader election is disabled.
+    """
+    if LEADER_ELECTION_ENABLED:
+        sweeper_elector.start()
+    else:
+        start_leading()
+
+def stop_expiry_scheduler():
+    """
+    Stops relinquishing expired leases and hands the sweeper Lease over to another replica.
+    """
+    if LEADER_ELECTION_ENABLED:
+        sweeper_elector.stop()
+    stop_leading()
 
-# Schedule the relinquish_expired_eids function to run every day
-scheduler = BackgroundScheduler()
-scheduler.add_job(relinquish_expired_eids, 'interval', days=1)
-scheduler.start()
+def expiry_sweeper_is_running() -> bool:
+    """
+    Whether expired leases are being relinquished: this process campaigns for the sweeper Lease
+    and, while it leads (or when leader election is disabled), the expiry scheduler runs.
+    """
+    if LEADER_ELECTION_ENABLED:
+        return sweeper_elector.is_running and (not sweeper_elector.is_leader or expiry_scheduler.is_running)
+    return expiry_scheduler.is_running
 
 @router.delete("/relinquish_ownership")
 async def relinquish_ownership(pg_id: str, eid: str):
@@ -96,19 +167,91 @@ async def relinquish_ownership(pg_id: str, eid: str):
         HTTPException: If there is an error during the relinquishment process.
     """
     try:
-        role_binding_name = f"map-{eid}"
+        key = lease_key(pg_id, eid)
+        if await run_blocking(ownership_store.get, key) is None:
+            raise HTTPException(status_code=404, detail=f"'{eid}' does not own playground '{pg_id}'")
+
+        # Delete the RoleBinding in the namespace of the playground
+        namespaces = await run_blocking(get_playground_namespaces, [pg_id])
+        result = await run_blocking(delete_role_binding, eid, namespaces.get(pg_id, NAMESPACE))
+        if not result.success:
+            raise HTTPException(status_code=500, detail=f"Error deleting RoleBinding: {result.error}")
 
-        # Delete the RoleBinding
-        api_instance = client.RbacAuthorizationV1Api()
-        api_instance.delete_namespaced_role_binding(name=role_binding_name, namespace=NAMESPACE)
+        # Remove the lease from the ownership store
+        await run_blocking(remove_ownership_records, [key])
 
         # Check if all eids associated with the pg_id are relinquished
-        if check_all_eids_relinquished(pg_id):
+        if await run_blocking(check_all_eids_relinquished, pg_id):
             # Update inventory ConfigMap status to "available"
-            update_inventory_status(pg_id, "available")
+            await run_blocking(update_inventory_status, pg_id, "available")
 
         return {"status": "Ownership relinquished successfully"}
+    except HTTPException:
+        raise
+    except ApiException as e:
+        raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error relinquishing ownership: {e}")
+
+def relinquish_batch(pairs: List[Tuple[str, str]]) -> dict:
+    """
+    Relinquishes the given (pg_id, eid) pairs together. Pairs that are not held are reported with
+    status 404; the others are relinquished with `relinquish_leases`.
+
+    Args:
+        pairs (List[Tuple[str, str]]): The (pg_id, eid) pairs to relinquish.
+
+    Returns:
+        dict: The per-pair results in request order and the released playgrounds.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    leases, results = [], {}
+    for pg_id, eid in pairs:
+        expires_at = ownership_store.get(lease_key(pg_id, eid))
+        if expires_at is None:
+            results[(pg_id, eid)] = {"pg_id": pg_id, "eid": eid, "status_code": 404, "error": f"'{eid}' does not own playground '{pg_id}'"}
+        else:
+            leases.append(Lease(pg_id, eid, expires_at))
+
+    relinquished, failed, released = relinquish_leases(leases)
+    for lease in relinquished:
+        results[(lease.pg_id, lease.eid)] = {"pg_id": lease.pg_id, "eid": lease.eid, "status_code": 200}
+    for lease, error in failed:
+        results[(lease.pg_id, lease.eid)] = {"pg_id": lease.pg_id, "eid": lease.eid, "status_code": 500, "error": error}
+    return {"results": [results[pair] for pair in pairs], "released_playgrounds": released}
+
+@router.post("/relinquish_ownership/batch", response_model=BatchRelinquishResponse)
+async def relinquish_ownership_batch(request: BatchRelinquishRequest):
+    """
+    Relinquishes many leases in one request: all (or the listed) owners of a playground, or a list
+    of (pg_id, eid) pairs. RoleBindings are deleted concurrently, the leases are removed in one
+    ownership write and released playgrounds are set to "available" in one inventory write.
+
+    Args:
+        request (BatchRelinquishRequest): Either `pg_id` with optional `eids`, or `pairs`.
+
+    Returns:
+        dict: The per-eid results, in request order, and the playgrounds that were released.
+
+    Raises:
+        HTTPException: If the request is invalid or too large, or the stores cannot be updated.
+    """
+    if (request.pg_id is None) == (request.pairs is None) or (request.eids is not None and request.pg_id is None):
+        raise HTTPException(status_code=400, detail="Either 'pg_id' (with optional 'eids') or 'pairs' must be given")
+    try:
+        if request.pairs is not None:
+            pairs = [(pair.pg_id, pair.eid) for pair in request.pairs]
+        elif request.eids is not None:
+            pairs = [(request.pg_id, eid) for eid in request.eids]
+        else:
+            owners = await run_blocking(get_playground_owners, request.pg_id)
+            pairs = [(request.pg_id, eid) for eid in sorted(owners)]
+        if len(pairs) > RELINQUISH_BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {RELINQUISH_BATCH_MAX_ITEMS} leases can be relinquished in one request")
+        return await run_blocking(relinquish_batch, pairs)
+    except HTTPException:
+        raise
     except ApiException as e:
         raise HTTPException(status_code=500, detail=f"Kubernetes API error: {e}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error relinquishing ownership: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error relinquishing ownership: {e}")
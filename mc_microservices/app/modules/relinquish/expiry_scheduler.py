@@ -0,0 +1,184 @@
+import datetime
+import heapq
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from app.modules.ownership.models.lease import Lease
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "100"))
+EXPIRY_RETRY_SECONDS = float(os.getenv("EXPIRY_RETRY_SECONDS", "30"))
+EXPIRY_STOP_TIMEOUT_SECONDS = float(os.getenv("EXPIRY_STOP_TIMEOUT_SECONDS", "30"))
+EXPIRY_MAX_WAIT_SECONDS = float(os.getenv("EXPIRY_MAX_WAIT_SECONDS", "300"))
+
+
+def parse_expiration(expires_at: str) -> datetime.datetime:
+    """
+    Parses the expiration date of an ownership lease, a naive ISO 8601 UTC timestamp.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 timestamp.
+    """
+    return datetime.datetime.fromisoformat(expires_at)
+
+
+class ExpiryScheduler:
+    """
+    Relinquishes ownership leases when they expire.
+
+    Leases are kept in a min-heap ordered by expiration date and a background thread sleeps until
+    the earliest one is due, so a lease is relinquished within moments of expiring and a wake-up
+    only costs as much as the leases that actually expired. The heap is maintained incrementally
+    from ownership store changes (see `apply_changes`). Entries of leases that were renewed or
+    relinquished in the meantime are not searched for but dropped when they reach the top.
+    """
+
+    def __init__(self, on_expired: Callable[[List[Lease]], Optional[List[Lease]]], batch_size: int = EXPIRY_BATCH_SIZE,
+                 retry_seconds: float = EXPIRY_RETRY_SECONDS):
+        """
+        Args:
+            on_expired (callable): Called from the scheduler thread with a batch of expired leases;
+                returns the leases it could not relinquish. Those (or the whole batch, if it raises)
+                are retried after `retry_seconds` unless they are renewed or removed meanwhile.
+            batch_size (int): The maximum number of leases passed to `on_expired` at once.
+            retry_seconds (float): The delay before leases of a failed batch are retried.
+        """
+        self.on_expired = on_expired
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[datetime.datetime, str]] = []
+        self._leases: Dict[str, Lease] = {}
+        self._due: Dict[str, datetime.datetime] = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._leases)
+
+    def apply_changes(self, changed: Dict[str, str], removed: Iterable[str]):
+        """
+        Folds ownership changes into the schedule. Registered as an ownership store listener.
+
+        Args:
+            changed (dict): Added or renewed leases as `{"{pg_id}-{eid}": expiration_date}`.
+            removed (Iterable[str]): The keys of relinquished leases.
+        """
+        with self._cond:
+            for key in removed:
+                self._leases.pop(key, None)
+                self._due.pop(key, None)
+            for key, expires_at in changed.items():
+                try:
+                    lease = Lease.parse(key, expires_at)
+                    due = parse_expiration(expires_at)
+                except ValueError as e:
+                    logger.error(f"Expiry scheduler: ignoring ownership entry '{key}': {e}")
+                    continue
+                self._schedule(lease, due)
+            self._cond.notify()
+
+    def next_deadline(self) -> datetime.datetime:
+        """
+        Returns when the earliest scheduled lease is due, or None if there is none.
+        """
+        with self._cond:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime.datetime) -> List[Lease]:
+        """
+        Takes up to `batch_size` leases that are due at `now` off the schedule, earliest first.
+        """
+        batch = []
+        with self._cond:
+            while len(batch) < self.batch_size:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, key = heapq.heappop(self._heap)
+                del self._due[key]
+                batch.append(self._leases[key])
+        return batch
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether the scheduler thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts the scheduler thread. Calling start twice is a no-op.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = EXPIRY_STOP_TIMEOUT_SECONDS):
+        """
+        Stops the scheduler thread and waits for it to finish the batch it is relinquishing, so
+        that no lease is relinquished once stop returns (e.g. after leadership is handed over).
+        Leases stay scheduled.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait for the scheduler thread.
+        """
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify()
+        thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Expiry scheduler: still relinquishing expired leases {timeout} seconds after being stopped")
+
+    def _schedule(self, lease: Lease, due: datetime.datetime):
+        self._leases[lease.key] = lease
+        if self._due.get(lease.key) != due:
+            self._due[lease.key] = due
+            heapq.heappush(self._heap, (due, lease.key))
+
+    def _drop_stale(self):
+        # Heap entries of leases that were renewed or removed are discarded lazily
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._cond:
+                deadline = self.next_deadline()
+                now = datetime.datetime.utcnow()
+                if deadline is None or deadline > now:
+                    # Leases can run for years; waits are capped and the schedule is re-evaluated on wake-up
+                    timeout = EXPIRY_MAX_WAIT_SECONDS if deadline is None else min((deadline - now).total_seconds(), EXPIRY_MAX_WAIT_SECONDS)
+                    self._cond.wait(timeout)
+                    continue
+            batch = self.pop_due(now)
+            if not batch:
+                continue
+            try:
+                failed = self.on_expired(batch) or []
+            except Exception as e:
+                logger.error(f"Expiry scheduler: relinquishing {len(batch)} expired leases failed: {e}")
+                failed = batch
+            if failed:
+                self._retry(failed)
+
+    def _retry(self, leases: List[Lease]):
+        retry_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.retry_seconds)
+        with self._cond:
+            for lease in leases:
+                # Only leases that are still held and were not renewed meanwhile are retried
+                if self._leases.get(lease.key) == lease and lease.key not in self._due:
+                    self._schedule(lease, retry_at)
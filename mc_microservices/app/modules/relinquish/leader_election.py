@@ -0,0 +1,226 @@
+import datetime
+import os
+import socket
+import threading
+import time
+from typing import Callable
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from dotenv import load_dotenv
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+LEADER_ELECTION_LEASE_DURATION_SECONDS = float(os.getenv("LEADER_ELECTION_LEASE_DURATION_SECONDS", "15"))
+LEADER_ELECTION_RENEW_DEADLINE_SECONDS = float(os.getenv("LEADER_ELECTION_RENEW_DEADLINE_SECONDS", "10"))
+LEADER_ELECTION_RETRY_PERIOD_SECONDS = float(os.getenv("LEADER_ELECTION_RETRY_PERIOD_SECONDS", "2"))
+
+
+def default_identity() -> str:
+    """
+    Returns an identity unique to this process: the pod name (or host name) and the process ID, so
+    that several uvicorn workers of one pod are distinct candidates.
+    """
+    return f"{os.getenv('POD_NAME') or socket.gethostname()}-{os.getpid()}"
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class LeaderElector:
+    """
+    Elects a single leader among the processes sharing a coordination.k8s.io/v1 Lease.
+
+    Candidates try to acquire the Lease every `retry_period` seconds. The holder renews it at the
+    same pace and steps down if it could not renew it for `renew_deadline` seconds; the others take
+    over once the holder has not renewed it for `lease_duration` seconds. Expiry is measured with
+    the local monotonic clock from when a candidate last saw the Lease change, so clock skew between
+    nodes does not matter. Updates are replaces with the Lease's resourceVersion, so two candidates
+    cannot both win. A leader that stops releases the Lease, so another candidate takes over
+    within one retry period instead of waiting for the Lease to expire.
+    """
+
+    def __init__(self, name: str, namespace: str, on_started_leading: Callable[[], None], on_stopped_leading: Callable[[], None],
+                 identity: str = None, lease_duration: float = LEADER_ELECTION_LEASE_DURATION_SECONDS,
+                 renew_deadline: float = LEADER_ELECTION_RENEW_DEADLINE_SECONDS,
+                 retry_period: float = LEADER_ELECTION_RETRY_PERIOD_SECONDS, api_instance: client.CoordinationV1Api = None):
+        """
+        Args:
+            name (str): The name of the Lease.
+            namespace (str): The namespace of the Lease.
+            on_started_leading (callable): Called from the election thread when this process becomes the leader.
+            on_stopped_leading (callable): Called from the election thread when this process stops being the leader.
+            identity (str): The identity of this candidate. Defaults to `default_identity()`.
+            lease_duration (float): How long others wait after the last renewal before taking over.
+            renew_deadline (float): How long the leader keeps leading without a successful renewal.
+            retry_period (float): The interval between acquire and renew attempts.
+            api_instance (client.CoordinationV1Api): The API client to use.
+
+        Raises:
+            ValueError: If the durations do not satisfy lease_duration > renew_deadline > retry_period.
+        """
+        if not lease_duration > renew_deadline > retry_period > 0:
+            raise ValueError("Leader election needs lease_duration > renew_deadline > retry_period > 0")
+        self.name = name
+        self.namespace = namespace
+        self.identity = identity or default_identity()
+        self.on_started_leading = on_started_leading
+        self.on_stopped_leading = on_stopped_leading
+        self.lease_duration = lease_duration
+        self.renew_deadline = renew_deadline
+        self.retry_period = retry_period
+        self.api_instance = api_instance or client.CoordinationV1Api()
+        self._leading = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._observed = None
+        self._observed_at = 0.0
+        self._renewed_at = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        """
+        Whether this process currently holds the Lease.
+        """
+        return self._leading.is_set()
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether the election thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts campaigning in a daemon thread. Calling start twice is a no-op.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=f"leader-election-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Stops campaigning. A leader steps down and releases the Lease.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait for the election thread.
+        """
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def try_acquire_or_renew(self) -> bool:
+        """
+        Makes one attempt to acquire or renew the Lease.
+
+        Returns:
+            bool: True if this process holds the Lease afterwards.
+        """
+        now = _now()
+        try:
+            lease = self.api_instance.read_namespaced_lease(name=self.name, namespace=self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            body = client.V1Lease(
+                metadata=client.V1ObjectMeta(name=self.name),
+                spec=self._spec(acquire_time=now, renew_time=now, transitions=0),
+            )
+            try:
+                self.api_instance.create_namespaced_lease(namespace=self.namespace, body=body)
+            except ApiException as e:
+                if e.status == 409:
+                    return False
+                raise
+            self._renewed_at = time.monotonic()
+            return True
+
+        spec = lease.spec or client.V1LeaseSpec()
+        record = (spec.holder_identity, spec.renew_time, spec.lease_transitions)
+        if record != self._observed:
+            self._observed = record
+            self._observed_at = time.monotonic()
+
+        held_by_us = spec.holder_identity == self.identity
+        held_by_other = bool(spec.holder_identity) and not held_by_us
+        duration = spec.lease_duration_seconds or self.lease_duration
+        if held_by_other and self._observed_at + duration > time.monotonic():
+            return False
+
+        transitions = spec.lease_transitions or 0
+        if held_by_us:
+            lease.spec = self._spec(acquire_time=spec.acquire_time or now, renew_time=now, transitions=transitions)
+        else:
+            lease.spec = self._spec(acquire_time=now, renew_time=now, transitions=transitions + 1)
+        try:
+            self.api_instance.replace_namespaced_lease(name=self.name, namespace=self.namespace, body=lease)
+        except ApiException as e:
+            if e.status == 409:
+                return False
+            raise
+        self._renewed_at = time.monotonic()
+        return True
+
+    def release(self):
+        """
+        Gives up the Lease if this process holds it, so that another candidate can take over immediately.
+        """
+        try:
+            lease = self.api_instance.read_namespaced_lease(name=self.name, namespace=self.namespace)
+            if lease.spec is None or lease.spec.holder_identity != self.identity:
+                return
+            lease.spec.holder_identity = None
+            lease.spec.renew_time = _now()
+            self.api_instance.replace_namespaced_lease(name=self.name, namespace=self.namespace, body=lease)
+        except ApiException as e:
+            logger.error(f"Leader election '{self.name}': could not release the Lease: {e}")
+
+    def _spec(self, acquire_time: datetime.datetime, renew_time: datetime.datetime, transitions: int) -> client.V1LeaseSpec:
+        return client.V1LeaseSpec(
+            holder_identity=self.identity,
+            lease_duration_seconds=int(round(self.lease_duration)),
+            acquire_time=acquire_time,
+            renew_time=renew_time,
+            lease_transitions=transitions,
+        )
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                acquired = self.try_acquire_or_renew()
+            except Exception as e:
+                logger.error(f"Leader election '{self.name}': {e}")
+                acquired = False
+
+            if acquired and not self.is_leader:
+                print(f"Leader election '{self.name}': '{self.identity}' became the leader.")
+                self._leading.set()
+                self._callback(self.on_started_leading)
+            elif not acquired and self.is_leader and (self._lost() or time.monotonic() - self._renewed_at > self.renew_deadline):
+                print(f"Leader election '{self.name}': '{self.identity}' lost the Lease and stepped down.")
+                self._step_down()
+            self._stopped.wait(self.retry_period)
+
+        if self.is_leader:
+            self._step_down()
+            self.release()
+
+    def _lost(self) -> bool:
+        # Another candidate took the Lease over, e.g. after this process stalled past the lease duration
+        return self._observed is not None and self._observed[0] not in (None, self.identity)
+
+    def _step_down(self):
+        self._leading.clear()
+        self._callback(self.on_stopped_leading)
+
+    def _callback(self, callback: Callable[[], None]):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Leader election '{self.name}': callback failed: {e}")
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class RelinquishPair(BaseModel):
+    pg_id: str
+    eid: str
+
+class BatchRelinquishRequest(BaseModel):
+    # Either a playground (all of its owners, or only `eids`) or explicit (pg_id, eid) pairs
+    pg_id: Optional[str] = None
+    eids: Optional[List[str]] = None
+    pairs: Optional[List[RelinquishPair]] = None
+
+class RelinquishResult(BaseModel):
+    pg_id: str
+    eid: str
+    status_code: int
+    error: Optional[str] = None
+
+class BatchRelinquishResponse(BaseModel):
+    results: List[RelinquishResult]
+    released_playgrounds: List[str]
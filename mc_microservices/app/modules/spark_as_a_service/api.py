@@ -1,11 +1,18 @@
-import subprocess
 import os
 import json
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+import hashlib
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from typing import List
-from .schemas import TriggerSparkPipelineRequest, TriggerSparkPipelineResponse
-from .utils import validate_token
+from .schemas import TriggerSparkPipelineRequest, TriggerSparkPipelineResponse, SparkJobStatusResponse, SparkSubmissionStatusResponse
+from .artifact_store import ArtifactStore
+from .pipeline_service import build_pipeline_run, create_pipeline_run
+from .job_status import JobStatus, PipelineRunCache
+from .submission_queue import SUBMITTED, QueueFull, Submission, SubmissionQueue
+from .utils import UploadBudget, sanitize_filename, create_staging_dir, remove_staging_dir, save_upload
+from app.modules.validate.service import validate_playground_token
 from app.modules.ownership.utils.logger import logger
+from app.modules.ownership.utils.executor import run_blocking
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -13,104 +20,233 @@ load_dotenv()
 
 # Load environment variables
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/app/uploaded_files")
-KUBERNETES_SERVICE_HOST = os.getenv("KUBERNETES_SERVICE_HOST")
-KUBERNETES_TOKEN = os.getenv("KUBERNETES_TOKEN")
 NAMESPACE = os.getenv("NAMESPACE", "default")
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", os.path.join(UPLOAD_DIR, "artifacts"))
+ARTIFACT_STORE_MAX_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_BYTES", str(10 * 1024 * 1024 * 1024)))
+SPARK_STATUS_MAX_WAIT_SECONDS = float(os.getenv("SPARK_STATUS_MAX_WAIT_SECONDS", "60"))
+SPARK_STATUS_HEARTBEAT_SECONDS = float(os.getenv("SPARK_STATUS_HEARTBEAT_SECONDS", "15"))
+SPARK_SUBMISSION_RETRY_AFTER_SECONDS = int(os.getenv("SPARK_SUBMISSION_RETRY_AFTER_SECONDS", "5"))
+
+# Uploaded files, deduplicated by content
+artifact_store = ArtifactStore(ARTIFACT_STORE_DIR, ARTIFACT_STORE_MAX_BYTES)
+
+# The status of the PipelineRuns in NAMESPACE, fed by one shared watch
+job_status_cache = PipelineRunCache(NAMESPACE)
+
+def start_job_status_cache():
+    """
+    Starts watching the PipelineRuns.
+    """
+    job_status_cache.start()
+
+def stop_job_status_cache():
+    """
+    Stops watching the PipelineRuns.
+    """
+    job_status_cache.stop()
+
+def _create_pipeline_run(pipeline_run: dict):
+    return create_pipeline_run(pipeline_run, NAMESPACE)
+
+def _release_artifacts(submission: Submission):
+    """
+    Releases the artifacts of a processed submission. The PipelineRun of a submitted job reads
+    them while it runs, so they are only released once the job status cache reports it finished
+    or deleted; until then, and for at most ARTIFACT_MAX_HOLD_SECONDS, they cannot be evicted.
+    """
+    artifacts = submission.artifacts
+    if submission.status == SUBMITTED:
+        job_status_cache.when_finished(submission.run_name, lambda: artifact_store.release(artifacts))
+    else:
+        artifact_store.release(artifacts)
+
+# Creates the PipelineRuns of accepted submissions in the background
+submission_queue = SubmissionQueue(_create_pipeline_run, _release_artifacts)
+
+def start_submission_queue():
+    """
+    Starts the Spark submission workers.
+    """
+    submission_queue.start()
+
+def stop_submission_queue():
+    """
+    Processes the queued Spark submissions and stops the workers.
+    """
+    submission_queue.stop(timeout=30)
+
+def _queue_full() -> HTTPException:
+    return HTTPException(status_code=429, detail="Too many Spark submissions in progress, try again later",
+                         headers={"Retry-After": str(SPARK_SUBMISSION_RETRY_AFTER_SECONDS)})
 
 router = APIRouter()
 
-@router.post("/trigger_spark_pipeline", response_model=TriggerSparkPipelineResponse)
+@router.post("/trigger_spark_pipeline", response_model=TriggerSparkPipelineResponse, status_code=202)
 async def trigger_spark_pipeline(
+    request: Request,
     pg_id: str = Form(...),
     auth_token: str = Form(...),
     sparkyaml: UploadFile = File(...),
     pyfiles: List[UploadFile] = File(...)
 ):
     """
-    Triggers a Tekton pipeline to run a Spark job.
+    Accepts a Spark job and queues the creation of the Tekton pipeline running it. The uploads are
+    stored before answering; the PipelineRun is created in the background.
 
     Args:
+        request (Request): The incoming request.
         pg_id (str): The playground ID.
         auth_token (str): The authorization token.
         sparkyaml (UploadFile): The Spark YAML file.
         pyfiles (List[UploadFile]): The list of Python files.
 
     Returns:
-        dict: A dictionary containing the status of the pipeline trigger.
+        dict: The submission id and the URL of its status.
+
+    Raises:
+        HTTPException: 401 if the token does not grant access to the playground, 413 if an upload
+            exceeds its size limit, 429 (with Retry-After) if the submission queue is full, 500 if
+            the uploads cannot be stored.
     """
+    staging_dir = None
+    artifacts = []
     try:
-        # Validate the authorization token
-        # if not validate_token(pg_id, auth_token):
-        #     raise HTTPException(status_code=401, detail="Invalid authorization token")
-
-        # Ensure the uploaded_files directory exists
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-        # Save the uploaded Spark YAML file to disk
-        sparkyaml_path = os.path.join(UPLOAD_DIR, sparkyaml.filename)
-        with open(sparkyaml_path, "wb") as f:
-            f.write(await sparkyaml.read())
-
-        # Save the uploaded Python files to disk
-        pyfile_paths = []
-        for pyfile in pyfiles:
-            pyfile_path = os.path.join(UPLOAD_DIR, pyfile.filename)
-            pyfile_paths.append(pyfile_path)
-            with open(pyfile_path, "wb") as f:
-                f.write(await pyfile.read())
-
-        # Create a PipelineRun JSON object
-        pipeline_run_json = {
-            "apiVersion": "tekton.dev/v1beta1",
-            "kind": "PipelineRun",
-            "metadata": {
-                "generateName": "spark-pipeline-run-"
-            },
-            "spec": {
-                "pipelineRef": {
-                    "name": "bitbucket-pr-pipeline"
-                },
-                "workspaces": [
-                    {
-                        "name": "shared-workspace",
-                        "persistentVolumeClaim": {
-                            "claimName": "pvc-spark"
-                        }
-                    }
-                ],
-                "params": [
-                    {
-                        "name": "sparkyaml",
-                        "value": sparkyaml_path
-                    }
-                ]
-            }
+        # Shed load before reading the uploads
+        if submission_queue.is_full():
+            raise _queue_full()
+
+        # Validate the authorization token in process
+        validation = await validate_playground_token(pg_id, auth_token)
+        if not validation.is_valid:
+            raise HTTPException(status_code=401, detail="Invalid authorization token")
+
+        # Stage the uploads of this request in a directory of its own, so that concurrent
+        # requests with the same file names do not overwrite each other
+        staging_dir = await run_blocking(create_staging_dir, UPLOAD_DIR)
+        budget = UploadBudget()
+        taken = set()
+
+        async def store_upload(upload: UploadFile) -> str:
+            # Stream the upload to disk while hashing it, then keep it under its content hash
+            staged_path = os.path.join(staging_dir, sanitize_filename(upload.filename, taken))
+            hasher = hashlib.sha256()
+            await save_upload(upload, staged_path, budget, hasher)
+            path = await run_blocking(artifact_store.put, staged_path, hasher.hexdigest(), os.path.splitext(staged_path)[1].lower())
+            artifacts.append(path)
+            return path
+
+        # Store the uploaded Spark YAML file
+        sparkyaml_path = await store_upload(sparkyaml)
+
+        # Store the uploaded Python files
+        pyfile_paths = [await store_upload(pyfile) for pyfile in pyfiles]
+
+        # Queue the creation of the PipelineRun, which takes over the artifacts
+        pipeline_run = build_pipeline_run(sparkyaml_path, pyfile_paths)
+        try:
+            submission = submission_queue.submit(pipeline_run, artifacts)
+        except QueueFull:
+            raise _queue_full()
+        artifacts = []
+
+        return {
+            "submission_id": submission.submission_id,
+            "status": submission.status,
+            "status_url": request.url_for("spark_submission_status", submission_id=submission.submission_id).path,
         }
+    except HTTPException as e:
+        logger.error(f"Error triggering Tekton pipeline: {e.detail}")
+        raise
+    except Exception as e:
+        logger.error(f"Error triggering Tekton pipeline: {e}")
+        raise HTTPException(status_code=500, detail=f"Error triggering Tekton pipeline: {str(e)}")
+    finally:
+        # The artifacts of a rejected submission stay in the store, evictable as no submission uses them
+        await run_blocking(artifact_store.release, artifacts)
+        if staging_dir is not None:
+            await run_blocking(remove_staging_dir, staging_dir)
+
+@router.get("/submissions/{submission_id}", response_model=SparkSubmissionStatusResponse)
+async def spark_submission_status(submission_id: str):
+    """
+    Returns the status of a Spark submission: "Queued", "Submitting", then "Submitted" with the
+    name of its PipelineRun (see `spark_job_status`) or "Failed" with the error.
 
-        for i, pyfile_path in enumerate(pyfile_paths):
-            pipeline_run_json["spec"]["params"].append({
-                "name": f"pyfile{i+1}",
-                "value": pyfile_path
-            })
+    Raises:
+        HTTPException: 404 if the submission is not known.
+    """
+    submission = submission_queue.get(submission_id)
+    if submission is None:
+        raise HTTPException(status_code=404, detail=f"Spark submission '{submission_id}' not found")
+    return submission.to_dict()
 
-        # Convert the PipelineRun JSON object to a string
-        pipeline_run_json_str = json.dumps(pipeline_run_json)
+def _require_job_status_cache():
+    if not job_status_cache.has_synced:
+        raise HTTPException(status_code=503, detail="Spark job status is not available yet")
 
-        # Execute the kubectl command to create the PipelineRun
-        kubectl_command = [
-            "kubectl", "create", "-f", "-"
-        ]
-        result = subprocess.run(kubectl_command, input=pipeline_run_json_str, capture_output=True, text=True)
+@router.get("/spark_job_status", response_model=SparkJobStatusResponse)
+async def spark_job_status(job_id: str, wait: float = 0):
+    """
+    Returns the status of a Spark job from the PipelineRun cache.
 
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"Failed to trigger Tekton pipeline: {result.stderr}")
+    Args:
+        job_id (str): The name of the PipelineRun, as returned by `trigger_spark_pipeline`.
+        wait (float): If given and the job has not finished, wait up to this many seconds (at most
+            SPARK_STATUS_MAX_WAIT_SECONDS) for its next state transition before answering.
 
-        # Delete the uploaded files after successful pipeline trigger
-        os.remove(sparkyaml_path)
-        for pyfile_path in pyfile_paths:
-            os.remove(pyfile_path)
+    Returns:
+        dict: The state of the job with the reason and message of its latest condition.
 
-        return {"status": "Pipeline triggered successfully", "output": result.stdout}
-    except Exception as e:
-        logger.error(f"Error triggering Tekton pipeline: {e}")
-        raise HTTPException(status_code=500, detail=f"Error triggering Tekton pipeline: {str(e)}")
\ No newline at end of file
+    Raises:
+        HTTPException: 404 if the job is not known, 503 if the cache has not synced yet.
+    """
+    _require_job_status_cache()
+    job = job_status_cache.get(job_id)
+    if wait > 0 and (job is None or not job.is_terminal):
+        job = await job_status_cache.wait_for_transition(job_id, -1 if job is None else job.version, min(wait, SPARK_STATUS_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Spark job '{job_id}' not found")
+    return job.to_dict()
+
+def _status_event(job: JobStatus) -> str:
+    return f"id: {job.version}\nevent: status\ndata: {json.dumps(job.to_dict())}\n\n"
+
+@router.get("/spark_job_status/stream")
+async def spark_job_status_stream(job_id: str):
+    """
+    Streams the state transitions of a Spark job as server-sent events, starting with its current
+    state and ending once it has finished or was deleted. A comment is sent every
+    SPARK_STATUS_HEARTBEAT_SECONDS to keep idle connections open. A job that is not known yet,
+    e.g. because it was just created, is waited for up to SPARK_STATUS_HEARTBEAT_SECONDS.
+
+    Args:
+        job_id (str): The name of the PipelineRun, as returned by `trigger_spark_pipeline`.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` of "status" events.
+
+    Raises:
+        HTTPException: 404 if the job is not known, 503 if the cache has not synced yet.
+    """
+    _require_job_status_cache()
+    job = job_status_cache.get(job_id)
+    if job is None:
+        job = await job_status_cache.wait_for_transition(job_id, -1, SPARK_STATUS_HEARTBEAT_SECONDS)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Spark job '{job_id}' not found")
+
+    async def events():
+        current = job
+        yield _status_event(current)
+        while not current.is_terminal:
+            latest = await job_status_cache.wait_for_transition(job_id, current.version, SPARK_STATUS_HEARTBEAT_SECONDS)
+            if latest is None:
+                # The PipelineRun was deleted
+                return
+            if latest.version == current.version:
+                yield ": keep-alive\n\n"
+                continue
+            current = latest
+            yield _status_event(current)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
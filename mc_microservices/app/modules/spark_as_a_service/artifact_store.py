@@ -0,0 +1,222 @@
+import fcntl
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+from dotenv import load_dotenv
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+ARTIFACT_MAX_HOLD_SECONDS = float(os.getenv("ARTIFACT_MAX_HOLD_SECONDS", str(24 * 60 * 60)))
+
+# Entries of the store directory that are not artifacts
+REFERENCES_DIR = ".refs"
+LOCK_FILE = ".lock"
+
+
+class ArtifactStore:
+    """
+    Keeps uploaded Spark artifacts on disk under their SHA-256 digest, so that a file uploaded
+    again is not stored again.
+
+    An artifact is referenced while a submission or its job uses it (see `put` and `release`).
+    When the store grows beyond `max_bytes`, unreferenced artifacts are evicted, least recently
+    used first. The index is kept in memory and rebuilt from the directory on first use.
+
+    The directory may be shared by several processes. A process referencing an artifact keeps a
+    reference file for it under `.refs`, and artifacts are added and evicted under an exclusive
+    lock on `.lock`, so no process evicts an artifact another one still references. References
+    are dropped after `max_hold` seconds, so that jobs whose end is never observed, or processes
+    that died, do not keep artifacts forever.
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_hold: float = ARTIFACT_MAX_HOLD_SECONDS, identity: str = None):
+        """
+        Args:
+            root (str): The directory holding the artifacts.
+            max_bytes (int): The size above which unreferenced artifacts are evicted.
+            max_hold (float): The number of seconds after which a reference is dropped.
+            identity (str): The name of this process' reference files. Defaults to "{hostname}-{pid}".
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_hold = max_hold
+        self.identity = identity or f"{socket.gethostname()}-{os.getpid()}"
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._references: Dict[str, int] = {}
+        self._held_at: Dict[str, float] = {}
+        self._total_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._sizes)
+
+    def path(self, digest: str, extension: str = "") -> str:
+        """
+        Returns the path of the artifact with the given SHA-256 digest and file extension.
+        """
+        return os.path.join(self.root, digest[:2], f"{digest}{extension}")
+
+    def put(self, staged_path: str, digest: str, extension: str = "") -> str:
+        """
+        Adds a staged file to the store and takes a reference on it. If an artifact with the same
+        digest is already stored, the staged file is discarded instead of being stored again.
+
+        Args:
+            staged_path (str): The file to add; it is moved into the store or removed.
+            digest (str): The SHA-256 hex digest of the file's content.
+            extension (str): The file extension to keep, e.g. ".py".
+
+        Returns:
+            str: The path of the artifact.
+        """
+        path = self.path(digest, extension)
+        with self._locked():
+            self._load()
+            # Another process may have stored or evicted the artifact since the index was built
+            size = self._sizes.pop(path, None)
+            if size is not None:
+                self._total_bytes -= size
+            if os.path.exists(path):
+                os.remove(staged_path)
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(staged_path, path)
+            size = os.path.getsize(path)
+            self._sizes[path] = size
+            self._total_bytes += size
+            self._references[path] = self._references.get(path, 0) + 1
+            self._held_at[path] = time.time()
+            self._write_reference(path)
+            self._evict()
+        return path
+
+    def release(self, paths: Iterable[str]):
+        """
+        Drops a reference on each of the given artifacts, making them evictable once unreferenced.
+        """
+        with self._locked():
+            for path in paths:
+                count = self._references.get(path, 0) - 1
+                if count > 0:
+                    self._references[path] = count
+                elif path in self._references:
+                    self._drop_references(path)
+            self._evict()
+
+    def references(self, path: str) -> int:
+        """
+        Returns the number of references this process holds on the given artifact.
+        """
+        with self._lock:
+            return self._references.get(path, 0)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, LOCK_FILE), "a") as lock_file:
+                fcntl.lockf(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.lockf(lock_file, fcntl.LOCK_UN)
+
+    def _references_dir(self, path: str) -> str:
+        return os.path.join(self.root, REFERENCES_DIR, os.path.basename(path))
+
+    def _write_reference(self, path: str):
+        directory = self._references_dir(path)
+        os.makedirs(directory, exist_ok=True)
+        reference = os.path.join(directory, self.identity)
+        with open(reference, "w"):
+            pass
+        os.utime(reference)
+
+    def _drop_references(self, path: str):
+        self._references.pop(path, None)
+        self._held_at.pop(path, None)
+        directory = self._references_dir(path)
+        try:
+            os.remove(os.path.join(directory, self.identity))
+            os.rmdir(directory)
+        except OSError:
+            # Already gone, or other processes still reference the artifact
+            pass
+
+    def _is_referenced_elsewhere(self, path: str, now: float) -> bool:
+        # References older than max_hold are left behind by dead processes or jobs whose end was missed
+        directory = self._references_dir(path)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return False
+        referenced = False
+        for name in names:
+            reference = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(reference) <= self.max_hold:
+                    referenced = True
+                else:
+                    os.remove(reference)
+            except FileNotFoundError:
+                pass
+        if not referenced:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+        return referenced
+
+    def _load(self):
+        if self._loaded:
+            return
+        found: List[tuple] = []
+        if os.path.isdir(self.root):
+            for directory, subdirectories, names in os.walk(self.root):
+                subdirectories[:] = [name for name in subdirectories if not name.startswith(".")]
+                for name in names:
+                    if name.startswith("."):
+                        continue
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_atime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._sizes[path] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _evict(self):
+        now = time.time()
+        for path in [path for path, held_at in self._held_at.items() if now - held_at > self.max_hold]:
+            logger.warning(f"Dropping the references on artifact '{path}', held for more than {self.max_hold} seconds")
+            self._drop_references(path)
+        if self._total_bytes <= self.max_bytes:
+            return
+        for path in [path for path in self._sizes if path not in self._references]:
+            if self._total_bytes <= self.max_bytes:
+                break
+            if self._is_referenced_elsewhere(path, now):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Could not evict artifact '{path}': {e}")
+                continue
+            self._total_bytes -= self._sizes.pop(path)
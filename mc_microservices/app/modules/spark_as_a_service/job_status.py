@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from kubernetes import client
+from app.modules.ownership.services.informer import Informer
+from app.modules.ownership.utils.logger import logger
+from .pipeline_service import PIPELINE_RUN_GROUP, PIPELINE_RUN_VERSION, PIPELINE_RUN_PLURAL, get_custom_objects_api
+
+PENDING = "Pending"
+RUNNING = "Running"
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+
+TERMINAL_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobStatus(NamedTuple):
+    """
+    The state of a PipelineRun, derived from its "Succeeded" condition. `version` counts the
+    state transitions seen for the run.
+    """
+    job_id: str
+    uid: Optional[str]
+    state: str
+    reason: Optional[str]
+    message: Optional[str]
+    start_time: Optional[str]
+    completion_time: Optional[str]
+    version: int
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "uid": self.uid,
+            "status": self.state,
+            "reason": self.reason,
+            "message": self.message,
+            "start_time": self.start_time,
+            "completion_time": self.completion_time,
+        }
+
+
+def pipeline_run_state(pipeline_run: dict) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Returns the state of a PipelineRun with the reason and message of its "Succeeded" condition.
+    """
+    status = pipeline_run.get("status") or {}
+    condition = next((c for c in status.get("conditions") or [] if c.get("type") == "Succeeded"), None)
+    if condition is None:
+        return PENDING, None, None
+    reason, message = condition.get("reason"), condition.get("message")
+    if condition.get("status") == "True":
+        return SUCCEEDED, reason, message
+    if condition.get("status") == "False":
+        return (CANCELLED if reason in ("Cancelled", "PipelineRunCancelled", "StoppedRunFinally", "CancelledRunFinally") else FAILED), reason, message
+    return (RUNNING if status.get("startTime") else PENDING), reason, message
+
+
+class PipelineRunCache(Informer):
+    """
+    The status of the PipelineRuns of one namespace, kept current by a single shared watch.
+
+    Status reads are in-memory lookups. Async callers can wait for the next state transition of a
+    run (`wait_for_transition`); the informer thread wakes them on their event loop, so waiting
+    does not occupy a thread. Callbacks can be registered to run once a run has finished
+    (`when_finished`).
+    """
+
+    def __init__(self, namespace: str, api_instance: client.CustomObjectsApi = None):
+        """
+        Args:
+            namespace (str): The namespace of the PipelineRuns.
+            api_instance (client.CustomObjectsApi): The API client to use. Defaults to the shared one.
+        """
+        api_instance = api_instance or get_custom_objects_api()
+        super().__init__("pipelineruns", api_instance.list_namespaced_custom_object,
+                         PIPELINE_RUN_GROUP, PIPELINE_RUN_VERSION, namespace, PIPELINE_RUN_PLURAL)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, JobStatus] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._finish_callbacks: Dict[str, List[Callable[[], None]]] = {}
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        """
+        Returns the status of the given PipelineRun, or None if it is not known.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    async def wait_for_transition(self, job_id: str, version: int, timeout: float) -> Optional[JobStatus]:
+        """
+        Waits until the given PipelineRun moves past `version` (-1 if it is not known yet), for at
+        most `timeout` seconds.
+
+        Returns:
+            JobStatus: The status of the run afterwards, or None if it is still not known.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            current = self._jobs.get(job_id)
+            if current is not None and current.version != version:
+                return current
+            waiters = self._waiters.setdefault(job_id, [])
+            waiters.append((loop, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.get(job_id)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None and (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                    if not waiters:
+                        del self._waiters[job_id]
+
+    def when_finished(self, job_id: str, callback: Callable[[], None]):
+        """
+        Calls `callback` once the given PipelineRun has reached a terminal state or has been
+        deleted: right away if it already has, otherwise from the informer thread. A run the
+        cache has not seen yet is waited for.
+        """
+        with self._lock:
+            current = self._jobs.get(job_id)
+            if current is None or not current.is_terminal:
+                self._finish_callbacks.setdefault(job_id, []).append(callback)
+                return
+        _call(callback, job_id)
+
+    def relist(self):
+        # Custom objects are listed as plain dictionaries
+        result = self.list_func(*self.args, **self.kwargs)
+        self._last_contact = time.monotonic()
+        self.resource_version = result["metadata"]["resourceVersion"]
+        self.on_replace(result.get("items") or [], self.resource_version)
+        self._synced.set()
+
+    def on_replace(self, items: list, resource_version: str):
+        names = set()
+        for item in items:
+            names.add(item["metadata"]["name"])
+            self._update(item)
+        with self._lock:
+            deleted = set(self._jobs) - names
+            for name in deleted:
+                del self._jobs[name]
+            callbacks = [(name, callback) for name in deleted for callback in self._finish_callbacks.pop(name, [])]
+        for name, callback in callbacks:
+            _call(callback, name)
+
+    def on_event(self, event_type: str, obj):
+        if not isinstance(obj, dict) or "metadata" not in obj:
+            return
+        if event_type == "DELETED":
+            name = obj["metadata"]["name"]
+            with self._lock:
+                self._jobs.pop(name, None)
+                callbacks = self._finish_callbacks.pop(name, [])
+            for callback in callbacks:
+                _call(callback, name)
+        else:
+            self._update(obj)
+
+    def _update(self, pipeline_run: dict):
+        metadata = pipeline_run["metadata"]
+        state, reason, message = pipeline_run_state(pipeline_run)
+        status = pipeline_run.get("status") or {}
+        with self._lock:
+            previous = self._jobs.get(metadata["name"])
+            if previous is not None and previous.uid != metadata.get("uid"):
+                previous = None
+            transition = previous is None or previous.state != state
+            version = (previous.version + 1 if previous is not None else 0) if transition else previous.version
+            job = JobStatus(metadata["name"], metadata.get("uid"), state, reason, message,
+                            status.get("startTime"), status.get("completionTime"), version)
+            self._jobs[job.job_id] = job
+            waiters = self._waiters.pop(job.job_id, []) if transition else []
+            callbacks = self._finish_callbacks.pop(job.job_id, []) if job.is_terminal else []
+        for callback in callbacks:
+            _call(callback, job.job_id)
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future, job)
+            except RuntimeError:
+                # The waiter's event loop is closed
+                pass
+
+
+def _resolve(future: asyncio.Future, job: JobStatus):
+    if not future.done():
+        future.set_result(job)
+
+
+def _call(callback: Callable[[], None], job_id: str):
+    try:
+        callback()
+    except Exception as e:
+        logger.error(f"Error running the finish callback of PipelineRun '{job_id}': {e}")
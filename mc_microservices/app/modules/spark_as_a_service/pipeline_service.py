@@ -0,0 +1,114 @@
+import os
+import threading
+from typing import List, NamedTuple
+from kubernetes import client
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+PIPELINE_RUN_GROUP = "tekton.dev"
+PIPELINE_RUN_VERSION = "v1beta1"
+PIPELINE_RUN_PLURAL = "pipelineruns"
+
+# Load environment variables
+NAMESPACE = os.getenv("NAMESPACE", "default")
+SPARK_PIPELINE_NAME = os.getenv("SPARK_PIPELINE_NAME", "bitbucket-pr-pipeline")
+SPARK_WORKSPACE_CLAIM_NAME = os.getenv("SPARK_WORKSPACE_CLAIM_NAME", "pvc-spark")
+KUBERNETES_POOL_MAXSIZE = int(os.getenv("KUBERNETES_POOL_MAXSIZE", "32"))
+
+_custom_objects_api = None
+_custom_objects_api_lock = threading.Lock()
+
+
+class PipelineRunResult(NamedTuple):
+    name: str
+    uid: str
+    namespace: str
+
+
+def get_custom_objects_api() -> client.CustomObjectsApi:
+    """
+    Returns the CustomObjectsApi shared by all submissions. Its API client keeps a pool of up to
+    KUBERNETES_POOL_MAXSIZE connections to the API server open.
+    """
+    global _custom_objects_api
+    with _custom_objects_api_lock:
+        if _custom_objects_api is None:
+            configuration = client.Configuration.get_default_copy()
+            configuration.connection_pool_maxsize = KUBERNETES_POOL_MAXSIZE
+            _custom_objects_api = client.CustomObjectsApi(client.ApiClient(configuration))
+        return _custom_objects_api
+
+
+def build_pipeline_run(sparkyaml_path: str, pyfile_paths: List[str]) -> dict:
+    """
+    Builds the PipelineRun running the Spark pipeline on the given files.
+
+    Args:
+        sparkyaml_path (str): The path of the Spark YAML file.
+        pyfile_paths (List[str]): The paths of the Python files.
+
+    Returns:
+        dict: The PipelineRun manifest.
+    """
+    pipeline_run = {
+        "apiVersion": f"{PIPELINE_RUN_GROUP}/{PIPELINE_RUN_VERSION}",
+        "kind": "PipelineRun",
+        "metadata": {
+            "generateName": "spark-pipeline-run-"
+        },
+        "spec": {
+            "pipelineRef": {
+                "name": SPARK_PIPELINE_NAME
+            },
+            "workspaces": [
+                {
+                    "name": "shared-workspace",
+                    "persistentVolumeClaim": {
+                        "claimName": SPARK_WORKSPACE_CLAIM_NAME
+                    }
+                }
+            ],
+            "params": [
+                {
+                    "name": "sparkyaml",
+                    "value": sparkyaml_path
+                }
+            ]
+        }
+    }
+
+    for i, pyfile_path in enumerate(pyfile_paths):
+        pipeline_run["spec"]["params"].append({
+            "name": f"pyfile{i+1}",
+            "value": pyfile_path
+        })
+    return pipeline_run
+
+
+def create_pipeline_run(pipeline_run: dict, namespace: str = NAMESPACE, api_instance: client.CustomObjectsApi = None) -> PipelineRunResult:
+    """
+    Creates a PipelineRun with one call to the API server.
+
+    Args:
+        pipeline_run (dict): The PipelineRun manifest.
+        namespace (str): The namespace to create it in.
+        api_instance (client.CustomObjectsApi): The API client to use. Defaults to the shared one.
+
+    Returns:
+        PipelineRunResult: The generated name, uid and namespace of the PipelineRun.
+
+    Raises:
+        ApiException: If the API server rejects the PipelineRun.
+    """
+    api_instance = api_instance or get_custom_objects_api()
+    created = api_instance.create_namespaced_custom_object(
+        group=PIPELINE_RUN_GROUP,
+        version=PIPELINE_RUN_VERSION,
+        namespace=namespace,
+        plural=PIPELINE_RUN_PLURAL,
+        body=pipeline_run,
+    )
+    metadata = created.get("metadata", {})
+    return PipelineRunResult(metadata.get("name"), metadata.get("uid"), metadata.get("namespace", namespace))
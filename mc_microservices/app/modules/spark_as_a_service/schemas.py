@@ -1,9 +1,31 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class TriggerSparkPipelineRequest(BaseModel):
     pg_id: str
     auth_token: str
 
 class TriggerSparkPipelineResponse(BaseModel):
+    submission_id: str
     status: str
-    output: str
\ No newline at end of file
+    status_url: str
+
+class SparkSubmissionStatusResponse(BaseModel):
+    submission_id: str
+    status: str
+    error: Optional[str] = None
+    run_name: Optional[str] = None
+    uid: Optional[str] = None
+    namespace: Optional[str] = None
+    queued_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+class SparkJobStatusResponse(BaseModel):
+    job_id: str
+    uid: Optional[str] = None
+    status: str
+    reason: Optional[str] = None
+    message: Optional[str] = None
+    start_time: Optional[str] = None
+    completion_time: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,230 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge, Histogram
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+QUEUED = "Queued"
+SUBMITTING = "Submitting"
+SUBMITTED = "Submitted"
+FAILED = "Failed"
+
+# Load environment variables
+SPARK_SUBMISSION_WORKERS = int(os.getenv("SPARK_SUBMISSION_WORKERS", "4"))
+SPARK_SUBMISSION_QUEUE_SIZE = int(os.getenv("SPARK_SUBMISSION_QUEUE_SIZE", "100"))
+SPARK_SUBMISSION_HISTORY = int(os.getenv("SPARK_SUBMISSION_HISTORY", "10000"))
+
+SUBMISSION_QUEUE_DEPTH = Gauge("mc_spark_submission_queue_depth", "Spark submissions waiting for a worker")
+SUBMISSION_WAIT_SECONDS = Histogram("mc_spark_submission_wait_seconds", "Time Spark submissions spend queued before a worker picks them up")
+SUBMISSIONS_REJECTED = Counter("mc_spark_submissions_rejected", "Spark submissions rejected because the queue was full")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class QueueFull(Exception):
+    """
+    Raised when a submission does not fit in the queue.
+    """
+
+
+class Submission:
+    """
+    A Spark job waiting for, or done with, the creation of its PipelineRun.
+    """
+
+    def __init__(self, pipeline_run: dict, artifacts: List[str]):
+        self.submission_id = uuid.uuid4().hex
+        self.pipeline_run = pipeline_run
+        self.artifacts = artifacts
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.run_name: Optional[str] = None
+        self.uid: Optional[str] = None
+        self.namespace: Optional[str] = None
+        self.queued_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.enqueued = time.monotonic()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (SUBMITTED, FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "submission_id": self.submission_id,
+            "status": self.status,
+            "error": self.error,
+            "run_name": self.run_name,
+            "uid": self.uid,
+            "namespace": self.namespace,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class SubmissionQueue:
+    """
+    Creates the PipelineRuns of Spark submissions in the background.
+
+    Submissions wait on a bounded queue drained by `workers` threads. When the queue is full,
+    `submit` raises QueueFull instead of letting the backlog grow, so callers can shed load. The
+    last `history` submissions are kept for status lookups, unfinished ones are never dropped.
+    """
+
+    def __init__(self, create: Callable[[dict], tuple], release: Callable[["Submission"], None],
+                 workers: int = SPARK_SUBMISSION_WORKERS, queue_size: int = SPARK_SUBMISSION_QUEUE_SIZE,
+                 history: int = SPARK_SUBMISSION_HISTORY):
+        """
+        Args:
+            create (callable): Creates a PipelineRun, returning its name, uid and namespace.
+            release (callable): Called with every processed submission, to release its artifacts
+                once nothing uses them any more.
+            workers (int): The number of worker threads.
+            queue_size (int): The maximum number of submissions waiting for a worker.
+            history (int): The number of submissions kept for status lookups.
+        """
+        self.create = create
+        self.release = release
+        self.workers = workers
+        self.history = history
+        self._queue: "queue.Queue[Optional[Submission]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._submissions: "OrderedDict[str, Submission]" = OrderedDict()
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Starts the worker threads. Calling start twice is a no-op.
+        """
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"spark-submission-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether every worker thread is running.
+        """
+        return bool(self._threads) and all(thread.is_alive() for thread in self._threads)
+
+    def stop(self, timeout: float = None):
+        """
+        Stops the worker threads once the queued submissions are processed. Never blocks on a
+        full queue: the workers stop as soon as they have drained it.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait for each worker thread.
+        """
+        self._stopped.set()
+        self._wake()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_full(self) -> bool:
+        return self._queue.full()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, pipeline_run: dict, artifacts: List[str]) -> Submission:
+        """
+        Queues a PipelineRun to be created. The submission owns the given artifacts from now on.
+
+        Raises:
+            QueueFull: If the queue is full; the artifacts stay with the caller.
+        """
+        submission = Submission(pipeline_run, artifacts)
+        with self._lock:
+            try:
+                self._queue.put_nowait(submission)
+            except queue.Full:
+                SUBMISSIONS_REJECTED.inc()
+                raise QueueFull()
+            SUBMISSION_QUEUE_DEPTH.inc()
+            self._submissions[submission.submission_id] = submission
+            self._trim()
+        return submission
+
+    def get(self, submission_id: str) -> Optional[Submission]:
+        """
+        Returns the given submission, or None if it is not known.
+        """
+        with self._lock:
+            return self._submissions.get(submission_id)
+
+    def join(self):
+        """
+        Blocks until every queued submission has been processed.
+        """
+        self._queue.join()
+
+    def _trim(self):
+        for submission_id in [s for s, submission in self._submissions.items() if submission.is_finished]:
+            if len(self._submissions) <= self.history:
+                break
+            del self._submissions[submission_id]
+
+    def _wake(self):
+        # A None wakes up a worker waiting on the empty queue; a full queue has no waiting worker
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            submission = self._queue.get()
+            try:
+                if submission is not None:
+                    SUBMISSION_QUEUE_DEPTH.dec()
+                    SUBMISSION_WAIT_SECONDS.observe(time.monotonic() - submission.enqueued)
+                    self._process(submission)
+            finally:
+                self._queue.task_done()
+            if self._stopped.is_set() and (submission is None or self._queue.empty()):
+                # Pass the wake-up on to the next worker
+                self._wake()
+                return
+
+    def _process(self, submission: Submission):
+        with self._lock:
+            submission.status = SUBMITTING
+            submission.started_at = _now()
+        try:
+            run_name, uid, namespace = self.create(submission.pipeline_run)
+            with self._lock:
+                submission.run_name, submission.uid, submission.namespace = run_name, uid, namespace
+                submission.status = SUBMITTED
+        except Exception as e:
+            logger.error(f"Error triggering Tekton pipeline for submission '{submission.submission_id}': {e}")
+            with self._lock:
+                submission.error = getattr(e, "reason", None) or str(e)
+                submission.status = FAILED
+        finally:
+            with self._lock:
+                submission.finished_at = _now()
+                submission.pipeline_run = None
+            try:
+                self.release(submission)
+            except Exception as e:
+                logger.error(f"Could not release the artifacts of submission '{submission.submission_id}': {e}")
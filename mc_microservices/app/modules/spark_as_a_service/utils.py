@@ -1,26 +1,180 @@
-import requests
-from fastapi import HTTPException
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterable, List, Optional, Set
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+from dotenv import load_dotenv
 from app.modules.ownership.utils.logger import logger
+from app.modules.ownership.utils.executor import run_blocking
 
-def validate_token(pg_id: str, auth_token: str) -> bool:
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(200 * 1024 * 1024)))
+
+_UNSAFE_FILENAME_CHARACTERS = re.compile(r"[^A-Za-z0-9._-]")
+
+
+class UploadBudget:
+    """
+    The number of bytes a request may still upload, shared by all of its files.
+    """
+
+    def __init__(self, max_request_bytes: int = UPLOAD_MAX_REQUEST_BYTES, max_file_bytes: int = UPLOAD_MAX_FILE_BYTES):
+        self.remaining = max_request_bytes
+        self.max_request_bytes = max_request_bytes
+        self.max_file_bytes = max_file_bytes
+
+    def consume(self, filename: str, file_size: int, chunk_size: int):
+        """
+        Accounts for a chunk of `chunk_size` bytes that brings `filename` to `file_size` bytes.
+
+        Raises:
+            HTTPException: 413 if the file or the request exceeds its limit.
+        """
+        if file_size > self.max_file_bytes:
+            raise HTTPException(status_code=413, detail=f"File '{filename}' exceeds {self.max_file_bytes} bytes")
+        self.remaining -= chunk_size
+        if self.remaining < 0:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self.max_request_bytes} bytes")
+
+class UploadTooLarge(HTTPException):
     """
-    Validates the authorization token using the validate API.
+    Raised while a request body is received once it exceeds the upload request limit.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+class UploadSizeLimitMiddleware:
+    """
+    Limits the size of the requests to the upload endpoints while their body is received, with
+    413 once it exceeds the request limit. Requests whose Content-Length already exceeds it are
+    rejected before their body is read; chunked requests are counted as they arrive.
+
+    FastAPI reads and spools the whole multipart body before the handler runs, so the limits
+    checked while saving the uploads (see `save_upload`) cannot stop an oversized body from being
+    received; this middleware does.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: Optional[int] = None):
+        """
+        Args:
+            app: The ASGI application to wrap.
+            paths (Iterable[str]): The paths of the upload endpoints.
+            max_bytes (int): The request limit. Defaults to UPLOAD_MAX_REQUEST_BYTES.
+        """
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        max_bytes = self.max_bytes if self.max_bytes is not None else UPLOAD_MAX_REQUEST_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await JSONResponse(status_code=413, content={"message": f"Upload exceeds {max_bytes} bytes"})(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except UploadTooLarge as e:
+            # Raised outside the application's exception handlers
+            if response_started:
+                raise
+            await JSONResponse(status_code=e.status_code, content={"message": e.detail})(scope, receive, send)
+
+def sanitize_filename(filename: str, taken: Set[str]) -> str:
+    """
+    Returns a safe name for an uploaded file: its base name with anything but letters, digits,
+    ".", "_" and "-" replaced, made unique among the names already `taken` (which it is added to).
 
     Args:
-        pg_id (str): The playground ID.
-        auth_token (str): The authorization token.
+        filename (str): The file name sent by the client.
+        taken (Set[str]): The names already used in the same directory.
 
     Returns:
-        bool: True if the token is valid, False otherwise.
+        str: The sanitized file name.
+    """
+    name = _UNSAFE_FILENAME_CHARACTERS.sub("_", os.path.basename((filename or "").replace("\\", "/"))).lstrip(".") or "upload"
+    stem, extension = os.path.splitext(name)
+    candidate, counter = name, 1
+    while candidate in taken:
+        candidate = f"{stem}-{counter}{extension}"
+        counter += 1
+    taken.add(candidate)
+    return candidate
+
+def create_staging_dir(parent: str) -> str:
+    """
+    Creates a fresh directory below `parent` holding the files of a single request.
+    """
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix="request-", dir=parent)
+
+def remove_staging_dir(path: str):
+    """
+    Removes a request's staging directory and everything in it.
+    """
+    shutil.rmtree(path, ignore_errors=True)
+
+async def save_upload(upload: UploadFile, path: str, budget: UploadBudget, hasher=None) -> int:
+    """
+    Streams an uploaded file to disk in chunks of UPLOAD_CHUNK_SIZE bytes, so memory use does not
+    grow with the file size. Reads and writes run on the shared executor.
+
+    The file is read from the copy Starlette spooled while parsing the request, so the limits
+    checked here bound what is kept, not what was received; the size of the request as a whole
+    is limited before it is read by UploadSizeLimitMiddleware.
+
+    Args:
+        upload (UploadFile): The uploaded file.
+        path (str): The path to write it to.
+        budget (UploadBudget): The size limits, enforced while copying.
+        hasher: An optional hashlib object updated with every chunk.
+
+    Returns:
+        int: The size of the file in bytes.
+
+    Raises:
+        HTTPException: 413 if the file or the request exceeds its size limit.
     """
+    size = 0
+    f = await run_blocking(open, path, "wb")
     try:
-        response = requests.post(
-            "http://localhost:8000/validate/validate-ownership",
-            json={"pg_id": pg_id, "auth_token": auth_token}
-        )
-        if response.status_code == 200 and response.json().get("is_valid"):
-            return True
-        return False
-    except Exception as e:
-        logger.error(f"Error validating token: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return size
+            size += len(chunk)
+            budget.consume(upload.filename, size, len(chunk))
+            if hasher is not None:
+                hasher.update(chunk)
+            await run_blocking(f.write, chunk)
+    finally:
+        await run_blocking(f.close)
@@ -1,29 +1,48 @@
+import os
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
-from app.modules.validate.schema import ValidateOwnershipRequest, OwnershipValidationResponse
-from .utils import get_token_from_vault
+from dotenv import load_dotenv
+from app.modules.validate.schema import ValidateOwnershipRequest, OwnershipValidationResponse, ValidateOwnershipBatchRequest, OwnershipValidationBatchResponse
+from .service import validate_token, validate_tokens
 from app.modules.ownership.utils.logger import logger
 
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+VALIDATE_BATCH_MAX_ITEMS = int(os.getenv("VALIDATE_BATCH_MAX_ITEMS", "10000"))
+
 router = APIRouter()
 
 @router.post("/validate-ownership", response_model=OwnershipValidationResponse)
 async def validate_ownership(request: ValidateOwnershipRequest):
     logger.debug(f"Received request to validate ownership for eid: {request.eid}")
-    # Retrieve the stored token for the provided eid from Vault
-    stored_token = get_token_from_vault(request.eid)
-
-    if stored_token is None:
-        # If no token is found for the given eid, inform the user that ownership is invalid
-        logger.info(f"No token found for eid {request.eid}")
-        return JSONResponse(
-            status_code=404,
-            content={"is_valid": False, "message": f"No token found for eid {request.eid}. Invalid ownership."}
-        )
-
-    # Compare the provided auth_token with the stored token
-    if request.auth_token == stored_token:
-        logger.info(f"Token validated successfully for eid {request.eid}")
-        return {"is_valid": True, "message": "Good token. Valid ownership."}
-    else:
-        logger.info(f"Invalid token provided for eid {request.eid}")
-        return {"is_valid": False, "message": "Bad token. Invalid ownership."}
\ No newline at end of file
+    result = await validate_token(request.eid, request.auth_token)
+    if result.status_code != 200:
+        return JSONResponse(status_code=result.status_code, content=result.to_dict())
+    return result.to_dict()
+
+@router.post("/validate-ownership/batch", response_model=OwnershipValidationBatchResponse)
+async def validate_ownership_batch(request: ValidateOwnershipBatchRequest):
+    """
+    Validates many (eid, auth_token) pairs at once.
+
+    Tokens that can be verified locally are; for the others the stored token of every distinct
+    eid is read from Vault once, at most VALIDATE_BATCH_CONCURRENCY reads at a time.
+
+    Args:
+        request (ValidateOwnershipBatchRequest): The pairs to validate.
+
+    Returns:
+        dict: One result per pair, in request order, with a status code of 200, or 404 if no
+        token is stored for the eid.
+
+    Raises:
+        HTTPException: If the batch is too large (413) or Vault cannot be read.
+    """
+    if len(request.items) > VALIDATE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {VALIDATE_BATCH_MAX_ITEMS} tokens can be validated in one request")
+    logger.debug(f"Received request to validate ownership of {len(request.items)} tokens")
+
+    results = await validate_tokens([(item.eid, item.auth_token) for item in request.items])
+    return {"results": [result._asdict() for result in results]}
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List
 
 class ValidateOwnershipRequest(BaseModel):
     eid: str
@@ -6,4 +7,16 @@ class ValidateOwnershipRequest(BaseModel):
 
 class OwnershipValidationResponse(BaseModel):
     is_valid: bool
-    message: str
\ No newline at end of file
+    message: str
+
+class ValidateOwnershipBatchRequest(BaseModel):
+    items: List[ValidateOwnershipRequest]
+
+class OwnershipValidationResult(BaseModel):
+    eid: str
+    status_code: int
+    is_valid: bool
+    message: str
+
+class OwnershipValidationBatchResponse(BaseModel):
+    results: List[OwnershipValidationResult]
\ No newline at end of file
@@ -0,0 +1,145 @@
+import asyncio
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import jwt
+from dotenv import load_dotenv
+from .utils import get_token_from_vault
+from .token_verifier import verify_token_locally, VALIDATION_MODE, LOCAL, HYBRID
+from app.modules.ownership.services.kubernetes_service import ownership_store, lease_index
+from app.modules.ownership.utils.logger import logger
+from app.modules.ownership.utils.executor import run_blocking
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Load environment variables
+VALIDATE_BATCH_CONCURRENCY = int(os.getenv("VALIDATE_BATCH_CONCURRENCY", "16"))
+
+
+class ValidationResult(NamedTuple):
+    """
+    The outcome of validating an auth token. `status_code` is 200, or 404 if no token is stored
+    in Vault for the eid.
+    """
+    eid: Optional[str]
+    status_code: int
+    is_valid: bool
+    message: str
+
+    def to_dict(self) -> dict:
+        return {"is_valid": self.is_valid, "message": self.message}
+
+
+def validate_locally(eid: str, auth_token: str) -> Optional[ValidationResult]:
+    """
+    Verifies a token locally when the validation mode allows it.
+
+    Returns:
+        ValidationResult: The validation result, or None if the token has to be compared with the one in Vault.
+    """
+    if VALIDATION_MODE not in (LOCAL, HYBRID):
+        return None
+    # Only tokens the local key cannot verify may go to Vault
+    verification = verify_token_locally(eid, auth_token)
+    if verification.is_valid is None and VALIDATION_MODE == HYBRID:
+        return None
+    logger.info(f"Token of eid {eid} verified locally: {verification.message}")
+    return ValidationResult(eid, 200, bool(verification.is_valid), verification.message)
+
+
+def compare_with_stored_token(eid: str, auth_token: str, stored_token: Optional[str]) -> ValidationResult:
+    """
+    Compares a token with the one stored in Vault for the eid.
+    """
+    if stored_token is None:
+        # If no token is found for the given eid, inform the user that ownership is invalid
+        logger.info(f"No token found for eid {eid}")
+        return ValidationResult(eid, 404, False, f"No token found for eid {eid}. Invalid ownership.")
+
+    # Compare the provided auth_token with the stored token
+    if auth_token == stored_token:
+        logger.info(f"Token validated successfully for eid {eid}")
+        return ValidationResult(eid, 200, True, "Good token. Valid ownership.")
+    logger.info(f"Invalid token provided for eid {eid}")
+    return ValidationResult(eid, 200, False, "Bad token. Invalid ownership.")
+
+
+async def validate_token(eid: str, auth_token: str) -> ValidationResult:
+    """
+    Validates the auth token of an eid, locally or against the token stored in Vault depending
+    on VALIDATION_MODE. Vault reads run on the shared executor.
+
+    Raises:
+        HTTPException: If Vault cannot be read.
+    """
+    result = validate_locally(eid, auth_token)
+    if result is not None:
+        return result
+    # Retrieve the stored token for the provided eid from Vault
+    stored_token = await run_blocking(get_token_from_vault, eid)
+    return compare_with_stored_token(eid, auth_token, stored_token)
+
+
+async def validate_tokens(items: List[Tuple[str, str]]) -> List[ValidationResult]:
+    """
+    Validates many (eid, auth_token) pairs. Tokens that can be verified locally are; for the
+    others the stored token of every distinct eid is read from Vault once, at most
+    VALIDATE_BATCH_CONCURRENCY reads at a time.
+
+    Returns:
+        List[ValidationResult]: One result per pair, in order.
+
+    Raises:
+        HTTPException: If Vault cannot be read.
+    """
+    results: List[Optional[ValidationResult]] = [None] * len(items)
+    pending: Dict[str, List[int]] = {}
+    for index, (eid, auth_token) in enumerate(items):
+        result = validate_locally(eid, auth_token)
+        if result is None:
+            pending.setdefault(eid, []).append(index)
+        else:
+            results[index] = result
+
+    # One Vault read per distinct eid, a bounded number of them in flight
+    eids = list(pending)
+    for start in range(0, len(eids), VALIDATE_BATCH_CONCURRENCY):
+        chunk = eids[start:start + VALIDATE_BATCH_CONCURRENCY]
+        stored_tokens = await asyncio.gather(*(run_blocking(get_token_from_vault, eid) for eid in chunk))
+        for eid, stored_token in zip(chunk, stored_tokens):
+            for index in pending[eid]:
+                results[index] = compare_with_stored_token(eid, items[index][1], stored_token)
+    return results
+
+
+async def validate_playground_token(pg_id: str, auth_token: str) -> ValidationResult:
+    """
+    Validates that an auth token grants access to a playground: the token is validated for the
+    eid it was issued to (its `sub` claim), it must not have been issued for another playground
+    and, once the ownership store has synced, the eid must hold a lease on the playground.
+
+    Args:
+        pg_id (str): The playground ID.
+        auth_token (str): The auth token.
+
+    Returns:
+        ValidationResult: The validation result for the token's eid.
+
+    Raises:
+        HTTPException: If Vault cannot be read.
+    """
+    try:
+        # The signature is checked by the validation below
+        claims = jwt.decode(auth_token, options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return ValidationResult(None, 200, False, "Bad token. Invalid ownership.")
+    eid = claims.get("sub")
+    if not isinstance(eid, str):
+        return ValidationResult(None, 200, False, "Bad token. Invalid ownership.")
+    if claims.get("pg_id", pg_id) != pg_id:
+        return ValidationResult(eid, 200, False, f"Token was not issued for playground {pg_id}. Invalid ownership.")
+
+    result = await validate_token(eid, auth_token)
+    if result.is_valid and ownership_store.has_synced and eid not in lease_index.owners(pg_id):
+        return ValidationResult(eid, 200, False, f"eid {eid} does not own playground {pg_id}. Invalid ownership.")
+    return result
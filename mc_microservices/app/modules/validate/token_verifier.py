@@ -0,0 +1,149 @@
+import datetime
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+import jwt
+from dotenv import load_dotenv
+from app.modules.ownership.models.lease import lease_key
+from app.modules.ownership.services.kubernetes_service import SECRET_KEY, SECRET_KEY_IS_SHARED, ALGORITHM, ownership_store, lease_index
+from app.modules.ownership.utils.logger import logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+VAULT = "vault"
+LOCAL = "local"
+HYBRID = "hybrid"
+
+# Load environment variables
+VALIDATION_MODE = os.getenv("VALIDATION_MODE", VAULT)
+TOKEN_REVOCATION_RETENTION_SECONDS = float(os.getenv("TOKEN_REVOCATION_RETENTION_SECONDS", str(90 * 24 * 3600)))
+
+
+def check_secret_key(validation_mode: str = VALIDATION_MODE, shared: bool = SECRET_KEY_IS_SHARED):
+    """
+    Makes sure tokens verified locally are signed with a key every process shares. Run at
+    startup and as a readiness check.
+
+    A token signed with a random per-process key would fail verification on every other worker
+    or replica and after a restart.
+
+    Raises:
+        RuntimeError: If the validation mode is "local" or "hybrid" and SECRET_KEY is not set.
+    """
+    if validation_mode in (LOCAL, HYBRID) and not shared:
+        raise RuntimeError(f"SECRET_KEY must be set when VALIDATION_MODE is '{validation_mode}'")
+
+
+class TokenVerification(NamedTuple):
+    """
+    The outcome of verifying a token locally. `is_valid` is None when the token could not be
+    verified with the local key (bad signature or not one of our JWTs).
+    """
+    is_valid: Optional[bool]
+    message: str
+
+
+class RevocationList:
+    """
+    The leases relinquished while this process was running, with the time they were relinquished.
+
+    A token issued for a playground is revoked if its lease was relinquished after the token was
+    issued, so tokens of a lease claimed again later are unaffected. It is fed with ownership store
+    changes (see `apply_changes`) and therefore sees relinquishments made by every replica. An
+    entry is kept until the lease it revokes would have expired, which is when its tokens expire.
+    """
+
+    def __init__(self, retention_seconds: float = TOKEN_REVOCATION_RETENTION_SECONDS):
+        """
+        Args:
+            retention_seconds (float): How long to keep an entry whose lease expiration is unknown.
+        """
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._expirations: Dict[str, str] = {}
+        self._revoked: Dict[str, Tuple[int, float]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._revoked)
+
+    def apply_changes(self, changed: Dict[str, str], removed: Iterable[str]):
+        """
+        Folds ownership changes into the list. Registered as an ownership store listener.
+
+        Args:
+            changed (dict): Added or renewed leases as `{"{pg_id}-{eid}": expiration_date}`.
+            removed (Iterable[str]): The keys of relinquished leases.
+        """
+        now = time.time()
+        with self._lock:
+            self._expirations.update(changed)
+            for key in removed:
+                self._revoked[key] = (int(now), self._keep_until(self._expirations.pop(key, None), now))
+            self._prune(now)
+
+    def revoke(self, pg_id: str, eid: str):
+        """
+        Revokes the tokens issued so far for a lease.
+        """
+        self.apply_changes({}, [lease_key(pg_id, eid)])
+
+    def is_revoked(self, pg_id: str, eid: str, issued_at: int) -> bool:
+        """
+        Returns True if the lease of `eid` on `pg_id` was relinquished at or after `issued_at`
+        (seconds since the epoch, the resolution of the `iat` claim).
+        """
+        with self._lock:
+            entry = self._revoked.get(lease_key(pg_id, eid))
+        return entry is not None and issued_at <= entry[0]
+
+    def _keep_until(self, expires_at: Optional[str], now: float) -> float:
+        try:
+            return datetime.datetime.fromisoformat(expires_at).replace(tzinfo=datetime.timezone.utc).timestamp()
+        except (TypeError, ValueError):
+            return now + self.retention_seconds
+
+    def _prune(self, now: float):
+        for key in [key for key, (_, keep_until) in self._revoked.items() if keep_until < now]:
+            del self._revoked[key]
+
+
+# Revokes tokens when their lease is relinquished or expires, on whichever replica that happens
+revocation_list = RevocationList()
+ownership_store.add_listener(revocation_list.apply_changes)
+
+
+def verify_token_locally(eid: str, token: str) -> TokenVerification:
+    """
+    Verifies an auth token issued by `generate_user_token` without calling Vault: the HS256
+    signature, the `exp` and `sub` claims and, for tokens issued for a playground, that the lease
+    is still held and was not relinquished after the token was issued.
+
+    Args:
+        eid (str): The entity ID the token must belong to.
+        token (str): The auth token to verify.
+
+    Returns:
+        TokenVerification: Whether the token is valid, or None if it could not be verified with the local key.
+    """
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+    except jwt.ExpiredSignatureError:
+        return TokenVerification(False, "Expired token. Invalid ownership.")
+    except jwt.InvalidTokenError as e:
+        logger.debug(f"Token of eid {eid} cannot be verified locally: {e}")
+        return TokenVerification(None, "Bad token. Invalid ownership.")
+
+    if claims["sub"] != eid:
+        return TokenVerification(False, "Bad token. Invalid ownership.")
+
+    pg_id = claims.get("pg_id")
+    if pg_id is not None:
+        if revocation_list.is_revoked(pg_id, eid, int(claims.get("iat", 0))):
+            return TokenVerification(False, "Revoked token. Invalid ownership.")
+        # Once the ownership store has synced, the lease must still be held
+        if ownership_store.has_synced and eid not in lease_index.owners(pg_id):
+            return TokenVerification(False, "Revoked token. Invalid ownership.")
+    return TokenVerification(True, "Good token. Valid ownership.")
@@ -1,21 +1,149 @@
 import hvac
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
 from fastapi import HTTPException
 from app.modules.ownership.utils.logger import logger
+from app.modules.ownership.services.vault_service import add_token_listener, get_vault_client
 from dotenv import load_dotenv
 import os
 
 # Load environment variables from .env file
 load_dotenv()
 
-VAULT_URL = os.getenv("VAULT_URL")
-VAULT_TOKEN = os.getenv("VAULT_TOKEN")
+VAULT_TOKEN_CACHE_MAX_SIZE = int(os.getenv("VAULT_TOKEN_CACHE_MAX_SIZE", "10000"))
+VAULT_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("VAULT_TOKEN_CACHE_TTL_SECONDS", "60"))
+VAULT_TOKEN_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("VAULT_TOKEN_CACHE_NEGATIVE_TTL_SECONDS", "10"))
 
-client = hvac.Client(
-    url=VAULT_URL,
-    token=VAULT_TOKEN,
-)
+client = get_vault_client()
 
-def get_token_from_vault(eid: str):
+
+class _Flight:
+    """
+    A Vault read in progress, shared by every caller asking for the same eid meanwhile.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.token = None
+        self.error = None
+        self.stale = False
+
+
+class TokenCache:
+    """
+    A bounded cache of the tokens stored in Vault, keyed by eid.
+
+    Entries expire after `ttl` seconds and the least recently used entry is evicted when the cache
+    is full. Missing tokens are remembered too, for the shorter `negative_ttl`. Concurrent reads of
+    the same eid are collapsed into a single Vault read whose result (or error) all callers share.
+    Errors are not cached. `invalidate` drops an eid, including a read still in flight, so a token
+    written meanwhile is not shadowed by the older value.
+    """
+
+    def __init__(self, loader: Callable[[str], Optional[str]], max_size: int = VAULT_TOKEN_CACHE_MAX_SIZE,
+                 ttl: float = VAULT_TOKEN_CACHE_TTL_SECONDS, negative_ttl: float = VAULT_TOKEN_CACHE_NEGATIVE_TTL_SECONDS):
+        """
+        Args:
+            loader (callable): Reads the token of an eid from Vault; returns None if there is none.
+            max_size (int): The maximum number of cached eids.
+            ttl (float): How long a token is cached, in seconds.
+            negative_ttl (float): How long a missing token is cached, in seconds.
+        """
+        self.loader = loader
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, eid: str) -> Optional[str]:
+        """
+        Returns the token stored for the given eid, or None if there is none.
+
+        Raises:
+            Exception: Whatever the loader raised, for this caller and every caller that joined its read.
+        """
+        with self._lock:
+            entry = self._entries.get(eid)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(eid)
+                if entry[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry[0]
+            self.misses += 1
+            flight = self._flights.get(eid)
+            leader = flight is None
+            if leader:
+                flight = self._flights[eid] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.token
+
+        try:
+            flight.token = self.loader(eid)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(eid) is flight:
+                    del self._flights[eid]
+                if flight.error is None and not flight.stale:
+                    self._store(eid, flight.token)
+            flight.done.set()
+        return flight.token
+
+    def invalidate(self, eid: str):
+        """
+        Drops the cached token of the given eid.
+        """
+        with self._lock:
+            self._entries.pop(eid, None)
+            flight = self._flights.pop(eid, None)
+            if flight is not None:
+                flight.stale = True
+
+    def clear(self):
+        """
+        Drops every cached token.
+        """
+        with self._lock:
+            self._entries.clear()
+            for flight in self._flights.values():
+                flight.stale = True
+            self._flights.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache size and its hit, negative hit and miss counters.
+        """
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "negative_hits": self.negative_hits, "misses": self.misses}
+
+    def _store(self, eid: str, token: Optional[str]):
+        ttl = self.ttl if token is not None else self.negative_ttl
+        self._entries[eid] = (token, time.monotonic() + ttl)
+        self._entries.move_to_end(eid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def read_token_from_vault(eid: str):
     try:
         logger.debug(f"Fetching token for eid {eid} from Vault...")
         # Access Vault and get the stored token for the given eid
@@ -29,4 +157,15 @@ def get_token_from_vault(eid: str):
         return None
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+# Tokens read from Vault, dropped whenever a token is stored or deleted through this process
+token_cache = TokenCache(read_token_from_vault)
+add_token_listener(token_cache.invalidate)
+
+def get_token_from_vault(eid: str):
+    """
+    Returns the token stored in Vault for the given eid, or None if there is none, served from
+    `token_cache` when possible.
+    """
+    return token_cache.get(eid)
@@ -0,0 +1,27 @@
+import os
+import time
+import pytest
+from kubernetes import client
+from fake_kube_api import FakeKubeApi
+
+# Tokens are verified locally, which requires a signing key shared by all processes
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def fake_api():
+    fake = FakeKubeApi().start()
+    default_configuration = client.Configuration.get_default_copy()
+    client.Configuration.set_default(fake.configuration())
+    yield fake
+    client.Configuration.set_default(default_configuration)
+    fake.stop()
@@ -0,0 +1,273 @@
+"""
+A minimal in-process fake of the Kubernetes API server for tests.
+
+It keeps objects in memory, hands out increasing resourceVersions and supports list (with
+`fieldSelector=metadata.name=...`), get, create, replace (with resourceVersion preconditions),
+JSON merge patch, delete and watch (including 410 Gone after `compact()`).
+"""
+import copy
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from kubernetes import client
+
+
+def merge_patch(target, patch):
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+class FakeKubeApi:
+    def __init__(self):
+        self.objects = {}
+        self.events = []
+        self.resource_version = 0
+        self.compacted_at = 0
+        self.compactions = 0
+        self.requests = []
+        self.cond = threading.Condition()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.compactions += 1
+            self.cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def api_client(self) -> client.ApiClient:
+        configuration = client.Configuration()
+        configuration.host = self.url
+        return client.ApiClient(configuration)
+
+    def configuration(self) -> client.Configuration:
+        configuration = client.Configuration()
+        configuration.host = self.url
+        return configuration
+
+    def compact(self):
+        """Forgets the event history: open watches and watches from older resourceVersions get 410 Gone."""
+        with self.cond:
+            self.compacted_at = self.resource_version
+            self.compactions += 1
+            self.events = []
+            self.cond.notify_all()
+
+    def count(self, method: str, resource: str = None) -> int:
+        return sum(1 for m, r in self.requests if m == method and (resource is None or r == resource))
+
+    # Object store helpers, also used by tests to seed and inspect state.
+
+    def put(self, group_version: str, resource: str, namespace, body: dict, event_type: str = None) -> dict:
+        with self.cond:
+            key = (group_version, resource, namespace, body["metadata"]["name"])
+            existed = key in self.objects
+            self.resource_version += 1
+            obj = copy.deepcopy(body)
+            obj["metadata"]["resourceVersion"] = str(self.resource_version)
+            if namespace is not None:
+                obj["metadata"]["namespace"] = namespace
+            obj["metadata"].setdefault("uid", f"uid-{self.resource_version}")
+            self.objects[key] = obj
+            self.events.append((self.resource_version, group_version, resource, namespace,
+                                event_type or ("MODIFIED" if existed else "ADDED"), copy.deepcopy(obj)))
+            self.cond.notify_all()
+            return copy.deepcopy(obj)
+
+    def get(self, group_version: str, resource: str, namespace, name: str):
+        with self.cond:
+            obj = self.objects.get((group_version, resource, namespace, name))
+            return copy.deepcopy(obj)
+
+    def delete(self, group_version: str, resource: str, namespace, name: str):
+        with self.cond:
+            obj = self.objects.pop((group_version, resource, namespace, name), None)
+            if obj is None:
+                return None
+            self.resource_version += 1
+            obj["metadata"]["resourceVersion"] = str(self.resource_version)
+            self.events.append((self.resource_version, group_version, resource, namespace, "DELETED", copy.deepcopy(obj)))
+            self.cond.notify_all()
+            return obj
+
+    def list(self, group_version: str, resource: str, namespace, field_selector: str = None, label_selector: str = None):
+        with self.cond:
+            items = [
+                copy.deepcopy(obj) for (gv, res, ns, name), obj in sorted(self.objects.items(), key=lambda kv: str(kv[0]))
+                if gv == group_version and res == resource and (namespace is None or ns == namespace)
+                and _matches(obj, field_selector, label_selector)
+            ]
+            return items, str(self.resource_version)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.0"
+
+            def log_message(self, *args):
+                pass
+
+            def _route(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                parts = [p for p in parsed.path.split("/") if p]
+                if parts[0] == "api":
+                    group_version, rest = parts[1], parts[2:]
+                else:
+                    group_version, rest = f"{parts[1]}/{parts[2]}", parts[3:]
+                namespace = None
+                if rest and rest[0] == "namespaces" and len(rest) >= 3:
+                    namespace, rest = rest[1], rest[2:]
+                resource = rest[0]
+                name = rest[1] if len(rest) > 1 else None
+                return group_version, resource, namespace, name, query
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _send(self, status: int, body: dict):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _status(self, code: int, reason: str):
+                self._send(code, {"kind": "Status", "apiVersion": "v1", "status": "Failure",
+                                  "code": code, "reason": reason, "message": reason})
+
+            def do_GET(self):
+                group_version, resource, namespace, name, query = self._route()
+                fake.requests.append(("GET" if name or str(query.get("watch")).lower() != "true" else "WATCH", resource))
+                if name:
+                    obj = fake.get(group_version, resource, namespace, name)
+                    return self._send(200, obj) if obj else self._status(404, "NotFound")
+                if str(query.get("watch")).lower() == "true":
+                    return self._watch(group_version, resource, namespace, query)
+                items, resource_version = fake.list(group_version, resource, namespace, query.get("fieldSelector"),
+                                                     query.get("labelSelector"))
+                self._send(200, {"kind": "List", "apiVersion": group_version,
+                                 "metadata": {"resourceVersion": resource_version}, "items": items})
+
+            def _watch(self, group_version, resource, namespace, query):
+                since = int(query.get("resourceVersion") or fake.resource_version)
+                deadline = time.time() + float(query.get("timeoutSeconds") or 30)
+                compactions = fake.compactions
+                self.protocol_version = "HTTP/1.1"
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    while time.time() < deadline:
+                        with fake.cond:
+                            if since < fake.compacted_at or compactions != fake.compactions:
+                                gone = {"type": "ERROR", "object": {"kind": "Status", "code": 410,
+                                                                   "reason": "Expired", "message": "too old resource version"}}
+                                self._chunk(json.dumps(gone) + "\n")
+                                break
+                            pending = [e for e in fake.events if e[0] > since]
+                            if not pending:
+                                fake.cond.wait(min(0.2, max(0.0, deadline - time.time())))
+                                continue
+                        for rv, gv, res, ns, event_type, obj in pending:
+                            since = rv
+                            if gv == group_version and res == resource and (namespace is None or ns == namespace) \
+                                    and _matches(obj, query.get("fieldSelector"), query.get("labelSelector")):
+                                self._chunk(json.dumps({"type": event_type, "object": obj}) + "\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _chunk(self, line: str):
+                data = line.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                group_version, resource, namespace, name, query = self._route()
+                fake.requests.append(("POST", resource))
+                body = self._body()
+                if "generateName" in body.get("metadata", {}) and "name" not in body["metadata"]:
+                    body["metadata"]["name"] = f"{body['metadata']['generateName']}{fake.resource_version + 1:05d}"
+                with fake.cond:
+                    if fake.get(group_version, resource, namespace, body["metadata"]["name"]):
+                        return self._status(409, "AlreadyExists")
+                    obj = fake.put(group_version, resource, namespace, body)
+                self._send(201, obj)
+
+            def do_PUT(self):
+                group_version, resource, namespace, name, query = self._route()
+                fake.requests.append(("PUT", resource))
+                body = self._body()
+                with fake.cond:
+                    current = fake.get(group_version, resource, namespace, name)
+                    if current is None:
+                        return self._status(404, "NotFound")
+                    expected = body.get("metadata", {}).get("resourceVersion")
+                    if expected and expected != current["metadata"]["resourceVersion"]:
+                        return self._status(409, "Conflict")
+                    obj = fake.put(group_version, resource, namespace, body)
+                self._send(200, obj)
+
+            def do_PATCH(self):
+                group_version, resource, namespace, name, query = self._route()
+                fake.requests.append(("PATCH", resource))
+                body = self._body()
+                with fake.cond:
+                    current = fake.get(group_version, resource, namespace, name)
+                    if current is None:
+                        return self._status(404, "NotFound")
+                    expected = (body.get("metadata") or {}).get("resourceVersion")
+                    if expected and expected != current["metadata"]["resourceVersion"]:
+                        return self._status(409, "Conflict")
+                    obj = fake.put(group_version, resource, namespace, merge_patch(current, body))
+                self._send(200, obj)
+
+            def do_DELETE(self):
+                group_version, resource, namespace, name, query = self._route()
+                fake.requests.append(("DELETE", resource))
+                obj = fake.delete(group_version, resource, namespace, name)
+                if obj is None:
+                    return self._status(404, "NotFound")
+                self._send(200, {"kind": "Status", "apiVersion": "v1", "status": "Success"})
+
+        return Handler
+
+
+def _matches(obj: dict, field_selector: str, label_selector: str = None) -> bool:
+    labels = obj["metadata"].get("labels") or {}
+    for requirement in (label_selector or "").split(","):
+        if requirement:
+            label, value = requirement.split("=", 1)
+            if labels.get(label) != value:
+                return False
+    if not field_selector:
+        return True
+    for requirement in field_selector.split(","):
+        field, value = requirement.split("=", 1)
+        if field == "metadata.name" and obj["metadata"]["name"] != value:
+            return False
+        if field == "metadata.namespace" and obj["metadata"].get("namespace") != value:
+            return False
+    return True
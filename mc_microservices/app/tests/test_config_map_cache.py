@@ -0,0 +1,89 @@
+import pytest
+from kubernetes import client
+from app.modules.ownership.services import kubernetes_service
+from app.modules.ownership.services.inventory_store import ConfigMapInventoryStore
+from app.modules.ownership.services.config_map_patch import build_data_patch
+from app.modules.ownership.services.ownership_store import ConfigMapOwnershipStore
+from conftest import wait_until
+
+
+def config_map(name, data):
+    return {"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": name}, "data": data}
+
+
+@pytest.fixture
+def inventory_cache(fake_api, monkeypatch):
+    fake_api.put("v1", "configmaps", "default", config_map("inventory-configmap", {
+        "pg1": "small,available,ns1,group_name1,dev,wb_bech_type1",
+        "pg2": "medium,available,ns2,group_name1,dev,wb_bech_type1",
+    }))
+    store = ConfigMapInventoryStore("inventory-configmap", "default", client.CoreV1Api(fake_api.api_client()))
+    monkeypatch.setattr(kubernetes_service, "inventory_store", store)
+    store.start()
+    assert store.wait_for_sync(5)
+    yield store
+    store.stop()
+
+
+def test_reads_are_served_from_memory(fake_api, inventory_cache):
+    for _ in range(50):
+        assert kubernetes_service.get_inventory_data()["pg1"].startswith("small,available")
+    assert fake_api.count("GET", "configmaps") == 1
+
+
+def test_watch_keeps_cache_current(fake_api, inventory_cache):
+    changes = []
+    inventory_cache.add_listener(lambda changed, removed: changes.append((changed, removed)))
+    fake_api.put("v1", "configmaps", "default", config_map("inventory-configmap", {
+        "pg1": "small,unavailable,ns1,group_name1,dev,wb_bech_type1",
+    }))
+    assert wait_until(lambda: "pg2" not in inventory_cache.get_data())
+    assert inventory_cache.get_data()["pg1"].startswith("small,unavailable")
+    assert changes == [({"pg1": "small,unavailable,ns1,group_name1,dev,wb_bech_type1"}, {"pg2"})]
+
+
+def test_relists_on_gone(fake_api, inventory_cache):
+    assert wait_until(lambda: fake_api.count("WATCH", "configmaps") == 1)
+    fake_api.compact()
+    assert wait_until(lambda: fake_api.count("GET", "configmaps") == 2)
+    fake_api.put("v1", "configmaps", "default", config_map("inventory-configmap", {
+        "pg3": "large,available,ns3,group_name1,dev,wb_bech_type1",
+    }))
+    assert wait_until(lambda: "pg3" in inventory_cache.get_data())
+
+
+def test_inventory_freshness_check(fake_api, inventory_cache, monkeypatch):
+    from app.modules.healthcheck import monitor
+
+    monitor.check_inventory()
+    assert inventory_cache.staleness < 5
+    monkeypatch.setattr(monitor, "INVENTORY_MAX_STALENESS_SECONDS", -1)
+    with pytest.raises(RuntimeError):
+        monitor.check_inventory()
+
+
+def test_writes_go_to_the_api_server_and_through_the_cache(fake_api, inventory_cache):
+    kubernetes_service.update_inventory_status("pg1", "unavailable")
+    assert fake_api.count("PATCH", "configmaps") == 1
+    assert fake_api.count("GET", "configmaps") == 1
+    assert inventory_cache.get_data()["pg1"].startswith("small,unavailable")
+    stored = fake_api.get("v1", "configmaps", "default", "inventory-configmap")
+    assert stored["data"]["pg1"].startswith("small,unavailable")
+
+
+def test_merge_patch_only_carries_changed_keys():
+    assert build_data_patch({"pg1": "x", "pg2": None}, "7") == {
+        "data": {"pg1": "x", "pg2": None},
+        "metadata": {"resourceVersion": "7"},
+    }
+
+
+def test_removing_ownership_records_deletes_only_those_keys(fake_api, monkeypatch):
+    fake_api.put("v1", "configmaps", "default", config_map("ownership-configmap", {
+        "pg1-alice": "2030-01-01T00:00:00", "pg1-bob": "2030-01-01T00:00:00", "pg2-carol": "2030-01-01T00:00:00",
+    }))
+    monkeypatch.setattr(kubernetes_service, "ownership_store", ConfigMapOwnershipStore("ownership-configmap", "default"))
+    kubernetes_service.remove_ownership_records(["pg1-alice", "pg2-carol"])
+    assert fake_api.count("PATCH", "configmaps") == 1
+    assert fake_api.get("v1", "configmaps", "default", "ownership-configmap")["data"] == {"pg1-bob": "2030-01-01T00:00:00"}
+    assert kubernetes_service.get_ownership_data() == {"pg1-bob": "2030-01-01T00:00:00"}
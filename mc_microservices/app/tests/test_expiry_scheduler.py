@@ -0,0 +1,97 @@
+import datetime
+import threading
+from app.modules.relinquish.expiry_scheduler import ExpiryScheduler
+from conftest import wait_until
+
+
+def at(seconds):
+    return (datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)).isoformat()
+
+
+def test_pops_due_leases_in_order_and_in_batches():
+    scheduler = ExpiryScheduler(lambda leases: [], batch_size=2)
+    scheduler.apply_changes({"pg1-a": at(-3), "pg1-b": at(-1), "pg2-c": at(-2), "pg3-d": at(3600)}, set())
+    now = datetime.datetime.utcnow()
+    assert [lease.key for lease in scheduler.pop_due(now)] == ["pg1-a", "pg2-c"]
+    assert [lease.key for lease in scheduler.pop_due(now)] == ["pg1-b"]
+    assert scheduler.pop_due(now) == []
+    assert scheduler.next_deadline() > now
+
+
+def test_renewed_and_removed_leases_are_not_expired():
+    scheduler = ExpiryScheduler(lambda leases: [])
+    scheduler.apply_changes({"pg1-a": at(-1), "pg1-b": at(-1), "pg1-c": at(-1)}, set())
+    renewed = at(3600)
+    scheduler.apply_changes({"pg1-a": renewed}, {"pg1-b"})
+    assert [lease.key for lease in scheduler.pop_due(datetime.datetime.utcnow())] == ["pg1-c"]
+    assert scheduler.next_deadline() == datetime.datetime.fromisoformat(renewed)
+
+
+def test_wakes_up_at_the_next_deadline_and_retries_failures():
+    expired = []
+    attempts = []
+    lock = threading.Lock()
+
+    def on_expired(leases):
+        with lock:
+            attempts.extend(lease.key for lease in leases)
+            failed = [lease for lease in leases if lease.key == "pg2-flaky" and attempts.count(lease.key) == 1]
+            expired.extend(lease.key for lease in leases if lease not in failed)
+            return failed
+
+    scheduler = ExpiryScheduler(on_expired, retry_seconds=0.1)
+    scheduler.start()
+    try:
+        scheduler.apply_changes({"pg1-a": at(0.2), "pg2-flaky": at(0.2), "pg3-later": at(3600)}, set())
+        assert wait_until(lambda: sorted(expired) == ["pg1-a", "pg2-flaky"], timeout=3)
+        assert attempts.count("pg2-flaky") == 2
+        assert "pg3-later" not in attempts
+    finally:
+        scheduler.stop()
+
+
+def test_stop_waits_for_the_batch_in_flight():
+    started = threading.Event()
+    release = threading.Event()
+    expired = []
+
+    def on_expired(leases):
+        started.set()
+        release.wait(5)
+        expired.extend(lease.key for lease in leases)
+        return []
+
+    scheduler = ExpiryScheduler(on_expired)
+    scheduler.start()
+    scheduler.apply_changes({"pg1-a": at(-1)}, set())
+    assert started.wait(3)
+
+    stopper = threading.Thread(target=scheduler.stop)
+    stopper.start()
+    stopper.join(0.2)
+    assert stopper.is_alive()
+    release.set()
+    stopper.join(3)
+    assert not stopper.is_alive()
+    assert expired == ["pg1-a"]
+
+
+def test_waits_are_capped_for_distant_deadlines(monkeypatch):
+    from app.modules.relinquish import expiry_scheduler
+
+    timeouts = []
+    scheduler = ExpiryScheduler(lambda leases: [])
+    scheduler.apply_changes({"pg1-a": "9999-12-31T00:00:00"}, set())
+    wait = scheduler._cond.wait
+
+    def record(timeout=None):
+        timeouts.append(timeout)
+        return wait(0.01)
+
+    monkeypatch.setattr(scheduler._cond, "wait", record)
+    scheduler.start()
+    try:
+        assert wait_until(lambda: len(timeouts) >= 2)
+    finally:
+        scheduler.stop()
+    assert max(timeouts) == expiry_scheduler.EXPIRY_MAX_WAIT_SECONDS
@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from mc_microservices.main import app
 
@@ -22,4 +23,79 @@ def test_ownership_relinquish():
 
 def test_ownership_validate():
     response = client.get("/ownership/validate_ownership", params={"pg_id": "test_pg_id"})
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+def test_probes_serve_cached_dependency_checks(monkeypatch):
+    from app.modules.healthcheck import api as healthcheck_api
+    from app.modules.healthcheck.monitor import HealthMonitor
+
+    calls = []
+    vault_sealed = [True]
+
+    def check_vault():
+        calls.append("vault")
+        if vault_sealed[0]:
+            raise RuntimeError("Vault is sealed")
+
+    monitor = HealthMonitor({"kubernetes_api": lambda: calls.append("kubernetes_api"), "vault": check_vault}, interval=60, max_age=60)
+    monkeypatch.setattr(healthcheck_api, "health_monitor", monitor)
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+    # Not ready before the checks have run
+    assert client.get("/readyz").status_code == 503
+
+    monitor.run_checks()
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["vault"]["message"] == "Vault is sealed"
+    assert response.json()["checks"]["kubernetes_api"]["healthy"] is True
+
+    vault_sealed[0] = False
+    monitor.run_checks()
+    for _ in range(10):
+        assert client.get("/readyz").status_code == 200
+        assert client.get("/healthcheck/healthcheck").json()["ready"] is True
+    # The probes only read the cached results
+    assert calls == ["kubernetes_api", "vault", "kubernetes_api", "vault"]
+
+    # Results older than max_age no longer count
+    monitor.max_age = 0
+    assert client.get("/readyz").status_code == 503
+
+
+def test_readiness_checks_the_expiry_sweeper_and_the_submission_workers(monkeypatch):
+    from app.modules.healthcheck import monitor
+    from app.modules.relinquish import api as relinquish_api
+    from app.modules.relinquish.expiry_scheduler import ExpiryScheduler
+    from app.modules.spark_as_a_service import api as spark_api
+    from app.modules.spark_as_a_service.submission_queue import SubmissionQueue
+
+    queue = SubmissionQueue(lambda pipeline_run: None, lambda submission: None, workers=1)
+    scheduler = ExpiryScheduler(lambda leases: [])
+    monkeypatch.setattr(spark_api, "submission_queue", queue)
+    monkeypatch.setattr(relinquish_api, "expiry_scheduler", scheduler)
+    monkeypatch.setattr(relinquish_api, "LEADER_ELECTION_ENABLED", False)
+    with pytest.raises(RuntimeError):
+        monitor.check_submission_queue()
+    with pytest.raises(RuntimeError):
+        monitor.check_expiry_sweeper()
+
+    queue.start()
+    scheduler.start()
+    try:
+        monitor.check_submission_queue()
+        monitor.check_expiry_sweeper()
+    finally:
+        scheduler.stop()
+        queue.stop(timeout=5)
+    with pytest.raises(RuntimeError):
+        monitor.check_submission_queue()
+
+
+def test_readiness_checks_the_secret_key_when_tokens_are_verified_locally(monkeypatch):
+    from app.modules.healthcheck import monitor
+    from app.modules.validate import token_verifier
+
+    assert "secret_key" not in monitor.default_checks()
+    monkeypatch.setattr(monitor, "VALIDATION_MODE", token_verifier.LOCAL)
+    assert monitor.default_checks()["secret_key"] is token_verifier.check_secret_key
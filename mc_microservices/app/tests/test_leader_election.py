@@ -0,0 +1,53 @@
+from conftest import wait_until
+from app.modules.relinquish.leader_election import LeaderElector
+
+
+def make_elector(identity, events, **kwargs):
+    return LeaderElector(
+        "sweeper", "default",
+        on_started_leading=lambda: events.append((identity, "started")),
+        on_stopped_leading=lambda: events.append((identity, "stopped")),
+        identity=identity, lease_duration=kwargs.get("lease_duration", 1.5), renew_deadline=1, retry_period=0.05,
+    )
+
+
+def test_single_leader_and_failover_on_release(fake_api):
+    events = []
+    first, second = make_elector("a", events), make_elector("b", events)
+    first.start()
+    assert wait_until(lambda: first.is_leader)
+    second.start()
+    try:
+        assert not wait_until(lambda: second.is_leader, timeout=0.5)
+        lease = fake_api.get("coordination.k8s.io/v1", "leases", "default", "sweeper")
+        assert lease["spec"]["holderIdentity"] == "a"
+
+        # A leader that stops releases the Lease, so the follower takes over without waiting for expiry
+        first.stop(5)
+        assert not first.is_leader
+        assert wait_until(lambda: second.is_leader, timeout=1)
+        lease = fake_api.get("coordination.k8s.io/v1", "leases", "default", "sweeper")
+        assert lease["spec"]["holderIdentity"] == "b"
+        assert lease["spec"]["leaseTransitions"] == 1
+        assert events == [("a", "started"), ("a", "stopped"), ("b", "started")]
+    finally:
+        first.stop(5)
+        second.stop(5)
+
+
+def test_follower_takes_over_an_expired_lease(fake_api):
+    events = []
+    crashed = make_elector("a", events)
+    assert crashed.try_acquire_or_renew()
+    follower = make_elector("b", events)
+    follower.start()
+    try:
+        # The holder never renews: the follower waits for the lease duration, then takes over
+        assert not wait_until(lambda: follower.is_leader, timeout=1)
+        assert wait_until(lambda: follower.is_leader, timeout=3)
+        assert fake_api.get("coordination.k8s.io/v1", "leases", "default", "sweeper")["spec"]["holderIdentity"] == "b"
+
+        # The old holder cannot take the Lease back while it is renewed
+        assert not crashed.try_acquire_or_renew()
+    finally:
+        follower.stop(5)
@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from mc_microservices.main import app
 
@@ -48,4 +49,381 @@ def test_validate_ownership():
     pg_id = response.json()["pg_id"]
     response = client.get(f"/ownership/validate_ownership", params={"pg_id": pg_id})
     assert response.status_code == 200
-    assert response.json() == {"is_valid": True}
\ No newline at end of file
+    assert response.json() == {"is_valid": True}
+
+def test_check_kubernetes_resources_uses_name_indexes(fake_api, monkeypatch):
+    from kubernetes import client as k8s_client
+    from fastapi import HTTPException
+    from app.modules.ownership import api as ownership_api
+    from app.modules.ownership.services.resource_index import NameIndex
+
+    fake_api.put("v1", "serviceaccounts", "team-a", {"metadata": {"name": "alice"}})
+    fake_api.put("v1", "serviceaccounts", "team-b", {"metadata": {"name": "bob"}})
+    fake_api.put("rbac.authorization.k8s.io/v1", "clusterroles", None, {"metadata": {"name": ownership_api.ROLE_NAME}})
+    core_api = k8s_client.CoreV1Api(fake_api.api_client())
+    rbac_api = k8s_client.RbacAuthorizationV1Api(fake_api.api_client())
+    indexes = {
+        "service_account_index": NameIndex("serviceaccounts", core_api.list_service_account_for_all_namespaces),
+        "role_index": NameIndex("roles", rbac_api.list_role_for_all_namespaces),
+        "cluster_role_index": NameIndex("clusterroles", rbac_api.list_cluster_role),
+    }
+    for name, index in indexes.items():
+        monkeypatch.setattr(ownership_api, name, index)
+        index.relist()
+    monkeypatch.setattr(ownership_api, "resource_indexes_synced", lambda: True)
+    requests_before = len(fake_api.requests)
+
+    ownership_api.check_kubernetes_resources(["alice", "bob"])
+    with pytest.raises(HTTPException) as exc_info:
+        ownership_api.check_kubernetes_resources(["alice", "carol"])
+    assert exc_info.value.status_code == 404
+
+    indexes["service_account_index"].on_event("DELETED", k8s_client.V1ServiceAccount(
+        metadata=k8s_client.V1ObjectMeta(name="bob", namespace="team-b")))
+    with pytest.raises(HTTPException):
+        ownership_api.check_kubernetes_resources(["bob"])
+    assert len(fake_api.requests) == requests_before
+
+
+def test_apply_role_bindings_creates_or_replaces_concurrently(fake_api):
+    from app.modules.ownership.services.role_binding_service import apply_role_bindings
+
+    results = apply_role_bindings(["alice", "bob", "carol"], "cluster-full-access-role", "team-a")
+    assert [result.eid for result in results.values()] == ["alice", "bob", "carol"]
+    assert all(result.success for result in results.values())
+    binding = fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-a", "map-bob")
+    assert binding["subjects"][0]["name"] == "bob"
+
+    results = apply_role_bindings(["alice"], "other-role", "team-a")
+    assert results["alice"].success
+    assert fake_api.count("PUT", "rolebindings") == 1
+    binding = fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-a", "map-alice")
+    assert binding["roleRef"]["name"] == "other-role"
+
+
+@pytest.mark.parametrize("backend", ["configmap", "sqlite"])
+def test_allocate_playground_never_double_allocates(fake_api, monkeypatch, tmp_path, backend):
+    from concurrent.futures import ThreadPoolExecutor
+    from fastapi import HTTPException
+    from app.modules.ownership.services import kubernetes_service
+    from app.modules.ownership.services.inventory_store import ConfigMapInventoryStore
+    from app.modules.ownership.services.sqlite_store import SQLiteInventoryStore
+    from app.modules.ownership.services.playground_allocator import PlaygroundAllocator
+
+    inventory = {f"pg{i}": f"small,available,ns{i},group_name1,dev,wb_bech_type1" for i in range(5)}
+    if backend == "sqlite":
+        store = SQLiteInventoryStore(str(tmp_path / "state.db"))
+        store.initialize(inventory)
+    else:
+        fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "inventory-configmap"}, "data": inventory})
+        store = ConfigMapInventoryStore("inventory-configmap", "default")
+    allocator = PlaygroundAllocator()
+    store.add_listener(allocator.apply_changes)
+    store.start()
+    monkeypatch.setattr(kubernetes_service, "inventory_store", store)
+    monkeypatch.setattr(kubernetes_service, "playground_allocator", allocator)
+    monkeypatch.setattr(kubernetes_service, "INVENTORY_CAS_MAX_RETRIES", 50)
+    monkeypatch.setattr(kubernetes_service, "INVENTORY_CAS_BACKOFF_SECONDS", 0.001)
+
+    def claim(_):
+        try:
+            return kubernetes_service.allocate_playground("small", "dev", "wb_bech_type1")
+        except HTTPException as e:
+            return e.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(claim, range(8)))
+
+    allocated = [result for result in results if isinstance(result, tuple)]
+    assert sorted(pg_id for pg_id, _ in allocated) == [f"pg{i}" for i in range(5)]
+    assert results.count(404) == 3
+    stored = store.get_data()
+    assert all(value.split(",")[1] == "unavailable" for value in stored.values())
+
+
+@pytest.mark.parametrize("policy, expected", [
+    ("first-fit", ["pg1", "pg2", "pg3"]),
+    ("least-recently-used", ["pg2", "pg3", "pg1"]),
+    ("spread", ["pg2", "pg3", "pg1"]),
+])
+def test_playground_allocator_policies(policy, expected):
+    from app.modules.ownership.services.playground_allocator import PlaygroundAllocator
+
+    allocator = PlaygroundAllocator(policy)
+    allocator.apply_changes({
+        "pg1": "small,unavailable,ns1,group_name1,dev,wb1",
+        "pg2": "small,available,ns1,group_name1,dev,wb1",
+        "pg3": "small,available,ns2,group_name1,dev,wb1",
+        "pg4": "small,available,ns2,group_name1,prod,wb1",
+        "pg5": "large,available,ns3,group_name1,dev,wb1",
+    }, set())
+    allocator.apply_changes({"pg1": "small,available,ns1,group_name1,dev,wb1"}, set())
+    assert allocator.free_count("small", "dev", "wb1") == 3
+
+    selected = []
+    for _ in range(3):
+        pg_id, entry = allocator.select("small", "dev", "wb1")
+        selected.append(pg_id)
+        allocator.apply_changes({pg_id: entry.with_status("unavailable").serialize()}, set())
+        allocator.unreserve(pg_id)
+    assert selected == expected
+    assert allocator.select("small", "dev", "wb1") is None
+    assert allocator.select("small", "prod", "wb1")[0] == "pg4"
+
+
+def test_first_fit_free_list_stays_bounded_under_churn():
+    from app.modules.ownership.models.inventory_entry import InventoryEntry
+    from app.modules.ownership.services.playground_allocator import FreeList
+
+    entry = InventoryEntry.parse("small,available,ns1,group_name1,dev,wb1")
+    free_list = FreeList()
+    free_list.add("pg1", entry, 1)
+    free_list.add("pg2", entry, 2)
+    for _ in range(100):
+        free_list.discard("pg1")
+        free_list.add("pg1", entry, 1)
+    assert len(free_list._heap) <= 2 * len(free_list)
+
+    # An entry left behind by an earlier add does not decide the order
+    free_list.discard("pg1")
+    free_list.add("pg1", entry, 3)
+    assert free_list.peek(None) == "pg2"
+
+
+
+def set_up_bulk_claims(fake_api, monkeypatch):
+    from kubernetes import client as k8s_client
+    from app.modules.ownership import api as ownership_api
+    from app.modules.ownership.services import kubernetes_service
+    from app.modules.ownership.services.inventory_store import ConfigMapInventoryStore
+    from app.modules.ownership.services.ownership_store import ConfigMapOwnershipStore
+    from app.modules.ownership.services.playground_allocator import PlaygroundAllocator
+    from app.modules.ownership.services.resource_index import NameIndex
+
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "inventory-configmap"}, "data": {
+        "pg1": "small,available,team-a,group_name1,dev,wb1",
+        "pg2": "small,available,team-b,group_name1,dev,wb1",
+    }})
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "ownership-configmap"}, "data": {}})
+    for eid in ("alice", "bob", "carol", "dave"):
+        fake_api.put("v1", "serviceaccounts", "users", {"metadata": {"name": eid}})
+    fake_api.put("rbac.authorization.k8s.io/v1", "clusterroles", None, {"metadata": {"name": ownership_api.ROLE_NAME}})
+
+    allocator = PlaygroundAllocator()
+    inventory_store = ConfigMapInventoryStore("inventory-configmap", "default")
+    inventory_store.add_listener(allocator.apply_changes)
+    monkeypatch.setattr(kubernetes_service, "inventory_store", inventory_store)
+    monkeypatch.setattr(kubernetes_service, "ownership_store", ConfigMapOwnershipStore("ownership-configmap", "default"))
+    monkeypatch.setattr(kubernetes_service, "playground_allocator", allocator)
+    core_api, rbac_api = k8s_client.CoreV1Api(), k8s_client.RbacAuthorizationV1Api()
+    for name, index in {
+        "service_account_index": NameIndex("serviceaccounts", core_api.list_service_account_for_all_namespaces),
+        "role_index": NameIndex("roles", rbac_api.list_role_for_all_namespaces),
+        "cluster_role_index": NameIndex("clusterroles", rbac_api.list_cluster_role),
+    }.items():
+        index.relist()
+        monkeypatch.setattr(ownership_api, name, index)
+    monkeypatch.setattr(ownership_api, "resource_indexes_synced", lambda: True)
+
+
+def test_claim_ownership_bulk(fake_api, monkeypatch):
+    set_up_bulk_claims(fake_api, monkeypatch)
+    claim = {"num_days": 5, "size": "small", "environment": "dev", "wb_bech_type": "wb1"}
+    response = client.post("/ownership/claim_ownership/bulk", json=[
+        dict(claim, eid_list=["alice", "bob"]),
+        dict(claim, eid_list=["mallory"]),
+        dict(claim, eid_list=["carol"]),
+        dict(claim, eid_list=["dave"]),
+    ])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [200, 404, 200, 404]
+    assert {results[0]["pg_id"], results[2]["pg_id"]} == {"pg1", "pg2"}
+    assert set(results[0]["auth_tokens"]) == {"alice", "bob"}
+
+    assert fake_api.count("PUT", "configmaps") == 0
+    assert fake_api.count("PATCH", "configmaps") == 2
+    ownership = fake_api.get("v1", "configmaps", "default", "ownership-configmap")["data"]
+    assert set(ownership) == {f"{results[0]['pg_id']}-alice", f"{results[0]['pg_id']}-bob", f"{results[2]['pg_id']}-carol"}
+    assert fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-a", "map-alice") or \
+        fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-b", "map-alice")
+
+
+def test_lease_index_tracks_owners_both_ways():
+    from app.modules.ownership.services.lease_index import LeaseIndex
+
+    index = LeaseIndex()
+    index.apply_changes({"pg1-alice": "2030-01-01", "pg1-bob": "2030-01-02", "pg10-alice": "2030-01-03", "pg2-jean-luc": "2030-01-04"}, set())
+    assert index.owners("pg1") == {"alice": "2030-01-01", "bob": "2030-01-02"}
+    assert index.playgrounds("alice") == {"pg1", "pg10"}
+    assert index.owners("pg2") == {"jean-luc": "2030-01-04"}
+
+    index.apply_changes({"pg1-alice": "2030-02-01"}, {"pg1-bob", "pg10-alice"})
+    assert index.owners("pg1") == {"alice": "2030-02-01"}
+    assert not index.has_owners("pg10")
+    assert index.playgrounds("alice") == {"pg1"}
+    index.apply_changes({}, {"pg1-alice"})
+    assert not index.has_owners("pg1")
+    assert len(index) == 1
+
+
+def test_token_write_behind_keeps_per_eid_order_and_retries():
+    from app.modules.ownership.services.token_writer import TokenWriteBehind
+
+    stored = []
+    attempts = {}
+
+    def store(eid, token):
+        attempts[token] = attempts.get(token, 0) + 1
+        if token == "flaky" and attempts[token] < 3:
+            raise Exception("Vault unavailable")
+        if token == "broken":
+            raise Exception("Vault unavailable")
+        stored.append((eid, token))
+
+    writer = TokenWriteBehind(store, workers=4, queue_size=100, max_retries=2, retry_backoff=0.001)
+    writer.start()
+    for index in range(20):
+        writer.submit(f"eid{index % 5}", f"token{index}")
+    writer.submit("carol", "flaky")
+    writer.submit("dave", "broken")
+    writer.join()
+    writer.stop(5)
+
+    for eid in (f"eid{index}" for index in range(5)):
+        assert [token for e, token in stored if e == eid] == [f"token{index}" for index in range(20) if f"eid{index % 5}" == eid]
+    assert ("carol", "flaky") in stored
+    assert attempts["broken"] == 3
+    assert ("dave", "broken") not in stored
+
+
+def test_store_auth_tokens_sync_reports_failures(monkeypatch):
+    from app.modules.ownership.services import token_writer
+
+    def store(eid, token):
+        if eid == "bob":
+            raise Exception("Vault unavailable")
+
+    monkeypatch.setattr(token_writer, "store_auth_token", store)
+    assert token_writer.store_auth_tokens({"alice": "a", "bob": "b"}, mode=token_writer.OFF) == {}
+    assert token_writer.store_auth_tokens({"alice": "a", "bob": "b"}, mode=token_writer.SYNC) == {"bob": "Vault unavailable"}
+
+
+def test_failed_claim_deletes_its_role_bindings_before_releasing_the_playground(fake_api, monkeypatch):
+    from fastapi import HTTPException
+    from app.modules.ownership.services import kubernetes_service, role_binding_service
+    from app.modules.ownership.services.inventory_store import ConfigMapInventoryStore
+    from app.modules.ownership.services.role_binding_service import RoleBindingResult
+
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "inventory-configmap"}, "data": {
+        "pg1": "small,unavailable,team-a,group_name1,dev,wb1",
+    }})
+    monkeypatch.setattr(kubernetes_service, "inventory_store", ConfigMapInventoryStore("inventory-configmap", "default"))
+    apply_role_binding = role_binding_service.apply_role_binding
+
+    def apply_all_but_bob(eid, role_name, namespace):
+        if eid == "bob":
+            return RoleBindingResult(eid, False, "Kubernetes API error: 500 Internal Server Error")
+        return apply_role_binding(eid, role_name, namespace)
+
+    monkeypatch.setattr(role_binding_service, "apply_role_binding", apply_all_but_bob)
+
+    with pytest.raises(HTTPException):
+        kubernetes_service.create_role_binding_and_generate_tokens(["alice", "bob", "carol"], "role", 5, "pg1", "team-a")
+
+    assert fake_api.count("POST", "rolebindings") == 2
+    assert fake_api.count("DELETE", "rolebindings") == 2
+    for eid in ("alice", "bob", "carol"):
+        assert fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-a", f"map-{eid}") is None
+    assert fake_api.get("v1", "configmaps", "default", "inventory-configmap")["data"]["pg1"].startswith("small,available")
+
+
+def test_failed_bulk_claims_delete_their_role_bindings(fake_api, monkeypatch):
+    from fastapi import HTTPException
+    from app.modules.ownership import api as ownership_api
+    from app.modules.ownership.services import role_binding_service
+    from app.modules.ownership.services.role_binding_service import RoleBindingResult
+
+    set_up_bulk_claims(fake_api, monkeypatch)
+    apply_role_binding = role_binding_service.apply_role_binding
+
+    def apply_all_but_bob(eid, role_name, namespace):
+        if eid == "bob":
+            return RoleBindingResult(eid, False, "Kubernetes API error: 500 Internal Server Error")
+        return apply_role_binding(eid, role_name, namespace)
+
+    monkeypatch.setattr(role_binding_service, "apply_role_binding", apply_all_but_bob)
+    claim = {"num_days": 5, "size": "small", "environment": "dev", "wb_bech_type": "wb1"}
+
+    # A claim with a failed RoleBinding keeps none of the others
+    results = client.post("/ownership/claim_ownership/bulk", json=[dict(claim, eid_list=["alice", "bob"])]).json()["results"]
+    assert results[0]["status_code"] == 500
+    assert fake_api.list("rbac.authorization.k8s.io/v1", "rolebindings", None)[0] == []
+
+    # Claims whose ownership records cannot be written keep none of theirs
+    def fail_to_put(records):
+        raise HTTPException(status_code=500, detail="ConfigMap unavailable")
+
+    monkeypatch.setattr(ownership_api, "put_ownership_records", fail_to_put)
+    results = client.post("/ownership/claim_ownership/bulk", json=[dict(claim, eid_list=["alice"]), dict(claim, eid_list=["carol"])]).json()["results"]
+    assert [result["status_code"] for result in results] == [500, 500]
+    assert fake_api.count("POST", "rolebindings") == 3
+    assert fake_api.list("rbac.authorization.k8s.io/v1", "rolebindings", None)[0] == []
+    inventory = fake_api.get("v1", "configmaps", "default", "inventory-configmap")["data"]
+    assert all(",available," in entry for entry in inventory.values())
+
+
+def test_bulk_claims_reject_duplicate_eids_and_abandon_claims_whose_tokens_fail(fake_api, monkeypatch):
+    from app.modules.ownership import api as ownership_api
+
+    set_up_bulk_claims(fake_api, monkeypatch)
+    claim = {"num_days": 5, "size": "small", "environment": "dev", "wb_bech_type": "wb1"}
+
+    # Claims sharing an eid would share its RoleBinding and token
+    response = client.post("/ownership/claim_ownership/bulk", json=[dict(claim, eid_list=["alice", "bob"]), dict(claim, eid_list=["bob"])])
+    assert response.status_code == 400
+    assert fake_api.count("POST", "rolebindings") == 0
+
+    generate_user_token = ownership_api.generate_user_token
+
+    def fail_for_carol(eid, num_days, pg_id):
+        if eid == "carol":
+            raise RuntimeError("signing failed")
+        return generate_user_token(eid, num_days, pg_id)
+
+    monkeypatch.setattr(ownership_api, "generate_user_token", fail_for_carol)
+    results = client.post("/ownership/claim_ownership/bulk", json=[dict(claim, eid_list=["carol"]), dict(claim, eid_list=["alice"])]).json()["results"]
+    assert [result["status_code"] for result in results] == [500, 200]
+    bindings = fake_api.list("rbac.authorization.k8s.io/v1", "rolebindings", None)[0]
+    assert [binding["metadata"]["name"] for binding in bindings] == ["map-alice"]
+    inventory = fake_api.get("v1", "configmaps", "default", "inventory-configmap")["data"]
+    assert sorted(",available," in entry for entry in inventory.values()) == [False, True]
+
+
+def test_token_write_behind_stops_with_a_full_queue():
+    import threading
+    from app.modules.ownership.services.token_writer import TokenWriteBehind
+
+    started = threading.Event()
+    release = threading.Event()
+    stored = []
+
+    def store(eid, token):
+        started.set()
+        release.wait(5)
+        stored.append(token)
+
+    writer = TokenWriteBehind(store, workers=1, queue_size=2)
+    writer.start()
+    writer.submit("alice", "token0")
+    assert started.wait(5)
+    writer.submit("alice", "token1")
+    writer.submit("alice", "token2")
+    assert writer._queues[0].full()
+
+    stopper = threading.Thread(target=writer.stop, args=(5,))
+    stopper.start()
+    release.set()
+    stopper.join(5)
+    assert not stopper.is_alive()
+    assert stored == ["token0", "token1", "token2"]
@@ -0,0 +1,83 @@
+import pytest
+from app.modules.ownership.services.ownership_store import ShardedConfigMapOwnershipStore, SHARD_LABEL
+from conftest import wait_until
+
+LEASES = {f"pg{n}-user{n}": f"2030-01-{n:02d}T00:00:00" for n in range(1, 21)}
+
+
+def shards(fake_api):
+    return {
+        item["metadata"]["name"]: item["data"]
+        for item in fake_api.list("v1", "configmaps", "default", label_selector=f"{SHARD_LABEL}=ownership")[0]
+    }
+
+
+@pytest.fixture
+def store(fake_api):
+    store = ShardedConfigMapOwnershipStore("ownership", "default", shard_count=4)
+    store.start()
+    assert store.wait_for_sync(5)
+    yield store
+    store.stop()
+
+
+def test_leases_are_spread_over_shards_and_read_back_merged(fake_api, store):
+    store.put(LEASES)
+    assert len(shards(fake_api)) == 4
+    assert sum(len(data) for data in shards(fake_api).values()) == len(LEASES)
+    assert store.get_data() == LEASES
+
+    store.put({"pg1-user2": "2030-02-01T00:00:00"})
+    assert store.shard_name("pg1-user2") == store.shard_name("pg1-user1")
+    store.remove(["pg1-user1", "pg2-user2", "pg99-nobody"])
+    expected = dict(LEASES, **{"pg1-user2": "2030-02-01T00:00:00"})
+    del expected["pg1-user1"], expected["pg2-user2"]
+    assert store.get_data() == expected
+
+
+def test_other_replicas_see_writes_through_the_watch(fake_api, store):
+    other = ShardedConfigMapOwnershipStore("ownership", "default", shard_count=4)
+    changes = []
+    other.add_listener(lambda changed, removed: changes.append((changed, removed)))
+    other.start()
+    try:
+        assert other.wait_for_sync(5)
+        store.put({"pg1-alice": "2030-01-01T00:00:00"})
+        assert wait_until(lambda: other.get_data() == {"pg1-alice": "2030-01-01T00:00:00"})
+        store.remove(["pg1-alice"])
+        assert wait_until(lambda: other.get_data() == {})
+        assert changes == [({"pg1-alice": "2030-01-01T00:00:00"}, set()), ({}, {"pg1-alice"})]
+    finally:
+        other.stop()
+
+
+def test_reshard_moves_leases_online(fake_api, store):
+    store.put(LEASES)
+    removed = []
+    store.add_listener(lambda changed, gone: removed.extend(gone))
+
+    assert store.reshard(8) > 0
+    assert len(shards(fake_api)) == 8
+    assert store.get_data() == LEASES
+    assert all(store.shard_name(key) == name for name, data in shards(fake_api).items() for key in data)
+
+    store.reshard(2)
+    assert sorted(shards(fake_api)) == ["ownership-0", "ownership-1"]
+    assert store.get_data() == LEASES
+    assert store.reshard() == 0
+    assert removed == []
+
+
+def test_reads_and_removes_before_sync_go_to_the_shards(fake_api, store):
+    store.put({"pg1-alice": "2030-01-01T00:00:00"})
+    other = ShardedConfigMapOwnershipStore("ownership", "default", shard_count=4)
+
+    assert other.get_data() == {"pg1-alice": "2030-01-01T00:00:00"}
+    assert other.get("pg1-alice") == "2030-01-01T00:00:00"
+    assert not other.has_synced
+
+    # A lease this replica has not seen yet is removed from its home shard
+    store.put({"pg2-bob": "2030-01-01T00:00:00"})
+    other.remove(["pg2-bob"])
+    assert wait_until(lambda: "pg2-bob" not in store.get_data())
+    assert "pg2-bob" not in shards(fake_api)[store.shard_name("pg2-bob")]
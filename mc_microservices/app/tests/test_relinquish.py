@@ -17,4 +17,140 @@ def test_relinquish_ownership():
     pg_id = response.json()["pg_id"]
     response = client.delete(f"/relinquish/relinquish_ownership", params={"pg_id": pg_id})
     assert response.status_code == 200
-    assert response.json() == {"message": "Ownership relinquished"}
\ No newline at end of file
+    assert response.json() == {"message": "Ownership relinquished"}
+
+def test_relinquish_expired_leases(fake_api, monkeypatch):
+    from app.modules.relinquish import api as relinquish_api
+    from app.modules.ownership.models.lease import Lease
+    from app.modules.ownership.services import kubernetes_service
+    from app.modules.ownership.services.inventory_store import ConfigMapInventoryStore
+    from app.modules.ownership.services.ownership_store import ConfigMapOwnershipStore
+
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "inventory-configmap"}, "data": {
+        "pg1": "small,unavailable,team-a,group_name1,dev,wb1",
+        "pg2": "small,unavailable,team-b,group_name1,dev,wb1",
+    }})
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "ownership-configmap"}, "data": {
+        "pg1-alice": "2020-01-01T00:00:00",
+        "pg2-bob": "2020-01-01T00:00:00",
+        "pg2-carol": "2030-01-01T00:00:00",
+        "pg2-dave": "2030-01-01T00:00:00",
+    }})
+    for eid, namespace in (("alice", "team-a"), ("bob", "team-b"), ("carol", "team-b")):
+        fake_api.put("rbac.authorization.k8s.io/v1", "rolebindings", namespace, {"metadata": {"name": f"map-{eid}"}})
+    ownership_store = ConfigMapOwnershipStore("ownership-configmap", "default")
+    monkeypatch.setattr(kubernetes_service, "inventory_store", ConfigMapInventoryStore("inventory-configmap", "default"))
+    monkeypatch.setattr(kubernetes_service, "ownership_store", ownership_store)
+    monkeypatch.setattr(relinquish_api, "ownership_store", ownership_store)
+
+    failed = relinquish_api.relinquish_expired_leases([
+        Lease("pg1", "alice", "2020-01-01T00:00:00"),
+        Lease("pg2", "bob", "2020-01-01T00:00:00"),
+        # Renewed since it was scheduled
+        Lease("pg2", "dave", "2020-01-01T00:00:00"),
+    ])
+
+    assert failed == []
+    assert fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-a", "map-alice") is None
+    assert fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-b", "map-bob") is None
+    assert fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-b", "map-carol") is not None
+    assert set(fake_api.get("v1", "configmaps", "default", "ownership-configmap")["data"]) == {"pg2-carol", "pg2-dave"}
+    inventory = fake_api.get("v1", "configmaps", "default", "inventory-configmap")["data"]
+    assert inventory["pg1"].split(",")[1] == "available"
+    assert inventory["pg2"].split(",")[1] == "unavailable"
+
+
+def test_relinquish_ownership_removes_the_lease(fake_api, monkeypatch):
+    from app.modules.relinquish import api as relinquish_api
+    from app.modules.ownership.services import kubernetes_service
+    from app.modules.ownership.services.inventory_store import ConfigMapInventoryStore
+    from app.modules.ownership.services.lease_index import LeaseIndex
+    from app.modules.ownership.services.ownership_store import ConfigMapOwnershipStore
+
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "inventory-configmap"}, "data": {
+        "pg1": "small,unavailable,team-a,group_name1,dev,wb1",
+    }})
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "ownership-configmap"}, "data": {
+        "pg1-alice": "2030-01-01T00:00:00",
+        "pg1-bob": "2030-01-01T00:00:00",
+        "pg10-alice": "2030-01-01T00:00:00",
+    }})
+    for eid in ("alice", "bob"):
+        fake_api.put("rbac.authorization.k8s.io/v1", "rolebindings", "team-a", {"metadata": {"name": f"map-{eid}"}})
+    ownership_store = ConfigMapOwnershipStore("ownership-configmap", "default")
+    lease_index = LeaseIndex()
+    ownership_store.add_listener(lease_index.apply_changes)
+    ownership_store.start()
+    assert ownership_store.wait_for_sync(5)
+    monkeypatch.setattr(kubernetes_service, "inventory_store", ConfigMapInventoryStore("inventory-configmap", "default"))
+    monkeypatch.setattr(kubernetes_service, "ownership_store", ownership_store)
+    monkeypatch.setattr(kubernetes_service, "lease_index", lease_index)
+    monkeypatch.setattr(relinquish_api, "ownership_store", ownership_store)
+
+    try:
+        response = client.delete("/relinquish/relinquish_ownership", params={"pg_id": "pg1", "eid": "alice"})
+        assert response.status_code == 200
+        assert fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-a", "map-alice") is None
+        assert lease_index.owners("pg1") == {"bob": "2030-01-01T00:00:00"}
+        assert fake_api.get("v1", "configmaps", "default", "inventory-configmap")["data"]["pg1"].split(",")[1] == "unavailable"
+
+        response = client.delete("/relinquish/relinquish_ownership", params={"pg_id": "pg1", "eid": "alice"})
+        assert response.status_code == 404
+
+        response = client.delete("/relinquish/relinquish_ownership", params={"pg_id": "pg1", "eid": "bob"})
+        assert response.status_code == 200
+        assert set(fake_api.get("v1", "configmaps", "default", "ownership-configmap")["data"]) == {"pg10-alice"}
+        assert fake_api.get("v1", "configmaps", "default", "inventory-configmap")["data"]["pg1"].split(",")[1] == "available"
+    finally:
+        ownership_store.stop()
+
+
+def test_relinquish_ownership_batch(fake_api, monkeypatch):
+    from app.modules.relinquish import api as relinquish_api
+    from app.modules.ownership.services import kubernetes_service
+    from app.modules.ownership.services.inventory_store import ConfigMapInventoryStore
+    from app.modules.ownership.services.ownership_store import ConfigMapOwnershipStore
+
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "inventory-configmap"}, "data": {
+        "pg1": "small,unavailable,team-a,group_name1,dev,wb1",
+        "pg2": "small,unavailable,team-b,group_name1,dev,wb1",
+    }})
+    fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "ownership-configmap"}, "data": {
+        "pg1-alice": "2030-01-01T00:00:00",
+        "pg1-bob": "2030-01-01T00:00:00",
+        "pg2-carol": "2030-01-01T00:00:00",
+        "pg2-dave": "2030-01-01T00:00:00",
+    }})
+    for eid, namespace in (("alice", "team-a"), ("bob", "team-a"), ("carol", "team-b"), ("dave", "team-b")):
+        fake_api.put("rbac.authorization.k8s.io/v1", "rolebindings", namespace, {"metadata": {"name": f"map-{eid}"}})
+    ownership_store = ConfigMapOwnershipStore("ownership-configmap", "default")
+    monkeypatch.setattr(kubernetes_service, "inventory_store", ConfigMapInventoryStore("inventory-configmap", "default"))
+    monkeypatch.setattr(kubernetes_service, "ownership_store", ownership_store)
+    monkeypatch.setattr(relinquish_api, "ownership_store", ownership_store)
+
+    response = client.post("/relinquish/relinquish_ownership/batch", json={"pairs": [
+        {"pg_id": "pg1", "eid": "alice"},
+        {"pg_id": "pg1", "eid": "bob"},
+        {"pg_id": "pg2", "eid": "carol"},
+        {"pg_id": "pg2", "eid": "erin"},
+    ]})
+
+    assert response.status_code == 200
+    assert [(r["eid"], r["status_code"]) for r in response.json()["results"]] == [
+        ("alice", 200), ("bob", 200), ("carol", 200), ("erin", 404),
+    ]
+    assert response.json()["released_playgrounds"] == ["pg1"]
+    # One ownership patch for all leases and one inventory patch for the released playground
+    assert fake_api.count("PATCH", "configmaps") == 2
+    assert set(fake_api.get("v1", "configmaps", "default", "ownership-configmap")["data"]) == {"pg2-dave"}
+    assert fake_api.get("rbac.authorization.k8s.io/v1", "rolebindings", "team-b", "map-carol") is None
+    inventory = fake_api.get("v1", "configmaps", "default", "inventory-configmap")["data"]
+    assert inventory["pg1"].split(",")[1] == "available"
+    assert inventory["pg2"].split(",")[1] == "unavailable"
+
+    response = client.post("/relinquish/relinquish_ownership/batch", json={"pg_id": "pg2"})
+    assert [(r["eid"], r["status_code"]) for r in response.json()["results"]] == [("dave", 200)]
+    assert response.json()["released_playgrounds"] == ["pg2"]
+
+    response = client.post("/relinquish/relinquish_ownership/batch", json={"eids": ["dave"]})
+    assert response.status_code == 400
@@ -1,5 +1,7 @@
+import pytest
 from fastapi.testclient import TestClient
 from mc_microservices.main import app
+from conftest import wait_until
 
 client = TestClient(app)
 
@@ -25,11 +27,335 @@ def test_trigger_spark_pipeline():
     }
 
     response = client.post("/spark/trigger_spark_pipeline", files=files)
-    assert response.status_code == 200
-    assert "Pipeline triggered successfully" in response.json()["status"]
+    assert response.status_code == 202
+    assert "submission_id" in response.json()
 
 def test_spark_job_status():
     job_id = "test-job-id"
     response = client.get(f"/spark/spark_job_status", params={"job_id": job_id})
     assert response.status_code == 200
-    assert "status" in response.json()
\ No newline at end of file
+    assert "status" in response.json()
+
+@pytest.fixture
+def auth_token(monkeypatch):
+    from app.modules.ownership.services.kubernetes_service import generate_user_token
+    from app.modules.validate import service as validate_service, token_verifier
+
+    monkeypatch.setattr(validate_service, "VALIDATION_MODE", token_verifier.LOCAL)
+    return generate_user_token("alice", 1, "pg1")
+
+@pytest.fixture
+def submission_queue(monkeypatch):
+    from app.modules.spark_as_a_service import api as spark_api
+    from app.modules.spark_as_a_service.submission_queue import SubmissionQueue
+
+    queue = SubmissionQueue(spark_api._create_pipeline_run, spark_api._release_artifacts, workers=2, queue_size=10)
+    monkeypatch.setattr(spark_api, "submission_queue", queue)
+    queue.start()
+    yield queue
+    queue.stop(timeout=5)
+
+def test_trigger_spark_pipeline_streams_uploads_to_a_staging_dir(fake_api, auth_token, submission_queue, monkeypatch, tmp_path):
+    import hashlib
+    import os
+    from kubernetes import client as kube_client
+    from app.modules.spark_as_a_service import api as spark_api, pipeline_service, utils as spark_utils
+    from app.modules.spark_as_a_service.artifact_store import ArtifactStore
+    from app.modules.spark_as_a_service.job_status import PipelineRunCache
+
+    def submitted_params():
+        pipeline_runs, _ = fake_api.list("tekton.dev/v1beta1", "pipelineruns", "default")
+        return [{p["name"]: p["value"] for p in run["spec"]["params"]} for run in pipeline_runs]
+
+    upload_dir = tmp_path / "uploads"
+    artifact_store = ArtifactStore(str(tmp_path / "artifacts"), 1024)
+    monkeypatch.setattr(spark_api, "UPLOAD_DIR", str(upload_dir))
+    monkeypatch.setattr(spark_api, "artifact_store", artifact_store)
+    monkeypatch.setattr(pipeline_service, "_custom_objects_api", None)
+    monkeypatch.setattr(spark_utils, "UPLOAD_CHUNK_SIZE", 4)
+    cache = PipelineRunCache("default", kube_client.CustomObjectsApi(fake_api.api_client()))
+    monkeypatch.setattr(spark_api, "job_status_cache", cache)
+    files = [
+        ("sparkyaml", ("../../etc/spark.yaml", "kind: SparkApplication", "text/yaml")),
+        ("pyfiles", ("job.py", "print('one')", "text/x-python")),
+        ("pyfiles", ("job.py", "print('two')", "text/x-python")),
+    ]
+
+    response = client.post("/spark/trigger_spark_pipeline", data={"pg_id": "pg1", "auth_token": auth_token}, files=files)
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "Queued"
+    submission_queue.join()
+    status = client.get(response.json()["status_url"]).json()
+    assert status["status"] == "Submitted"
+    assert status["run_name"].startswith("spark-pipeline-run-")
+    assert status["uid"]
+    [params] = submitted_params()
+    contents = {name: open(path).read() for name, path in params.items()}
+    assert contents == {"sparkyaml": "kind: SparkApplication", "pyfile1": "print('one')", "pyfile2": "print('two')"}
+    assert params["sparkyaml"] == artifact_store.path(hashlib.sha256(b"kind: SparkApplication").hexdigest(), ".yaml")
+    # The staging directory is removed once the pipeline is triggered; the artifacts stay
+    # referenced until the run has finished
+    assert os.listdir(upload_dir) == []
+    assert len(artifact_store) == 3
+    assert artifact_store.references(params["pyfile1"]) == 1
+    cache.start()
+    try:
+        assert cache.wait_for_sync(5)
+        assert artifact_store.references(params["pyfile1"]) == 1
+        pipeline_run = fake_api.get("tekton.dev/v1beta1", "pipelineruns", "default", status["run_name"])
+        pipeline_run["status"] = {"conditions": [{"type": "Succeeded", "status": "True", "reason": "Succeeded"}]}
+        fake_api.put("tekton.dev/v1beta1", "pipelineruns", "default", pipeline_run)
+        assert wait_until(lambda: artifact_store.references(params["pyfile1"]) == 0)
+    finally:
+        cache.stop()
+
+    # Resubmitting the same files does not store them again
+    response = client.post("/spark/trigger_spark_pipeline", data={"pg_id": "pg1", "auth_token": auth_token}, files=files)
+    assert response.status_code == 202
+    submission_queue.join()
+    assert [p == params for p in submitted_params()] == [True, True]
+    assert len(artifact_store) == 3
+
+
+def test_trigger_spark_pipeline_rejects_oversized_uploads(fake_api, auth_token, monkeypatch, tmp_path):
+    import os
+    from app.modules.spark_as_a_service import api as spark_api, utils as spark_utils
+    from app.modules.spark_as_a_service.artifact_store import ArtifactStore
+
+    monkeypatch.setattr(spark_api, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(spark_api, "UploadBudget", lambda: spark_utils.UploadBudget(max_file_bytes=8))
+    monkeypatch.setattr(spark_api, "artifact_store", ArtifactStore(str(tmp_path / "artifacts"), 1024))
+    files = [
+        ("sparkyaml", ("spark.yaml", "kind: x", "text/yaml")),
+        ("pyfiles", ("job.py", "print('far too long')", "text/x-python")),
+    ]
+
+    response = client.post("/spark/trigger_spark_pipeline", data={"pg_id": "pg1", "auth_token": auth_token}, files=files)
+
+    assert response.status_code == 413
+    assert os.listdir(tmp_path / "uploads") == []
+    assert fake_api.count("POST", "pipelineruns") == 0
+
+
+def test_trigger_spark_pipeline_rejects_submissions_when_the_queue_is_full(fake_api, auth_token, monkeypatch, tmp_path):
+    from app.modules.spark_as_a_service import api as spark_api, pipeline_service
+    from app.modules.spark_as_a_service.artifact_store import ArtifactStore
+    from app.modules.spark_as_a_service.job_status import PipelineRunCache
+    from app.modules.spark_as_a_service.submission_queue import SubmissionQueue, SUBMISSION_QUEUE_DEPTH
+
+    artifact_store = ArtifactStore(str(tmp_path / "artifacts"), 1024)
+    queue = SubmissionQueue(spark_api._create_pipeline_run, spark_api._release_artifacts, workers=1, queue_size=1)
+    monkeypatch.setattr(spark_api, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(spark_api, "artifact_store", artifact_store)
+    monkeypatch.setattr(spark_api, "submission_queue", queue)
+    monkeypatch.setattr(spark_api, "job_status_cache", PipelineRunCache("default"))
+    monkeypatch.setattr(pipeline_service, "_custom_objects_api", None)
+    files = [
+        ("sparkyaml", ("spark.yaml", "kind: SparkApplication", "text/yaml")),
+        ("pyfiles", ("job.py", "print('one')", "text/x-python")),
+    ]
+    depth = SUBMISSION_QUEUE_DEPTH._value.get()
+
+    accepted = client.post("/spark/trigger_spark_pipeline", data={"pg_id": "pg1", "auth_token": auth_token}, files=files)
+    rejected = client.post("/spark/trigger_spark_pipeline", data={"pg_id": "pg1", "auth_token": auth_token}, files=files)
+
+    assert accepted.status_code == 202
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == str(spark_api.SPARK_SUBMISSION_RETRY_AFTER_SECONDS)
+    assert SUBMISSION_QUEUE_DEPTH._value.get() == depth + 1
+    assert client.get(accepted.json()["status_url"]).json()["status"] == "Queued"
+    assert fake_api.count("POST", "pipelineruns") == 0
+
+    # The queued submission goes through once a worker picks it up
+    queue.start()
+    queue.join()
+    queue.stop(timeout=5)
+    assert client.get(accepted.json()["status_url"]).json()["status"] == "Submitted"
+    assert fake_api.count("POST", "pipelineruns") == 1
+    assert SUBMISSION_QUEUE_DEPTH._value.get() == depth
+    assert client.get("/spark/submissions/unknown").status_code == 404
+
+
+def test_trigger_spark_pipeline_validates_the_token_in_process(fake_api, auth_token, monkeypatch, tmp_path):
+    from app.modules.ownership.services.kubernetes_service import generate_user_token
+    from app.modules.spark_as_a_service import api as spark_api
+
+    monkeypatch.setattr(spark_api, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    files = [
+        ("sparkyaml", ("spark.yaml", "kind: SparkApplication", "text/yaml")),
+        ("pyfiles", ("job.py", "print('one')", "text/x-python")),
+    ]
+
+    for pg_id, token in [("pg1", "token"), ("pg1", auth_token[:-2] + "xx"), ("pg2", auth_token), ("pg1", generate_user_token("alice", -1, "pg1"))]:
+        response = client.post("/spark/trigger_spark_pipeline", data={"pg_id": pg_id, "auth_token": token}, files=files)
+        assert response.status_code == 401
+    assert not (tmp_path / "uploads").exists()
+    assert fake_api.count("POST", "pipelineruns") == 0
+
+
+def test_artifact_store_deduplicates_and_evicts_unreferenced_artifacts(tmp_path):
+    import hashlib
+    import os
+    from app.modules.spark_as_a_service.artifact_store import ArtifactStore
+
+    store = ArtifactStore(str(tmp_path / "artifacts"), max_bytes=10)
+
+    def put(content):
+        staged = tmp_path / "staged"
+        staged.write_bytes(content)
+        return store.put(str(staged), hashlib.sha256(content).hexdigest(), ".py")
+
+    first = put(b"aaaa")
+    assert put(b"aaaa") == first
+    assert store.references(first) == 2
+    assert store.total_bytes == 4
+    second = put(b"bbbb")
+    store.release([first, first, second])
+
+    # Over the limit, the least recently used unreferenced artifacts go first
+    third = put(b"cccc")
+    assert not os.path.exists(first)
+    assert os.path.exists(second) and os.path.exists(third)
+    assert store.total_bytes == 8
+
+    # The index is rebuilt from disk
+    assert len(ArtifactStore(str(tmp_path / "artifacts"), max_bytes=10)) == 2
+
+
+def test_artifact_store_shared_by_processes(tmp_path):
+    import hashlib
+    import os
+    import time
+    from app.modules.spark_as_a_service.artifact_store import ArtifactStore
+
+    root = str(tmp_path / "artifacts")
+    first_process = ArtifactStore(root, max_bytes=10, identity="first")
+    second_process = ArtifactStore(root, max_bytes=10, identity="second")
+
+    def put(store, content):
+        staged = tmp_path / "staged"
+        staged.write_bytes(content)
+        return store.put(str(staged), hashlib.sha256(content).hexdigest(), ".py")
+
+    # An artifact referenced by another process is not evicted
+    held = put(first_process, b"aaaa")
+    second_process.release([put(second_process, b"bbbb"), put(second_process, b"cccc")])
+    put(second_process, b"dddd")
+    assert os.path.exists(held)
+
+    # Once released it is, and storing it again restores the file
+    first_process.release([held])
+    put(second_process, b"eeee")
+    assert not os.path.exists(held)
+    assert put(first_process, b"aaaa") == held
+    assert open(held, "rb").read() == b"aaaa"
+
+    # References held for longer than max_hold are dropped
+    first_process.max_hold = second_process.max_hold = 0
+    time.sleep(0.01)
+    put(second_process, b"ffff")
+    assert first_process.references(held) == 1
+    put(first_process, b"gggg")
+    assert first_process.references(held) == 0
+
+
+def test_spark_job_status_follows_the_pipeline_run_watch(fake_api, monkeypatch):
+    import json
+    import threading
+    from kubernetes import client as kube_client
+    from app.modules.spark_as_a_service import api as spark_api
+    from app.modules.spark_as_a_service.job_status import PipelineRunCache
+
+    def pipeline_run(condition=None):
+        status = {"startTime": "2024-01-01T00:00:00Z"}
+        if condition is not None:
+            status["conditions"] = [dict(condition, type="Succeeded")]
+        return {"metadata": {"name": "run-1", "uid": "uid-run-1"}, "status": status}
+
+    fake_api.put("tekton.dev/v1beta1", "pipelineruns", "default", pipeline_run({"status": "Unknown", "reason": "Running"}))
+    cache = PipelineRunCache("default", kube_client.CustomObjectsApi(fake_api.api_client()))
+    monkeypatch.setattr(spark_api, "job_status_cache", cache)
+    cache.start()
+    try:
+        assert cache.wait_for_sync(5)
+        assert wait_until(lambda: fake_api.count("WATCH", "pipelineruns") == 1)
+
+        response = client.get("/spark/spark_job_status", params={"job_id": "run-1"})
+        assert response.status_code == 200
+        assert response.json()["status"] == "Running"
+        assert client.get("/spark/spark_job_status", params={"job_id": "unknown"}).status_code == 404
+
+        # A long poll returns as soon as the run changes state
+        threading.Timer(0.2, fake_api.put, ("tekton.dev/v1beta1", "pipelineruns", "default",
+                                            pipeline_run({"status": "Unknown", "reason": "Cancelling"}))).start()
+        threading.Timer(0.4, fake_api.put, ("tekton.dev/v1beta1", "pipelineruns", "default",
+                                            pipeline_run({"status": "False", "reason": "Failed", "message": "boom"}))).start()
+        response = client.get("/spark/spark_job_status", params={"job_id": "run-1", "wait": 5})
+        assert response.json()["status"] == "Failed"
+        assert response.json()["message"] == "boom"
+
+        # The stream ends once the run has finished
+        with client.stream("GET", "/spark/spark_job_status/stream", params={"job_id": "run-1"}) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = [json.loads(line[len("data: "):]) for line in response.iter_lines() if line.startswith("data: ")]
+        assert [event["status"] for event in events] == ["Failed"]
+        # A job that does not show up is not streamed
+        monkeypatch.setattr(spark_api, "SPARK_STATUS_HEARTBEAT_SECONDS", 0.1)
+        assert client.get("/spark/spark_job_status/stream", params={"job_id": "unknown"}).status_code == 404
+        # The status is served from the watch, without reading the PipelineRun
+        assert fake_api.count("GET", "pipelineruns") == 1
+    finally:
+        cache.stop()
+
+
+def test_oversized_uploads_are_rejected_while_their_body_is_received():
+    from fastapi import FastAPI, Request
+    from app.modules.spark_as_a_service.utils import UploadSizeLimitMiddleware
+
+    received = []
+    upload_app = FastAPI()
+    upload_app.add_middleware(UploadSizeLimitMiddleware, paths=["/upload"], max_bytes=100)
+
+    @upload_app.post("/upload")
+    async def upload(request: Request):
+        received.append(len(await request.body()))
+        return {}
+
+    upload_client = TestClient(upload_app)
+    assert upload_client.post("/upload", content=b"x" * 100).status_code == 200
+    assert upload_client.post("/upload", content=b"x" * 101).status_code == 413
+    # Chunked uploads have no Content-Length and are counted as they arrive
+    assert upload_client.post("/upload", content=iter([b"x" * 60, b"x" * 40])).status_code == 200
+    assert upload_client.post("/upload", content=iter([b"x" * 60, b"x" * 41])).status_code == 413
+    assert received == [100, 100]
+
+
+def test_submission_queue_stops_with_a_full_queue():
+    import threading
+    from app.modules.spark_as_a_service.submission_queue import SubmissionQueue
+
+    release = threading.Event()
+    created = []
+
+    def create(pipeline_run):
+        release.wait(5)
+        created.append(pipeline_run["name"])
+        return pipeline_run["name"], "uid", "default"
+
+    queue = SubmissionQueue(create, lambda submission: None, workers=2, queue_size=2)
+    queue.start()
+    for index in range(2):
+        queue.submit({"name": f"run{index}"}, [])
+    assert wait_until(lambda: queue.depth() == 0)
+    for index in range(2, 4):
+        queue.submit({"name": f"run{index}"}, [])
+    assert queue.is_full()
+
+    stopper = threading.Thread(target=queue.stop, args=(5,))
+    stopper.start()
+    release.set()
+    stopper.join(5)
+    assert not stopper.is_alive()
+    assert sorted(created) == ["run0", "run1", "run2", "run3"]
+    assert not queue.is_running
@@ -0,0 +1,83 @@
+import pytest
+from app.modules.ownership.models.lease import Lease
+from app.modules.ownership.services.inventory_store import InventoryConflict
+from app.modules.ownership.services.ownership_store import ConfigMapOwnershipStore
+from app.modules.ownership.services.sqlite_store import SQLiteOwnershipStore, SQLiteInventoryStore
+
+LEASES = {
+    "pg1-alice": "2030-01-03T00:00:00",
+    "pg1-bob": "2030-01-01T00:00:00",
+    "pg2-alice": "2030-01-02T00:00:00",
+    "pg10-carol": "2030-01-04T00:00:00",
+}
+
+
+@pytest.fixture(params=["sqlite", "configmap"])
+def ownership_store(request, tmp_path):
+    if request.param == "configmap":
+        fake_api = request.getfixturevalue("fake_api")
+        fake_api.put("v1", "configmaps", "default", {"metadata": {"name": "ownership-configmap"}, "data": {}})
+        return ConfigMapOwnershipStore("ownership-configmap", "default")
+    return SQLiteOwnershipStore(str(tmp_path / "state.db"))
+
+
+def test_ownership_queries(ownership_store):
+    ownership_store.put(LEASES)
+    assert ownership_store.get_data() == LEASES
+    assert ownership_store.owners("pg1") == {"alice": "2030-01-03T00:00:00", "bob": "2030-01-01T00:00:00"}
+    assert ownership_store.owned_by("alice") == {"pg1": "2030-01-03T00:00:00", "pg2": "2030-01-02T00:00:00"}
+    assert ownership_store.expiring("2030-01-03T00:00:00") == [
+        Lease("pg1", "bob", "2030-01-01T00:00:00"),
+        Lease("pg2", "alice", "2030-01-02T00:00:00"),
+        Lease("pg1", "alice", "2030-01-03T00:00:00"),
+    ]
+    assert ownership_store.expiring("2031-01-01T00:00:00", limit=1) == [Lease("pg1", "bob", "2030-01-01T00:00:00")]
+
+    ownership_store.remove(["pg1-alice", "pg1-bob", "pg9-nobody"])
+    assert ownership_store.owners("pg1") == {}
+    assert ownership_store.owners("pg10") == {"carol": "2030-01-04T00:00:00"}
+
+
+def test_sqlite_ownership_uses_indexes_and_wal(tmp_path):
+    store = SQLiteOwnershipStore(str(tmp_path / "state.db"))
+    assert store._connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    for query, index in [
+        ("SELECT eid FROM leases WHERE pg_id = 'pg1'", "leases_pg_id"),
+        ("SELECT pg_id FROM leases WHERE eid = 'alice'", "leases_eid"),
+        ("SELECT key FROM leases WHERE expires_at <= '2030' ORDER BY expires_at", "leases_expires_at"),
+    ]:
+        plan = " ".join(row[-1] for row in store._connection.execute(f"EXPLAIN QUERY PLAN {query}"))
+        assert index in plan
+
+
+def test_sqlite_ownership_notifies_listeners(tmp_path):
+    store = SQLiteOwnershipStore(str(tmp_path / "state.db"))
+    store.put({"pg1-alice": "2030-01-01T00:00:00"})
+    changes = []
+    store.add_listener(lambda changed, removed: changes.append((changed, removed)))
+    store.start()
+    store.put({"pg1-alice": "2030-01-01T00:00:00", "pg2-bob": "2030-01-02T00:00:00"})
+    store.remove(["pg1-alice", "pg3-nobody"])
+    assert changes == [
+        ({"pg1-alice": "2030-01-01T00:00:00"}, set()),
+        ({"pg2-bob": "2030-01-02T00:00:00"}, set()),
+        ({}, {"pg1-alice"}),
+    ]
+
+
+def test_sqlite_inventory_writes_are_versioned(tmp_path):
+    store = SQLiteInventoryStore(str(tmp_path / "state.db"))
+    store.initialize({"pg1": "small,available,ns1,group_name1,dev,wb1", "pg2": "small,available,ns2,group_name1,dev,wb1"})
+    store.initialize({"pg3": "small,available,ns3,group_name1,dev,wb1"})
+    data, version = store.snapshot()
+    assert set(data) == {"pg1", "pg2"}
+    assert store.available("small", "dev", "wb1") == ["pg1", "pg2"]
+
+    store.write({"pg1": "small,unavailable,ns1,group_name1,dev,wb1"}, version)
+    with pytest.raises(InventoryConflict):
+        store.write({"pg2": "small,unavailable,ns2,group_name1,dev,wb1"}, version)
+    assert store.available("small", "dev", "wb1") == ["pg2"]
+
+    data, version = store.snapshot()
+    store.write({"pg2": None}, version)
+    assert store.get_data() == {"pg1": "small,unavailable,ns1,group_name1,dev,wb1"}
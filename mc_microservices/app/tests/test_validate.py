@@ -1,4 +1,5 @@
 from fastapi.testclient import TestClient
+from conftest import wait_until
 from mc_microservices.main import app
 
 client = TestClient(app)
@@ -17,4 +18,177 @@ def test_validate_ownership():
     pg_id = response.json()["pg_id"]
     response = client.get(f"/validate/validate_ownership", params={"pg_id": pg_id})
     assert response.status_code == 200
-    assert response.json() == {"is_valid": True}
\ No newline at end of file
+    assert response.json() == {"is_valid": True}
+
+def test_validate_ownership_locally(monkeypatch):
+    import datetime
+    import jwt
+    from app.modules.ownership.services.kubernetes_service import generate_user_token, SECRET_KEY
+    from app.modules.validate import service as validate_service, token_verifier
+
+    def fail_vault(eid):
+        raise AssertionError("Vault must not be called")
+
+    revocation_list = token_verifier.RevocationList()
+    monkeypatch.setattr(token_verifier, "revocation_list", revocation_list)
+    monkeypatch.setattr(validate_service, "VALIDATION_MODE", token_verifier.LOCAL)
+    monkeypatch.setattr(validate_service, "get_token_from_vault", fail_vault)
+    token = generate_user_token("alice", 5, "pg1")
+
+    def validate(eid, auth_token):
+        response = client.post("/validate/validate-ownership", json={"eid": eid, "auth_token": auth_token})
+        assert response.status_code == 200
+        return response.json()
+
+    assert validate("alice", token) == {"is_valid": True, "message": "Good token. Valid ownership."}
+    assert validate("bob", token)["is_valid"] is False
+    assert validate("alice", token[:-2] + "xx")["is_valid"] is False
+    expired = jwt.encode({"sub": "alice", "exp": datetime.datetime.utcnow() - datetime.timedelta(seconds=1)}, SECRET_KEY, algorithm="HS256")
+    assert validate("alice", expired)["message"] == "Expired token. Invalid ownership."
+
+    # Relinquishing the lease revokes the tokens issued for it
+    revocation_list.apply_changes({"pg1-alice": "2030-01-01T00:00:00"}, set())
+    revocation_list.apply_changes({}, {"pg1-alice"})
+    assert validate("alice", token)["message"] == "Revoked token. Invalid ownership."
+
+
+def test_tokens_verify_after_the_key_is_reloaded_from_the_environment(monkeypatch):
+    import os
+    import pytest
+    from app.modules.ownership.services import kubernetes_service
+    from app.modules.validate import token_verifier
+
+    monkeypatch.setattr(token_verifier, "revocation_list", token_verifier.RevocationList())
+    token = kubernetes_service.generate_user_token("alice", 5, "pg1")
+
+    # Another worker, or this one after a restart, reads the same key from the environment
+    monkeypatch.setattr(token_verifier, "SECRET_KEY", os.environ["SECRET_KEY"])
+    assert token_verifier.verify_token_locally("alice", token).is_valid is True
+
+    # A random per-process key is refused when tokens are verified locally
+    for mode in (token_verifier.LOCAL, token_verifier.HYBRID):
+        with pytest.raises(RuntimeError):
+            token_verifier.check_secret_key(mode, shared=False)
+    token_verifier.check_secret_key(token_verifier.VAULT, shared=False)
+
+
+def test_validate_ownership_falls_back_to_vault(monkeypatch):
+    import jwt
+    from app.modules.validate import service as validate_service, token_verifier
+
+    foreign = jwt.encode({"sub": "alice", "exp": 4102444800}, "another-key", algorithm="HS256")
+    monkeypatch.setattr(validate_service, "VALIDATION_MODE", token_verifier.HYBRID)
+    monkeypatch.setattr(validate_service, "get_token_from_vault", lambda eid: foreign)
+
+    response = client.post("/validate/validate-ownership", json={"eid": "alice", "auth_token": foreign})
+    assert response.json() == {"is_valid": True, "message": "Good token. Valid ownership."}
+
+
+def test_token_cache_ttl_lru_and_negative_entries(monkeypatch):
+    from app.modules.validate import utils
+
+    now = [0.0]
+    monkeypatch.setattr(utils.time, "monotonic", lambda: now[0])
+    reads = []
+    tokens = {"alice": "token-a", "bob": "token-b", "carol": "token-c"}
+
+    def loader(eid):
+        reads.append(eid)
+        return tokens.get(eid)
+
+    cache = utils.TokenCache(loader, max_size=2, ttl=60, negative_ttl=5)
+    assert cache.get("alice") == "token-a"
+    assert cache.get("alice") == "token-a"
+    assert cache.get("dave") is None
+    assert cache.get("dave") is None
+    assert reads == ["alice", "dave"]
+    assert cache.stats() == {"size": 2, "hits": 1, "negative_hits": 1, "misses": 2}
+
+    # Missing tokens expire sooner; the least recently used eid is evicted when full
+    now[0] = 10
+    assert cache.get("dave") is None
+    cache.get("bob")
+    assert reads == ["alice", "dave", "dave", "bob"]
+    assert len(cache) == 2
+    cache.get("alice")
+    assert reads[-1] == "alice"
+
+    # Storing or deleting a token invalidates it
+    tokens["bob"] = "token-b2"
+    cache.invalidate("bob")
+    assert cache.get("bob") == "token-b2"
+
+
+def test_token_cache_single_flight():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.modules.validate.utils import TokenCache
+
+    release = threading.Event()
+    reads = []
+
+    def loader(eid):
+        reads.append(eid)
+        release.wait(5)
+        return f"token-{eid}"
+
+    cache = TokenCache(loader)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get, "alice") for _ in range(8)]
+        assert wait_until(lambda: cache.stats()["misses"] == 8)
+        release.set()
+        assert [future.result() for future in futures] == ["token-alice"] * 8
+    assert reads == ["alice"]
+
+
+def test_storing_a_token_invalidates_the_cache(monkeypatch):
+    from types import SimpleNamespace
+    from app.modules.ownership.services import vault_service
+    from app.modules.validate import utils
+
+    class FakeKv:
+        def create_or_update_secret(self, path, secret):
+            pass
+
+    fake_client = SimpleNamespace(secrets=SimpleNamespace(kv=SimpleNamespace(v2=FakeKv())))
+    monkeypatch.setattr(vault_service, "client", fake_client)
+    utils.token_cache._store("alice", "old-token")
+    vault_service.store_auth_token("alice", "new-token")
+    assert len(utils.token_cache) == 0
+
+
+def test_validate_ownership_batch(monkeypatch):
+    import jwt
+    from app.modules.ownership.services.kubernetes_service import generate_user_token
+    from app.modules.validate import api as validate_api, service as validate_service, token_verifier
+
+    local_token = generate_user_token("alice", 5)
+    foreign = {eid: jwt.encode({"sub": eid, "exp": 4102444800}, "another-key", algorithm="HS256") for eid in ("bob", "carol")}
+    reads = []
+
+    def get_token_from_vault(eid):
+        reads.append(eid)
+        return foreign.get(eid)
+
+    monkeypatch.setattr(validate_service, "VALIDATION_MODE", token_verifier.HYBRID)
+    monkeypatch.setattr(validate_service, "VALIDATE_BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(validate_service, "get_token_from_vault", get_token_from_vault)
+    items = [
+        {"eid": "bob", "auth_token": foreign["bob"]},
+        {"eid": "alice", "auth_token": local_token},
+        {"eid": "bob", "auth_token": foreign["carol"]},
+        {"eid": "dave", "auth_token": foreign["bob"]},
+        {"eid": "carol", "auth_token": foreign["carol"]},
+    ]
+
+    response = client.post("/validate/validate-ownership/batch", json={"items": items})
+
+    assert response.status_code == 200
+    assert [(r["eid"], r["status_code"], r["is_valid"]) for r in response.json()["results"]] == [
+        ("bob", 200, True), ("alice", 200, True), ("bob", 200, False), ("dave", 404, False), ("carol", 200, True),
+    ]
+    assert sorted(reads) == ["bob", "carol", "dave"]
+
+    monkeypatch.setattr(validate_api, "VALIDATE_BATCH_MAX_ITEMS", 2)
+    response = client.post("/validate/validate-ownership/batch", json={"items": items})
+    assert response.status_code == 413
@@ -0,0 +1,69 @@
+"""
+Concurrency benchmark for the request handlers.
+
+Fires concurrent /validate/validate-ownership requests at the app in-process while the Vault read
+is replaced by a fixed-latency blocking call, once with blocking calls offloaded to the shared
+executor (the default) and once with them run inline on the event loop, and prints the throughput
+of both at increasing concurrency.
+
+Usage (from mc_microservices/):
+    PYTHONPATH=. python benchmarks/bench_concurrency.py [--latency 0.05] [--requests 200]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+import httpx
+
+# Measure the Vault read, which local token verification would skip
+os.environ["VALIDATION_MODE"] = "vault"
+
+from main import app
+from app.modules.validate import service as validate_service
+from app.modules.ownership.utils.logger import logger
+
+
+async def run_inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+async def measure(concurrency: int, total: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http_client:
+        async def one():
+            async with semaphore:
+                response = await http_client.post("/validate/validate-ownership", json={"eid": "bench", "auth_token": "token"})
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated Vault latency in seconds")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per measurement")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    def slow_vault_read(eid):
+        time.sleep(args.latency)
+        return "token"
+
+    validate_service.get_token_from_vault = slow_vault_read
+    offloaded = validate_service.run_blocking
+
+    print(f"{'concurrency':>11} {'inline req/s':>13} {'executor req/s':>15}")
+    for concurrency in (1, 10, 50):
+        validate_service.run_blocking = run_inline
+        inline = asyncio.run(measure(concurrency, args.requests))
+        validate_service.run_blocking = offloaded
+        executor = asyncio.run(measure(concurrency, args.requests))
+        print(f"{concurrency:>11} {inline:>13.1f} {executor:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.responses import JSONResponse
 from app.modules.ownership.utils.logger import logger
+from app.modules.ownership.utils.executor import shutdown_executor
+from app.modules.ownership.services.token_writer import start_token_writer, stop_token_writer
 from app.modules.ownership import api as ownership_api
 from app.modules.healthcheck import api as healthcheck_api
+from app.modules.healthcheck.api import start_health_monitor, stop_health_monitor
 from app.modules.relinquish import api as relinquish_api
 from app.modules.validate import api as validate_api
+from app.modules.validate.token_verifier import check_secret_key
 from app.modules.spark_as_a_service import api as spark_api
-from app.modules.ownership.services.kubernetes_service import create_initial_config_map, create_initial_inventory_config_map
+from app.modules.relinquish.api import start_expiry_scheduler, stop_expiry_scheduler
+from app.modules.spark_as_a_service.utils import UploadSizeLimitMiddleware
+from app.modules.spark_as_a_service.api import start_job_status_cache, stop_job_status_cache, start_submission_queue, stop_submission_queue
+from app.modules.ownership.services.kubernetes_service import create_initial_config_map, create_initial_inventory_config_map, start_config_map_caches, stop_config_map_caches, start_resource_indexes, stop_resource_indexes
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -18,6 +26,9 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Reject oversized Spark uploads before their body is read
+app.add_middleware(UploadSizeLimitMiddleware, paths=["/spark/trigger_spark_pipeline"])
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +45,7 @@ async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
         content={"message": exc.detail},
+        headers=getattr(exc, "headers", None),
     )
 
 @app.exception_handler(RequestValidationError)
@@ -52,22 +64,54 @@ async def general_exception_handler(request, exc):
         content={"message": "Internal server error"},
     )
 
+def _start(description: str, *steps):
+    # A failing component does not keep the others from starting; readiness reports it
+    try:
+        for step in steps:
+            step()
+        logger.info(f"{description} started.")
+    except Exception as e:
+        logger.error(f"Error during startup, {description} not started: {e}")
+
 @app.on_event("startup")
 async def startup_event():
     try:
-        create_initial_config_map()
-        create_initial_inventory_config_map()
-        logger.info("ConfigMaps initialized successfully.")
-    except Exception as e:
-        logger.error(f"Error during startup: {e}")
+        check_secret_key()
+    except RuntimeError as e:
+        # Tokens verified locally would be rejected by every other process; readiness fails too
+        logger.error(f"Invalid configuration: {e}")
+    _start("ConfigMaps", create_initial_config_map, create_initial_inventory_config_map)
+    _start("ConfigMap caches", start_config_map_caches)
+    _start("Resource indexes", start_resource_indexes)
+    _start("Token writer", start_token_writer)
+    _start("Lease expiry sweeper (leader election)", start_expiry_scheduler)
+    _start("Spark job status cache", start_job_status_cache)
+    _start("Spark submission workers", start_submission_queue)
+    # Readiness reflects the dependencies, whatever happened above
+    start_health_monitor()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_health_monitor()
+    stop_expiry_scheduler()
+    stop_submission_queue()
+    stop_job_status_cache()
+    stop_config_map_caches()
+    stop_resource_indexes()
+    stop_token_writer()
+    shutdown_executor()
 
 # Include routers from different modules
 app.include_router(ownership_api.router, prefix="/ownership", tags=["ownership"])
 app.include_router(healthcheck_api.router, prefix="/healthcheck", tags=["healthcheck"])
+app.include_router(healthcheck_api.probe_router, tags=["healthcheck"])
 app.include_router(relinquish_api.router, prefix="/relinquish", tags=["relinquish"])
 app.include_router(validate_api.router, prefix="/validate", tags=["validate"])
 app.include_router(spark_api.router, prefix="/spark", tags=["spark"])
 
+# Expose Prometheus metrics
+app.mount("/metrics", make_asgi_app())
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Microservices Application"}
\ No newline at end of file